@@ -1,9 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from models.pitch import PitchRequest
 from models.analysis import AnalysisResponse
-from models.qa import QuestionRequest, QuestionResponse, AnswerRequest, AnswerEvaluation
+from models.qa import (
+    QuestionRequest, QuestionResponse, AnswerRequest, AnswerEvaluation, BatchAnswerRequest, BatchAnswerEvaluation
+)
+from models.batch import BatchAnalysisRequest, BatchJobStatus
 from services.pitch_analyzer import get_pitch_analyzer
 from services.qa_simulator import get_qa_simulator
+from services.batch_analyzer import get_batch_analyzer
+from rag.retriever import get_rag_retriever
+from config.settings import get_settings
+import asyncio
+import json
 import logging
 
 # Configure logging
@@ -12,11 +22,22 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["api"])
 
+# Headers for Server-Sent Events (no proxy buffering, so events arrive as sent)
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _sse(event: str, data) -> str:
+    """Format one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @router.post("/analyze-pitch", response_model=AnalysisResponse)
-async def analyze_pitch(pitch_request: PitchRequest):
+async def analyze_pitch(pitch_request: PitchRequest, no_cache: bool = False):
     """
     Analyze a startup pitch using RAG + LLM.
     
+    Pass ?no_cache=true to bypass the LLM response cache for this request.
+    
     This endpoint:
     1. Validates input
     2. Retrieves relevant VC knowledge (RAG)
@@ -58,7 +79,7 @@ async def analyze_pitch(pitch_request: PitchRequest):
         logger.info(f"[ANALYZE-PITCH] Starting analysis for persona: {pitch_request.investor_persona}")
         
         # SAFEGUARD 3: Analyze with comprehensive error handling
-        result = await analyzer.analyze_pitch(pitch_request)
+        result = await analyzer.analyze_pitch(pitch_request, use_cache=not no_cache)
         
         logger.info(f"[ANALYZE-PITCH] Analysis complete. Score: {result.overall_score}")
         
@@ -66,7 +87,7 @@ async def analyze_pitch(pitch_request: PitchRequest):
         try:
             qa_sim = get_qa_simulator()
             pitch_summary = f"{pitch_request.startup_idea}\nIndustry: {pitch_request.industry}"
-            qa_sim.cache_pitch_context(result.analysis_id, pitch_summary)
+            await qa_sim.cache_pitch_context(result.analysis_id, pitch_summary, pitch_request.investor_persona)
             logger.info(f"[ANALYZE-PITCH] Cached context for Q&A: {result.analysis_id}")
         except Exception as e:
             # Non-critical - don't fail the request
@@ -90,6 +111,143 @@ async def analyze_pitch(pitch_request: PitchRequest):
         )
 
 
+@router.post("/analyze-pitch/stream")
+async def analyze_pitch_stream(pitch_request: PitchRequest, no_cache: bool = False):
+    """
+    Analyze a startup pitch, streaming the result as Server-Sent Events.
+    
+    Same validation and pipeline as /analyze-pitch, but sections are sent
+    as soon as the LLM has written them instead of after the whole reply:
+    
+        event: start            data: {"analysis_id": ...}
+        event: overall_score    data: {"overall_score": ...}
+        event: section_scores   data: {"problem": ..., ...}
+        event: feedback         data: {"section": ..., "text": ...}   (one per entry)
+        event: recommendation   data: {"index": ..., "text": ...}     (one per item)
+        event: complete         data: <AnalysisResponse>              (always last)
+    
+    The complete event carries the validated analysis (identical in shape to
+    /analyze-pitch) and is the one to persist. If the stream fails after it
+    has started, an error event is sent instead.
+    """
+    logger.info(f"[ANALYZE-STREAM] Received request for {pitch_request.industry} startup")
+    
+    # Errors up to here are returned as normal HTTP errors (before streaming)
+    try:
+        analyzer = get_pitch_analyzer()
+    except ValueError as e:
+        logger.error(f"[ANALYZE-STREAM] Environment validation failed: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Server configuration error: {str(e)}. Please check API keys in environment variables."
+        )
+    except Exception as e:
+        logger.error(f"[ANALYZE-STREAM] Analyzer initialization failed: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to initialize analysis service. Please contact support."
+        )
+    
+    validation = analyzer.validate_pitch(pitch_request)
+    if not validation["valid"]:
+        logger.warning(f"[ANALYZE-STREAM] Validation failed: {validation['errors']}")
+        raise HTTPException(status_code=400, detail=validation["errors"])
+    
+    async def event_stream():
+        try:
+            async for event, data in analyzer.analyze_pitch_stream(pitch_request, use_cache=not no_cache):
+                yield _sse(event, data)
+                if event == "complete":
+                    logger.info(f"[ANALYZE-STREAM] Analysis complete. Score: {data['overall_score']}")
+                    # Cache pitch context for Q&A (non-critical)
+                    try:
+                        qa_sim = get_qa_simulator()
+                        pitch_summary = f"{pitch_request.startup_idea}\nIndustry: {pitch_request.industry}"
+                        await qa_sim.cache_pitch_context(data["analysis_id"], pitch_summary,
+                                                         pitch_request.investor_persona)
+                    except Exception as e:
+                        logger.warning(f"[ANALYZE-STREAM] Failed to cache Q&A context: {e}")
+        except Exception as e:
+            logger.error(f"[ANALYZE-STREAM] Unexpected error: {type(e).__name__}: {e}", exc_info=True)
+            detail = "An unexpected error occurred during analysis. Please try again or contact support."
+            yield _sse("error", {"detail": detail})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+@router.post("/batch/analyze", response_model=BatchJobStatus, status_code=202)
+async def submit_batch_analysis(request: BatchAnalysisRequest, no_cache: bool = False):
+    """
+    Submit many pitches for analysis as a background job.
+    
+    Returns immediately with a job ID. Identical pitches are analyzed once;
+    invalid pitches fail individually. Follow progress with
+    GET /api/batch/{job_id} (polling) or GET /api/batch/{job_id}/events (SSE).
+    """
+    logger.info(f"[BATCH] Received batch of {len(request.pitches)} pitches")
+    try:
+        batch_analyzer = get_batch_analyzer()
+    except ValueError as e:
+        logger.error(f"[BATCH] Environment validation failed: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Server configuration error: {str(e)}. Please check API keys in environment variables."
+        )
+    
+    try:
+        job = batch_analyzer.submit(request.pitches, use_cache=not no_cache)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.snapshot()
+
+
+@router.get("/batch/{job_id}", response_model=BatchJobStatus)
+async def get_batch_status(job_id: str, include_results: bool = True):
+    """
+    Progress of a batch job, with per-item results.
+    
+    Pass ?include_results=false for counts only (cheap to poll).
+    """
+    job = get_batch_analyzer().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job.snapshot(include_items=include_results)
+
+
+@router.get("/batch/{job_id}/events")
+async def stream_batch_events(job_id: str):
+    """
+    Stream a batch job's results as Server-Sent Events.
+    
+        event: item   data: <BatchItemResult>   (one per pitch, as it finishes)
+        event: done   data: <BatchJobStatus>    (last)
+    
+    Items that finished before the client connected are replayed first.
+    """
+    job = get_batch_analyzer().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    
+    async def event_stream():
+        async for event, data in job.stream():
+            yield _sse(event, data)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.delete("/batch/{job_id}", response_model=BatchJobStatus)
+async def cancel_batch(job_id: str):
+    """Cancel a batch job. Finished items keep their results."""
+    job = await get_batch_analyzer().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job.snapshot(include_items=True)
+
+
 @router.post("/generate-questions", response_model=QuestionResponse)
 async def generate_questions(request: QuestionRequest):
     """
@@ -101,7 +259,7 @@ async def generate_questions(request: QuestionRequest):
         qa_sim = get_qa_simulator()
         
         # Get pitch context
-        pitch_summary = qa_sim.get_pitch_context(request.analysis_id)
+        pitch_summary = await qa_sim.get_pitch_context(request.analysis_id)
         if not pitch_summary:
             raise HTTPException(
                 status_code=404,
@@ -130,20 +288,21 @@ async def evaluate_answer(request: AnswerRequest):
     try:
         qa_sim = get_qa_simulator()
         
-        # Get pitch context
-        pitch_context = qa_sim.get_pitch_context(request.analysis_id)
-        if not pitch_context:
+        # Get pitch context and the question that was asked
+        session, question = await qa_sim.get_question(request.analysis_id, request.question_id)
+        if session is None:
             raise HTTPException(
                 status_code=404,
                 detail="Pitch analysis not found"
             )
-        
-        # For now, we'll use the question_id as the question text
-        # In production, store questions in database
-        question_text = f"Question {request.question_id}"
+        if question is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Question not found. Generate questions first."
+            )
         
         # Evaluate answer
-        result = await qa_sim.evaluate_answer(request, pitch_context, question_text)
+        result = await qa_sim.evaluate_answer(request, session.pitch_summary, question)
         
         return result
         
@@ -152,3 +311,72 @@ async def evaluate_answer(request: AnswerRequest):
     except Exception as e:
         print(f"Error in evaluate_answer: {e}")
         raise HTTPException(status_code=500, detail="Internal server error during answer evaluation")
+
+
+@router.post("/evaluate-answers", response_model=BatchAnswerEvaluation)
+async def evaluate_answers(request: BatchAnswerRequest):
+    """
+    Evaluate every answer of a mock-interview round at once.
+    
+    Answers are scored together in one LLM call (or a few parallel calls
+    for long rounds) instead of one /evaluate-answer round trip each.
+    """
+    try:
+        qa_sim = get_qa_simulator()
+        
+        question_ids = [item.question_id for item in request.answers]
+        if len(set(question_ids)) != len(question_ids):
+            raise HTTPException(status_code=400, detail="Each question_id may only be answered once")
+        
+        # Get pitch context and the questions that were asked
+        session, questions = await qa_sim.get_questions(request.analysis_id, question_ids)
+        if session is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Pitch analysis not found"
+            )
+        unknown = [qid for qid, question in zip(question_ids, questions) if question is None]
+        if unknown:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Questions not found: {', '.join(unknown)}. Generate questions first."
+            )
+        
+        # Evaluate answers
+        result = await qa_sim.evaluate_answers(request, session.pitch_summary, questions)
+        
+        return result
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in evaluate_answers: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error during answer evaluation")
+
+
+@router.post("/admin/reindex")
+async def reindex_knowledge_base(x_admin_token: Optional[str] = Header(None)):
+    """
+    Incrementally re-index the knowledge base without a restart.
+    
+    Embeds only new/changed documents, removes chunks of deleted ones and
+    saves the updated index. Requires the X-Admin-Token header to match
+    ADMIN_TOKEN (disabled when ADMIN_TOKEN is not set).
+    """
+    settings = get_settings()
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if x_admin_token != settings.admin_token:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    
+    try:
+        retriever = get_rag_retriever()
+        # Embedding is CPU-bound - keep it off the event loop
+        report = await asyncio.to_thread(
+            retriever.reindex, settings.knowledge_base_path, settings.faiss_index_path
+        )
+        logger.info(f"[ADMIN-REINDEX] {report}")
+        return report
+    except Exception as e:
+        logger.error(f"[ADMIN-REINDEX] Failed: {type(e).__name__}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Re-indexing failed")
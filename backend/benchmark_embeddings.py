@@ -0,0 +1,97 @@
+"""
+Parity check and throughput benchmark for the embedding backends.
+
+Compares the ONNX Runtime backends (fp32 and int8) against the PyTorch
+SentenceTransformer output on the knowledge-base chunks:
+- Parity: cosine similarity per text (min / mean). Exits non-zero if any
+  backend falls below --min-cosine, so it can gate a deployment.
+- Throughput: texts/sec for single-query and batched encoding.
+
+Usage:
+    python benchmark_embeddings.py --backends onnx onnx_int8 --min-cosine 0.99
+"""
+
+import argparse
+import sys
+import os
+import time
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rag.embeddings import EmbeddingService
+from config.settings import get_settings
+
+def load_texts(knowledge_base_path: str, limit: int):
+    """Knowledge-base paragraphs plus the query templates the API embeds."""
+    texts = [f"VC questions for {persona} due diligence"
+             for persona in ("saas", "angel", "growth_vc", "institutional")]
+    for file_name in sorted(os.listdir(knowledge_base_path)):
+        if file_name.endswith(".txt"):
+            with open(os.path.join(knowledge_base_path, file_name), "r", encoding="utf-8") as f:
+                texts.extend(p.strip() for p in f.read().split("\n\n") if p.strip())
+    return texts[:limit]
+
+def cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+def throughput(service: EmbeddingService, texts, batched: bool) -> float:
+    """Texts/sec straight through the model (bypasses the query cache)."""
+    start = time.perf_counter()
+    if batched:
+        service._encode(texts, show_progress_bar=False)
+    else:
+        for text in texts:
+            service._encode([text], show_progress_bar=False)
+    return len(texts) / (time.perf_counter() - start)
+
+def run_benchmark(args) -> int:
+    settings = get_settings()
+    texts = load_texts(settings.knowledge_base_path, args.limit)
+    print("=" * 60)
+    print(f"Embedding benchmark: {settings.embeddings_model}, {len(texts)} texts")
+    print("=" * 60)
+    
+    services = {
+        backend: EmbeddingService(
+            settings.embeddings_model,
+            cache_size=0,
+            backend=backend,
+            onnx_dir=settings.embedding_onnx_dir,
+            onnx_threads=args.threads
+        )
+        for backend in ["torch"] + args.backends
+    }
+    
+    reference = services["torch"]._encode(texts, show_progress_bar=False)
+    failed = False
+    
+    print(f"\n{'backend':<12}{'cos min':>10}{'cos mean':>10}{'single/s':>12}{'batch/s':>12}")
+    print("-" * 56)
+    for backend, service in services.items():
+        embeddings = service._encode(texts, show_progress_bar=False)
+        similarity = cosine(reference, embeddings)
+        single = throughput(service, texts[:args.single_limit], batched=False)
+        batch = throughput(service, texts, batched=True)
+        print(f"{backend:<12}{similarity.min():>10.4f}{similarity.mean():>10.4f}{single:>12.1f}{batch:>12.1f}")
+        if similarity.min() < args.min_cosine:
+            failed = True
+    
+    if failed:
+        print(f"\nPARITY FAILED: a backend fell below cosine {args.min_cosine}")
+        return 1
+    print(f"\nParity OK (all backends >= cosine {args.min_cosine})")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding backend parity and throughput")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx_int8"], choices=["onnx", "onnx_int8"])
+    parser.add_argument("--min-cosine", dest="min_cosine", type=float, default=0.99)
+    parser.add_argument("--threads", type=int, default=get_settings().embedding_onnx_threads)
+    parser.add_argument("--limit", type=int, default=256)
+    parser.add_argument("--single-limit", dest="single_limit", type=int, default=64)
+    sys.exit(run_benchmark(parser.parse_args()))
@@ -0,0 +1,108 @@
+"""
+Recall-vs-latency report for the FAISS index backends.
+
+Builds every backend (flat, ivf_flat, ivf_pq, hnsw) over the same vectors,
+runs the same queries, and reports recall@k against the exact flat index
+together with mean per-query latency for a sweep of nprobe / efSearch.
+
+Vectors come from the saved index (FAISS_INDEX_PATH, must be a flat or
+HNSW index) or, with --synthetic N, from N random unit vectors, which is
+useful for projecting behaviour at corpus sizes we don't have yet.
+
+Usage:
+    python benchmark_index.py --synthetic 200000 --queries 500 --k 5
+"""
+
+import argparse
+import sys
+import os
+import time
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rag.vector_store import VectorStore, normalize_rows
+from config.settings import get_settings
+
+def load_vectors(args) -> np.ndarray:
+    """Vectors to benchmark on (saved index or synthetic)."""
+    if args.synthetic:
+        rng = np.random.default_rng(42)
+        return normalize_rows(rng.standard_normal((args.synthetic, args.dimension)))
+    
+    settings = get_settings()
+    store = VectorStore(args.dimension)
+    store.load(settings.faiss_index_path)
+    vectors, _ = store._export_vectors()
+    return vectors
+
+def time_queries(store: VectorStore, queries: np.ndarray, k: int, **params):
+    """Run every query one at a time, as the API does. Returns (ids, ms/query)."""
+    found = []
+    start = time.perf_counter()
+    for query in queries:
+        with store._lock:
+            store._set_search_params(params.get("nprobe"), params.get("ef_search"))
+            _, ids = store.index.search(query.reshape(1, -1), k)
+        found.append(ids[0])
+    elapsed = time.perf_counter() - start
+    return np.array(found), elapsed * 1000 / len(queries)
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+def run_benchmark(args):
+    vectors = load_vectors(args)
+    n, dimension = vectors.shape
+    ids = np.arange(n, dtype=np.int64)
+    
+    rng = np.random.default_rng(7)
+    sample = rng.choice(n, size=min(args.queries, n), replace=False)
+    queries = normalize_rows(vectors[sample] + 0.05 * rng.standard_normal((len(sample), dimension)))
+    
+    print("=" * 60)
+    print(f"Benchmark: {n} vectors, dim {dimension}, {len(queries)} queries, k={args.k}")
+    print("=" * 60)
+    
+    results = []
+    truth = None
+    for index_type, sweep_param, sweep in [
+        ("flat", None, [None]),
+        ("ivf_flat", "nprobe", [1, 4, 8, 16, 32]),
+        ("ivf_pq", "nprobe", [1, 4, 8, 16, 32]),
+        ("hnsw", "ef_search", [16, 32, 64, 128]),
+    ]:
+        store = VectorStore(dimension, index_type=index_type, nlist=args.nlist, pq_m=args.pq_m)
+        if index_type != "flat" and n < store._min_train_size():
+            print(f"Skipping {index_type}: needs at least {store._min_train_size()} vectors")
+            continue
+        
+        start = time.perf_counter()
+        store._rebuild_index(index_type, vectors, ids)
+        build_s = time.perf_counter() - start
+        
+        for value in sweep:
+            params = {sweep_param: value} if sweep_param else {}
+            found, ms = time_queries(store, queries, args.k, **params)
+            if truth is None:
+                truth = found
+            label = f"{sweep_param}={value}" if sweep_param else "exact"
+            results.append((index_type, label, recall_at_k(found, truth), ms, build_s))
+    
+    print(f"\n{'index':<10}{'setting':<16}{'recall@k':>10}{'ms/query':>12}{'build s':>10}")
+    print("-" * 58)
+    for index_type, label, recall, ms, build_s in results:
+        print(f"{index_type:<10}{label:<16}{recall:>10.3f}{ms:>12.3f}{build_s:>10.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare FAISS index backends")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random vectors instead of the saved index")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=get_settings().faiss_nlist)
+    parser.add_argument("--pq-m", dest="pq_m", type=int, default=get_settings().faiss_pq_m)
+    run_benchmark(parser.parse_args())
@@ -6,14 +6,97 @@ class Settings(BaseSettings):
     llm_provider: str = "gemini"
     gemini_api_key: str = ""
     openai_api_key: str = ""
+    llm_timeout_seconds: float = 15.0
+    
+    # Multi-provider routing (see services/llm_router.py)
+    llm_providers: str = ""  # Extra providers, comma-separated (e.g. "openai"); llm_provider stays primary
+    llm_routing_policy: str = "failover"  # failover | fastest | cheapest
+    llm_hedge_enabled: bool = False  # Second request (next provider) when the first exceeds its p95 after admission
+    llm_hedge_min_delay_ms: float = 1000.0
+    
+    # LLM rate limiting and retries (see services/rate_limiter.py)
+    llm_requests_per_minute: float = 0  # Provider quota; 0 = unlimited
+    llm_tokens_per_minute: float = 0  # Prompt + completion tokens; 0 = unlimited
+    llm_max_retries: int = 3  # For 429 / 5xx / connection errors
+    llm_retry_base_seconds: float = 0.5
+    llm_retry_max_seconds: float = 20.0
+    llm_breaker_failures: int = 5  # Consecutive failures that open the circuit; 0 = off
+    llm_breaker_cooldown_seconds: float = 30.0
+    
+    # LLM HTTP connection pools (see services/http_pool.py)
+    llm_pool_max_connections: int = 0  # Per provider; 0 = 2 x batch_max_concurrency (min 10)
+    llm_pool_max_keepalive: int = 0  # Idle connections kept; 0 = pool size
+    llm_pool_keepalive_seconds: float = 60.0
+    llm_pool_warm_connections: int = 2  # Opened at startup; 0 = no warm-up
+    llm_connect_timeout_seconds: float = 5.0
+    llm_http2: bool = False  # Requires the h2 package
+    
+    # LLM Response Cache ("" path = memory tier only)
+    llm_cache_enabled: bool = True
+    llm_cache_max_entries: int = 256
+    llm_cache_path: str = ""
+    llm_cache_ttl_seconds: int = 86400
+    llm_cache_max_disk_entries: int = 10000
+    
+    # Provider prompt caching of static prompt prefixes (see services/prompt_cache.py)
+    llm_prompt_cache_enabled: bool = True
+    llm_prompt_cache_ttl_seconds: int = 3600  # Lifetime of Gemini context caches
+    llm_prompt_cache_min_tokens: int = 1024  # Smaller prefixes rely on implicit caching; check the model's minimum
+    
+    # Q&A session store (see services/session_store.py)
+    qa_session_backend: str = "memory"  # memory (single worker) | sqlite | redis
+    qa_session_path: str = "./cache/qa_sessions.sqlite3"
+    qa_session_redis_url: str = "redis://localhost:6379/0"
+    qa_session_cache_size: int = 1024  # Sessions kept in each worker's memory tier
+    qa_session_memory_ttl_seconds: float = 5.0  # Memory tier re-reads the shared backend after this
+    qa_session_ttl_seconds: int = 86400
+    qa_batch_max_prompt_tokens: int = 6000  # Questions + answers + criteria per batch evaluation call
     
     # Firebase
     firebase_credentials_path: str = ""
     
     # RAG Configuration
     embeddings_model: str = "all-MiniLM-L6-v2"
+    embedding_backend: str = "torch"  # torch | onnx | onnx_int8
+    embedding_onnx_dir: str = "./rag/onnx_models"
+    embedding_onnx_threads: int = 0  # 0 = ONNX Runtime default
+    embedding_cache_size: int = 1024
+    embedding_cache_path: str = ""  # .npz file; "" = don't persist
+    embedding_batch_max_size: int = 32
+    embedding_batch_max_wait_ms: float = 5.0
     faiss_index_path: str = "./rag/faiss_index"
     knowledge_base_path: str = "./rag/knowledge_base"
+    rag_min_score: float = 0.2  # Min cosine similarity for retrieved chunks
+    chunk_max_tokens: int = 0  # 0 = embedding model's max sequence length
+    chunk_overlap_tokens: int = 32
+    
+    # Knowledge-base ingestion (see rag/ingest.py)
+    ingest_workers: int = 0  # Chunking processes; 0 = min(4, CPU count)
+    ingest_batch_size: int = 64  # Chunks per embedding batch
+    ingest_queue_batches: int = 4  # Batches buffered ahead of the embedder
+    ingest_checkpoint_every: int = 2048  # Chunks between index checkpoints; 0 = off
+    
+    # FAISS index backend: flat | ivf_flat | ivf_pq | hnsw
+    faiss_index_type: str = "flat"
+    faiss_nlist: int = 100
+    faiss_pq_m: int = 16
+    faiss_pq_nbits: int = 8
+    faiss_hnsw_m: int = 32
+    faiss_ef_construction: int = 40
+    faiss_nprobe: int = 8
+    faiss_ef_search: int = 64
+    
+    # Analysis prompt size (see services/prompt_budget.py)
+    prompt_token_budget: int = 3000  # Estimated input tokens per analysis prompt; 0 = unlimited
+    prompt_dedupe_threshold: float = 0.8  # Share of a chunk already sent that makes it a duplicate
+    
+    # Batch analysis jobs (see services/batch_analyzer.py)
+    batch_max_items: int = 500  # Pitches per batch
+    batch_max_concurrency: int = 8  # LLM calls in flight across all jobs
+    batch_job_ttl_seconds: int = 3600  # Finished jobs are kept this long
+    
+    # Admin endpoints (e.g. /api/admin/reindex) require X-Admin-Token when set
+    admin_token: str = ""
     
     # Server Configuration
     host: str = "0.0.0.0"
@@ -5,31 +5,51 @@ Run this once before starting the server to:
 1. Load VC knowledge documents
 2. Generate embeddings
 3. Build FAISS index
+
+Re-running it is incremental: only new or changed documents are embedded
+and chunks of deleted documents are removed. An interrupted build resumes
+from its last checkpoint. Pass --rebuild to start over.
+
+Documents can be .txt, .md or .pdf files in KNOWLEDGE_BASE_PATH.
+
+Usage:
+    python initialize_rag.py [--rebuild]
 """
 
+import argparse
 import sys
 import os
 
 # Add backend to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from rag.embeddings import get_embedding_service
 from rag.retriever import get_rag_retriever
 from config.settings import get_settings
 
-def initialize_rag():
-    """Initialize the RAG system with VC knowledge."""
+def initialize_rag(rebuild: bool = False):
+    """Initialize (or incrementally update) the RAG system with VC knowledge."""
     print("=" * 60)
     print("VCRAFT AI - RAG Initialization")
     print("=" * 60)
     
     settings = get_settings()
+    get_embedding_service(settings.embeddings_model)
     retriever = get_rag_retriever()
     
-    print("\nInitializing knowledge base...")
-    retriever.initialize_knowledge_base(settings.knowledge_base_path)
+    if rebuild:
+        print("\nRebuilding knowledge base from scratch...")
+    else:
+        print("\nLoading existing index...")
+        try:
+            retriever.load_index(settings.faiss_index_path)
+        except Exception as e:
+            print(f"No usable index ({e}). Building from scratch.")
     
-    print("\nSaving FAISS index...")
-    retriever.save_index(settings.faiss_index_path)
+    print("\nSyncing knowledge base and saving FAISS index...")
+    report = retriever.reindex(settings.knowledge_base_path, settings.faiss_index_path)
+    print(f"Added {report['added_chunks']} chunks, removed {report['removed_chunks']}, "
+          f"total {report['total_chunks']} ({report['chunks_per_sec']} chunks/sec)")
     
     print("\n" + "=" * 60)
     print("RAG initialization complete!")
@@ -37,4 +57,7 @@ def initialize_rag():
     print("\nYou can now start the FastAPI server.")
 
 if __name__ == "__main__":
-    initialize_rag()
+    parser = argparse.ArgumentParser(description="Build or update the VCRAFT AI RAG index")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the saved index and re-embed everything")
+    args = parser.parse_args()
+    initialize_rag(rebuild=args.rebuild)
@@ -63,8 +63,10 @@ async def startup_event():
         logger.info("[STARTUP] Step 2: Pre-loading SentenceTransformer model...")
         logger.info("[STARTUP] This may take 10-30 seconds on first run...")
         from rag.embeddings import get_embedding_service
-        embedding_service = get_embedding_service()
+        embedding_service = get_embedding_service(settings.embeddings_model)
         logger.info(f"[STARTUP] ✓ SentenceTransformer loaded. Dimension: {embedding_service.get_dimension()}")
+        if settings.embedding_cache_path:
+            embedding_service.load_cache(settings.embedding_cache_path)
         
         # STEP 3: Initialize FAISS vector store
         logger.info("[STARTUP] Step 3: Initializing FAISS vector store...")
@@ -72,19 +74,23 @@ async def startup_event():
         vector_store = get_vector_store(embedding_service.get_dimension())
         logger.info("[STARTUP] ✓ FAISS index initialized")
         
-        # STEP 4: Load RAG knowledge base
+        # STEP 4: Load RAG knowledge base (persisted index if still valid)
         logger.info("[STARTUP] Step 4: Loading RAG knowledge base...")
         from rag.retriever import get_rag_retriever
         retriever = get_rag_retriever()
-        knowledge_base_path = "./rag/knowledge_base"
-        retriever.initialize_knowledge_base(knowledge_base_path)
-        logger.info("[STARTUP] ✓ RAG knowledge base loaded")
+        retriever.load_or_build(settings.knowledge_base_path, settings.faiss_index_path)
+        logger.info(f"[STARTUP] ✓ RAG knowledge base loaded ({retriever.vector_store.size()} chunks)")
         
         # STEP 5: Pre-initialize LLM service
         logger.info("[STARTUP] Step 5: Initializing LLM service...")
-        from services.llm_service import get_llm_service
-        llm_service = get_llm_service()
-        logger.info(f"[STARTUP] ✓ LLM service ready: {settings.llm_provider}")
+        from services.llm_router import get_llm_router
+        llm_router = get_llm_router()
+        logger.info(f"[STARTUP] ✓ LLM service ready: {[s.provider for s in llm_router.services]}")
+        
+        # STEP 6: Warm up LLM connection pools (TCP + TLS before the first request)
+        logger.info("[STARTUP] Step 6: Warming up LLM connection pools...")
+        warmed = await asyncio.gather(*(service.warm_up() for service in llm_router.services))
+        logger.info(f"[STARTUP] ✓ Warm connections: {dict(zip([s.provider for s in llm_router.services], warmed))}")
         
         logger.info("=" * 70)
         logger.info("✓ STARTUP COMPLETE - All models loaded and ready!")
@@ -99,6 +105,23 @@ async def startup_event():
         # Don't raise - let the app start so we can see health endpoint
         # But log prominently that it's broken
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Persist warm caches so the next boot doesn't start cold, and close LLM connections."""
+    from services.llm_service import _llm_services
+    for service in _llm_services.values():
+        try:
+            await service.aclose()
+        except Exception as e:
+            logger.warning(f"[SHUTDOWN] Failed to close {service.provider} connections: {e}")
+    
+    if settings.embedding_cache_path:
+        try:
+            from rag.embeddings import get_embedding_service
+            get_embedding_service().save_cache(settings.embedding_cache_path)
+        except Exception as e:
+            logger.warning(f"[SHUTDOWN] Failed to save embedding cache: {e}")
+
 # Include routers
 app.include_router(router)
 
@@ -112,9 +135,42 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    # Only services that are already up: a health probe must never load
+    # models or build indexes on the event loop
+    from services import llm_router, pitch_analyzer, session_store
+    from rag import batcher, embeddings
+    try:
+        router_instance = llm_router._llm_router
+        # The disk tier counts its SQLite rows - keep that off the event loop
+        llm_cache = await asyncio.to_thread(router_instance.get_cache_stats) if router_instance else {}
+        llm_router_stats = router_instance.get_stats() if router_instance else {}
+    except Exception:
+        llm_cache = {}
+        llm_router_stats = {}
+    try:
+        analysis = pitch_analyzer._pitch_analyzer.get_stats() if pitch_analyzer._pitch_analyzer else {}
+    except Exception:
+        analysis = {}
+    try:
+        qa_sessions = session_store._session_store.get_stats() if session_store._session_store else {}
+    except Exception:
+        qa_sessions = {}
+    try:
+        service = embeddings._embedding_service
+        embedding_cache = service.get_cache_stats() if service else {}
+        embedding_batcher = batcher._embedding_batcher.get_stats() if batcher._embedding_batcher else {}
+    except Exception:
+        embedding_cache = {}
+        embedding_batcher = {}
     return {
         "status": "healthy",
-        "environment": settings.environment
+        "environment": settings.environment,
+        "llm_cache": llm_cache,
+        "llm_router": llm_router_stats,
+        "analysis": analysis,
+        "qa_sessions": qa_sessions,
+        "embedding_cache": embedding_cache,
+        "embedding_batcher": embedding_batcher
     }
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from typing import Dict, List, Optional
 
 class SectionScore(BaseModel):
@@ -22,6 +22,18 @@ class AnalysisResponse(BaseModel):
     feedback: Dict[str, str]
     recommendations: List[str]
     
+    # Why the LLM analysis failed, if this is a placeholder (not serialized)
+    _fallback_reason: Optional[str] = PrivateAttr(default=None)
+    
+    @property
+    def fallback_reason(self) -> Optional[str]:
+        return self._fallback_reason
+    
+    @property
+    def is_fallback(self) -> bool:
+        """True if the LLM failed and this is a generic fallback analysis."""
+        return self._fallback_reason is not None
+    
     class Config:
         json_schema_extra = {
             "example": {
@@ -0,0 +1,39 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from models.pitch import PitchRequest
+from models.analysis import AnalysisResponse
+
+class BatchAnalysisRequest(BaseModel):
+    pitches: List[PitchRequest] = Field(..., min_length=1, description="Pitches to analyze (max BATCH_MAX_ITEMS)")
+
+class BatchItemResult(BaseModel):
+    index: int  # Position in the submitted pitches list
+    status: str  # pending, running, completed, failed, cancelled
+    analysis: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+    duplicate_of: Optional[int] = None  # Index of the identical pitch this result was shared from
+
+class BatchJobStatus(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed, cancelled
+    total: int
+    unique: int  # Distinct pitches actually analyzed (identical ones are deduplicated)
+    completed: int
+    failed: int
+    created_at: float
+    finished_at: Optional[float] = None
+    items: Optional[List[BatchItemResult]] = None
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "job_id": "b7f3c2d1e4a5",
+                "status": "running",
+                "total": 120,
+                "unique": 117,
+                "completed": 48,
+                "failed": 1,
+                "created_at": 1760000000.0,
+                "finished_at": None
+            }
+        }
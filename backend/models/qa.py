@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class Question(BaseModel):
     id: str
@@ -7,6 +7,18 @@ class Question(BaseModel):
     category: str
     difficulty: str  # easy, medium, hard
 
+class StoredQuestion(Question):
+    # Kept server-side so evaluate-answer knows what was asked
+    investor_persona: str
+    evaluation_sources: Optional[List[str]] = None  # VC knowledge for evaluating answers (None = not retrieved yet)
+
+class QASession(BaseModel):
+    # Q&A context kept per analysis (see services/session_store.py)
+    analysis_id: str
+    pitch_summary: str
+    investor_persona: Optional[str] = None  # Analysis persona, then the persona asking the questions
+    questions: List[StoredQuestion] = []  # Latest generated set
+
 class QuestionRequest(BaseModel):
     analysis_id: str
     investor_persona: str
@@ -36,3 +48,40 @@ class AnswerEvaluation(BaseModel):
                 ]
             }
         }
+
+class AnswerItem(BaseModel):
+    question_id: str
+    answer: str = Field(..., min_length=10)
+
+class BatchAnswerRequest(BaseModel):
+    analysis_id: str
+    answers: List[AnswerItem] = Field(..., min_length=1, max_length=10, description="One answer per question")
+
+class QuestionEvaluation(BaseModel):
+    question_id: str
+    category: str
+    score: int = Field(..., ge=0, le=10)
+    feedback: str
+    improvement_tips: List[str]
+
+class BatchAnswerEvaluation(BaseModel):
+    evaluations: List[QuestionEvaluation]  # In request order
+    average_score: float
+    category_scores: Dict[str, float]  # Average score per question category
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "evaluations": [
+                    {
+                        "question_id": "q1",
+                        "category": "business_model",
+                        "score": 8,
+                        "feedback": "Strong answer with specific metrics. Good use of CAC/LTV ratio.",
+                        "improvement_tips": ["Consider mentioning your payback period"]
+                    }
+                ],
+                "average_score": 8.0,
+                "category_scores": {"business_model": 8.0}
+            }
+        }
@@ -6,50 +6,19 @@ These prompts are engineered to:
 2. Adapt to investor persona
 3. Force structured JSON output
 4. Provide actionable, specific feedback
+
+Everything that is the same for every analysis (role, task, criteria,
+JSON schema) lives in the system prompt, which is a byte-stable constant:
+providers cache it (services/prompt_cache.py), so it is billed and
+processed as cached tokens. The user prompt carries only the persona, the
+retrieved knowledge and the pitch, in that order (least to most variable).
 """
 
 from .personas import get_persona_context
 
-def get_analysis_prompt(pitch_idea: str, pitch_deck_text: str, industry: str, 
-                       investor_persona: str, rag_context: str) -> str:
-    """
-    Generate the full pitch analysis prompt.
-    
-    This is the CORE prompt that drives the analysis quality.
-    
-    Args:
-        pitch_idea: Startup description
-        pitch_deck_text: Additional pitch details
-        industry: Startup industry
-        investor_persona: Investor type
-        rag_context: Retrieved VC knowledge
-        
-    Returns:
-        Complete prompt string
-    """
-    
-    persona_context = get_persona_context(investor_persona)
-    
-    prompt = f"""
-You are an expert venture capital analyst evaluating a startup pitch.
-
-{persona_context}
-
-{rag_context}
-
-STARTUP PITCH TO EVALUATE:
-Industry: {industry}
-
-Pitch:
-{pitch_idea}
-
-Additional Details:
-{pitch_deck_text if pitch_deck_text else 'Not provided'}
-
----
-
+ANALYSIS_INSTRUCTIONS = """
 YOUR TASK:
-Evaluate this pitch using ONLY the VC knowledge provided above. Do NOT hallucinate or use external knowledge.
+Evaluate the startup pitch you are given using ONLY the VC knowledge provided with it. Do NOT hallucinate or use external knowledge.
 
 Analyze the pitch across these dimensions:
 1. **Problem Clarity**: How well-defined is the problem? Is it significant and painful?
@@ -61,11 +30,11 @@ Analyze the pitch across these dimensions:
 For each dimension:
 - Provide a score from 0-100
 - Write 2-3 sentences of specific, actionable feedback
-- Reference the VC knowledge provided above
+- Reference the VC knowledge provided
 - Consider the investor persona's priorities
 
 CRITICAL REQUIREMENTS:
-- Use ONLY the VC knowledge provided above
+- Use ONLY the VC knowledge provided
 - If information is insufficient, say "Insufficient detail provided on [aspect]"
 - Be specific, not generic
 - Provide actionable recommendations
@@ -73,31 +42,70 @@ CRITICAL REQUIREMENTS:
 - Calculate an overall score (weighted average of sections)
 
 OUTPUT FORMAT (JSON ONLY):
-{{
+{
     "overall_score": <integer 0-100>,
-    "section_scores": {{
+    "section_scores": {
         "problem_clarity": <integer 0-100>,
         "market_opportunity": <integer 0-100>,
         "revenue_model": <integer 0-100>,
         "competitive_moat": <integer 0-100>,
         "scalability": <integer 0-100>
-    }},
-    "feedback": {{
+    },
+    "feedback": {
         "problem_clarity": "<specific feedback>",
         "market_opportunity": "<specific feedback>",
         "revenue_model": "<specific feedback>",
         "competitive_moat": "<specific feedback>",
         "scalability": "<specific feedback>"
-    }},
+    },
     "recommendations": [
         "<actionable recommendation 1>",
         "<actionable recommendation 2>",
         "<actionable recommendation 3>",
         "<actionable recommendation 4>"
     ]
-}}
+}
 
 Respond ONLY with valid JSON. No other text.
+""".strip()
+
+def get_analysis_prompt(pitch_idea: str, pitch_deck_text: str, industry: str, 
+                       investor_persona: str, rag_context: str) -> str:
+    """
+    Generate the pitch analysis prompt (the variable part; see get_system_prompt).
+    
+    This is the CORE prompt that drives the analysis quality.
+    
+    Args:
+        pitch_idea: Startup description
+        pitch_deck_text: Additional pitch details
+        industry: Startup industry
+        investor_persona: Investor type
+        rag_context: Retrieved VC knowledge
+        
+    Returns:
+        Complete prompt string
+    """
+    
+    persona_context = get_persona_context(investor_persona)
+    
+    prompt = f"""
+{persona_context}
+
+{rag_context}
+
+STARTUP PITCH TO EVALUATE:
+Industry: {industry}
+
+Pitch:
+{pitch_idea}
+
+Additional Details:
+{pitch_deck_text if pitch_deck_text else 'Not provided'}
+
+---
+
+Evaluate this pitch for the investor persona above, as instructed. Respond ONLY with valid JSON.
 """
     
     return prompt.strip()
@@ -105,9 +113,10 @@ Respond ONLY with valid JSON. No other text.
 
 def get_system_prompt() -> str:
     """
-    System prompt to set the LLM's role.
+    System prompt: the analyst role plus the full task and output format.
     
-    This is sent as the system message (if supported by the LLM).
+    This is sent as the system message (if supported by the LLM). It must
+    stay byte-stable (no per-request values) so providers can cache it.
     """
     return """
 You are an expert venture capital analyst with 15+ years of experience evaluating startup pitches.
@@ -121,4 +130,4 @@ Your analysis is:
 - Output in strict JSON format
 
 You are helping founders improve their pitches, so be encouraging but honest.
-""".strip()
+""".strip() + "\n\n" + ANALYSIS_INSTRUCTIONS
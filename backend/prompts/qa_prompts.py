@@ -2,43 +2,45 @@
 Q&A Simulation Prompts - Generate and Evaluate VC Questions
 
 These prompts power the Q&A simulator feature.
+
+As with the analysis prompts, each task's static instructions and JSON
+schema live in its system prompt (a byte-stable, cacheable prefix) and the
+user prompt starts with the persona, then the retrieved knowledge, then the
+pitch and answers.
 """
 
-from .personas import get_persona_context
+from typing import Dict, List
 
-def get_question_generation_prompt(pitch_summary: str, investor_persona: str, 
-                                  rag_context: str, num_questions: int = 5) -> str:
-    """
-    Generate prompt for creating VC questions.
-    
-    Args:
-        pitch_summary: Summary of the analyzed pitch
-        investor_persona: Investor type
-        rag_context: Retrieved VC knowledge
-        num_questions: Number of questions to generate
-        
-    Returns:
-        Question generation prompt
-    """
-    
-    persona_context = get_persona_context(investor_persona)
-    
-    prompt = f"""
-You are a {investor_persona.replace('_', ' ')} preparing to interview a startup founder.
+from .personas import get_persona_context
 
-{persona_context}
+# Criteria shared by single and batch answer evaluation
+ANSWER_EVALUATION_GUIDE = """
+1. **Clarity**: Is the answer clear and well-structured?
+2. **Specificity**: Does it include concrete details, metrics, or examples?
+3. **Logic**: Is the reasoning sound?
+4. **Completeness**: Does it fully address the question?
+5. **Confidence**: Does the founder demonstrate deep knowledge?
 
-{rag_context}
+Consider what the investor persona cares about most.
 
-STARTUP PITCH SUMMARY:
-{pitch_summary}
+Provide:
+- Score from 0-10 (10 = excellent VC-ready answer)
+- Constructive feedback (2-3 sentences)
+- 2-3 specific improvement tips
 
----
+Scoring guide:
+- 9-10: Excellent answer with metrics and clear thinking
+- 7-8: Good answer but could be more specific
+- 5-6: Adequate but lacks depth
+- 3-4: Vague or incomplete
+- 0-2: Off-topic or shows lack of understanding
+""".strip()
 
+QUESTION_GENERATION_INSTRUCTIONS = """
 YOUR TASK:
-Generate {num_questions} tough but fair questions that this investor would ask based on:
+Generate the requested number of tough but fair questions that the investor described in the prompt would ask based on:
 1. The investor persona's priorities
-2. Common VC concerns from the knowledge base above
+2. Common VC concerns from the knowledge base provided
 3. Gaps or weaknesses in the pitch
 
 Questions should:
@@ -48,7 +50,7 @@ Questions should:
 - Evaluate strategic thinking
 - Be realistic (what VCs actually ask)
 
-Vary difficulty: include 2 easy, 2 medium, 1 hard question.
+Vary difficulty: about 40% easy, 40% medium and 20% hard questions (for 5 questions: 2 easy, 2 medium, 1 hard).
 
 Categories:
 - business_model: Revenue, pricing, unit economics
@@ -58,19 +60,99 @@ Categories:
 - team: Background, hiring, vision
 
 OUTPUT FORMAT (JSON ONLY):
-{{
+{
     "questions": [
-        {{
+        {
             "id": "q1",
             "question": "<the question>",
             "category": "<category>",
             "difficulty": "<easy|medium|hard>"
+        },
+        ...
+    ]
+}
+
+Respond ONLY with valid JSON. No other text.
+""".strip()
+
+ANSWER_EVALUATION_INSTRUCTIONS = f"""
+YOUR TASK:
+Evaluate the founder's answer to the investor question, based on:
+{ANSWER_EVALUATION_GUIDE}
+
+OUTPUT FORMAT (JSON ONLY):
+{{
+    "score": <integer 0-10>,
+    "feedback": "<constructive 2-3 sentence feedback>",
+    "improvement_tips": [
+        "<specific tip 1>",
+        "<specific tip 2>",
+        "<specific tip 3>"
+    ]
+}}
+
+Respond ONLY with valid JSON. No other text.
+""".strip()
+
+BATCH_ANSWER_EVALUATION_INSTRUCTIONS = f"""
+YOUR TASK:
+You are given a founder's answers to several investor questions from one interview round.
+Evaluate EACH answer independently, based on:
+{ANSWER_EVALUATION_GUIDE}
+
+OUTPUT FORMAT (JSON ONLY):
+{{
+    "evaluations": [
+        {{
+            "question_id": "<question id>",
+            "score": <integer 0-10>,
+            "feedback": "<constructive 2-3 sentence feedback>",
+            "improvement_tips": [
+                "<specific tip 1>",
+                "<specific tip 2>",
+                "<specific tip 3>"
+            ]
         }},
         ...
     ]
 }}
 
+Include one entry per question, in the order given.
 Respond ONLY with valid JSON. No other text.
+""".strip()
+
+def get_question_generation_prompt(pitch_summary: str, investor_persona: str, 
+                                  rag_context: str, num_questions: int = 5) -> str:
+    """
+    Generate prompt for creating VC questions.
+    
+    Use with get_question_generation_system_prompt(), which holds the
+    instructions and output format.
+    
+    Args:
+        pitch_summary: Summary of the analyzed pitch
+        investor_persona: Investor type
+        rag_context: Retrieved VC knowledge
+        num_questions: Number of questions to generate
+        
+    Returns:
+        Question generation prompt
+    """
+    
+    persona_context = get_persona_context(investor_persona)
+    
+    prompt = f"""
+{persona_context}
+
+{rag_context}
+
+STARTUP PITCH SUMMARY:
+{pitch_summary}
+
+---
+
+You are a {investor_persona.replace('_', ' ')} preparing to interview this startup's founder.
+Generate {num_questions} questions. Respond ONLY with valid JSON.
 """
     
     return prompt.strip()
@@ -81,6 +163,8 @@ def get_answer_evaluation_prompt(question: str, answer: str, pitch_context: str,
     """
     Generate prompt for evaluating founder answers.
     
+    Use with get_answer_evaluation_system_prompt().
+    
     Args:
         question: The VC question
         answer: Founder's answer
@@ -95,8 +179,6 @@ def get_answer_evaluation_prompt(question: str, answer: str, pitch_context: str,
     persona_context = get_persona_context(investor_persona)
     
     prompt = f"""
-You are evaluating a startup founder's answer to an investor question.
-
 {persona_context}
 
 {rag_context}
@@ -112,40 +194,53 @@ FOUNDER'S ANSWER:
 
 ---
 
-YOUR TASK:
-Evaluate this answer based on:
-1. **Clarity**: Is the answer clear and well-structured?
-2. **Specificity**: Does it include concrete details, metrics, or examples?
-3. **Logic**: Is the reasoning sound?
-4. **Completeness**: Does it fully address the question?
-5. **Confidence**: Does the founder demonstrate deep knowledge?
+Evaluate this answer as instructed. Respond ONLY with valid JSON.
+"""
 
-Consider what the investor persona cares about most.
+    return prompt.strip()
 
-Provide:
-- Score from 0-10 (10 = excellent VC-ready answer)
-- Constructive feedback (2-3 sentences)
-- 2-3 specific improvement tips
 
-Scoring guide:
-- 9-10: Excellent answer with metrics and clear thinking
-- 7-8: Good answer but could be more specific
-- 5-6: Adequate but lacks depth
-- 3-4: Vague or incomplete
-- 0-2: Off-topic or shows lack of understanding
+def get_batch_answer_evaluation_prompt(answers: List[Dict[str, str]], pitch_context: str,
+                                      investor_persona: str, rag_context: str) -> str:
+    """
+    Generate prompt for evaluating several founder answers in one call.
+    
+    Use with get_batch_answer_evaluation_system_prompt().
+    
+    Args:
+        answers: Dicts with question_id, question and answer
+        pitch_context: Context about the pitch
+        investor_persona: Investor type
+        rag_context: Retrieved VC knowledge for all the questions
+        
+    Returns:
+        Batch answer evaluation prompt
+    """
+    
+    persona_context = get_persona_context(investor_persona)
+    
+    answer_blocks = "\n\n".join(
+        f"""QUESTION {item['question_id']}:
+{item['question']}
 
-OUTPUT FORMAT (JSON ONLY):
-{{
-    "score": <integer 0-10>,
-    "feedback": "<constructive 2-3 sentence feedback>",
-    "improvement_tips": [
-        "<specific tip 1>",
-        "<specific tip 2>",
-        "<specific tip 3>"
-    ]
-}}
+FOUNDER'S ANSWER:
+{item['answer']}"""
+        for item in answers
+    )
+    
+    prompt = f"""
+{persona_context}
 
-Respond ONLY with valid JSON. No other text.
+{rag_context}
+
+PITCH CONTEXT:
+{pitch_context}
+
+{answer_blocks}
+
+---
+
+Evaluate each answer as instructed. Respond ONLY with valid JSON.
 """
     
     return prompt.strip()
@@ -169,3 +264,18 @@ When evaluating answers, you look for:
 
 You are tough but fair, helping founders prepare for real investor meetings.
 """.strip()
+
+
+def get_question_generation_system_prompt() -> str:
+    """System prompt for question generation: role, task and output format (byte-stable)."""
+    return f"{get_qa_system_prompt()}\n\n{QUESTION_GENERATION_INSTRUCTIONS}"
+
+
+def get_answer_evaluation_system_prompt() -> str:
+    """System prompt for single answer evaluation (byte-stable)."""
+    return f"{get_qa_system_prompt()}\n\n{ANSWER_EVALUATION_INSTRUCTIONS}"
+
+
+def get_batch_answer_evaluation_system_prompt() -> str:
+    """System prompt for batch answer evaluation (byte-stable)."""
+    return f"{get_qa_system_prompt()}\n\n{BATCH_ANSWER_EVALUATION_INSTRUCTIONS}"
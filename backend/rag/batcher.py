@@ -0,0 +1,156 @@
+"""
+Embedding Micro-Batcher - Coalesces concurrent query embeddings
+
+Each request used to run its own single-sentence forward pass. Under
+concurrency, SentenceTransformer is much more efficient with one batched
+encode, so pending queries are gathered over a short window and embedded
+together off the event loop, then the results are fanned back out.
+
+- Low load: a lone query waits at most `max_wait_ms` before running
+- High load: batches fill to `max_batch_size` and run back to back
+- Cache hits (see EmbeddingService) return immediately, never queued
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .embeddings import EmbeddingService, get_embedding_service
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Async front end for EmbeddingService that batches concurrent calls.
+    """
+    
+    def __init__(self, embedding_service: EmbeddingService, max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0):
+        """
+        Args:
+            embedding_service: Service that owns the model
+            max_batch_size: Max texts per model call
+            max_wait_ms: Max time the first queued text waits for company
+        """
+        self.embedding_service = embedding_service
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        # One model call at a time; the next batch fills while it runs
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-batch")
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        
+        self.batches = 0
+        self.batched_texts = 0
+        self.cache_hits = 0
+    
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Embed one text, sharing a model call with concurrent callers.
+        
+        Args:
+            text: Input text string
+        
+        Returns:
+            numpy array of embeddings
+        """
+        cached = self.embedding_service.get_cached(text)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+    
+    async def embed_many(self, texts: List[str]) -> np.ndarray:
+        """Embed several texts (each joins the shared batches)."""
+        if not texts:
+            return np.zeros((0, self.embedding_service.get_dimension()), dtype=np.float32)
+        vectors = await asyncio.gather(*(self.embed(text) for text in texts))
+        return np.stack(vectors)
+    
+    def _ensure_worker(self):
+        """Start the batching task on the running loop (once per loop)."""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+    
+    async def _run(self):
+        """Collect queued texts into batches and embed them."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._process(batch)
+    
+    async def _process(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Run one model call for a batch and resolve its futures."""
+        # Callers that gave up (cancelled requests) don't need a vector
+        batch = [(text, future) for text, future in batch if not future.done()]
+        if not batch:
+            return
+        
+        texts = [text for text, _ in batch]
+        start = time.perf_counter()
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                lambda: self.embedding_service.embed_batch(texts, show_progress_bar=False)
+            )
+        except Exception as e:
+            logger.error(f"[EMBED-BATCH] Batch of {len(texts)} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        self.batches += 1
+        self.batched_texts += len(texts)
+        logger.debug(f"[EMBED-BATCH] Embedded {len(texts)} texts in {(time.perf_counter() - start) * 1000:.1f}ms")
+        
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+    
+    def get_stats(self) -> Dict[str, float]:
+        """Batching counters for monitoring."""
+        return {
+            "batches": self.batches,
+            "batched_texts": self.batched_texts,
+            "avg_batch_size": round(self.batched_texts / self.batches, 2) if self.batches else 0.0,
+            "cache_hits": self.cache_hits,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+# Global instance
+_embedding_batcher = None
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Get or create global embedding batcher instance."""
+    global _embedding_batcher
+    if _embedding_batcher is None:
+        from config.settings import get_settings
+        settings = get_settings()
+        _embedding_batcher = EmbeddingBatcher(
+            get_embedding_service(),
+            max_batch_size=settings.embedding_batch_max_size,
+            max_wait_ms=settings.embedding_batch_max_wait_ms
+        )
+    return _embedding_batcher
@@ -0,0 +1,219 @@
+"""
+Chunk Store - Compact on-disk storage for document chunk text.
+
+Replaces the pickled {id: text} dict that every worker used to
+deserialize in full. On disk a store is three files:
+- chunks.bin: every chunk's UTF-8 bytes, back to back
+- chunk_ids.npy: sorted int64 chunk IDs
+- chunk_offsets.npy: int64 byte offsets into chunks.bin (len(ids) + 1)
+
+Each save writes the three under a new version suffix (chunks.<v>.bin, ...)
+and then swaps chunk_store.json, which names the current version, in one
+os.replace - a loading worker sees either the old set or the new one,
+never new offsets over an old blob.
+
+All three are memory-mapped read-only, so uvicorn workers share the pages
+through the OS cache and a chunk is only decoded when it is a search hit.
+Edits made after loading (incremental indexing) live in a small in-memory
+overlay until the next save() writes a fresh, compacted store.
+
+No pickle: loading never executes code from the index directory.
+"""
+
+import json
+import mmap
+import os
+import uuid
+from typing import Dict, Iterable, Iterator, Optional, Set
+
+import numpy as np
+
+BLOB_FILE = "chunks.bin"
+IDS_FILE = "chunk_ids.npy"
+OFFSETS_FILE = "chunk_offsets.npy"
+POINTER_FILE = "chunk_store.json"
+
+
+def _versioned(file_name: str, version: str) -> str:
+    """chunks.bin -> chunks.<version>.bin ("" = the unversioned name)."""
+    if not version:
+        return file_name
+    stem, ext = os.path.splitext(file_name)
+    return f"{stem}.{version}{ext}"
+
+
+def _current_version(path: str) -> str:
+    """Version named by the pointer file ("" for a store without one)."""
+    try:
+        with open(os.path.join(path, POINTER_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)["version"]
+    except FileNotFoundError:
+        return ""
+
+
+class ChunkStore:
+    """
+    Chunk ID -> text mapping backed by a memory-mapped blob plus an overlay.
+    
+    Lookups check the overlay (chunks added since load), then the
+    memory-mapped base via binary search over the sorted ID array.
+    """
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        """Drop all chunks."""
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._blob = b""
+        self._added: Dict[int, str] = {}
+        self._removed: Set[int] = set()
+    
+    def get(self, chunk_id: int) -> Optional[str]:
+        """Decode one chunk's text (None if the ID isn't stored)."""
+        text = self._added.get(chunk_id)
+        if text is not None:
+            return text
+        pos = self._find(chunk_id)
+        if pos is None:
+            return None
+        return bytes(self._blob[self._offsets[pos]:self._offsets[pos + 1]]).decode("utf-8")
+    
+    def update(self, ids: Iterable[int], texts: Iterable[str]):
+        """Add (or replace) chunks."""
+        for chunk_id, text in zip(ids, texts):
+            chunk_id = int(chunk_id)
+            if self._find(chunk_id) is not None:
+                # Shadowed base entry: hide it so it isn't saved twice
+                self._removed.add(chunk_id)
+            self._added[chunk_id] = text
+    
+    def remove(self, ids: Iterable[int]):
+        """Remove chunks by ID (unknown IDs are ignored)."""
+        for chunk_id in ids:
+            chunk_id = int(chunk_id)
+            self._added.pop(chunk_id, None)
+            if self._find(chunk_id) is not None:
+                self._removed.add(chunk_id)
+    
+    def ids(self) -> Iterator[int]:
+        """Every stored chunk ID."""
+        for chunk_id in self._ids:
+            if int(chunk_id) not in self._removed:
+                yield int(chunk_id)
+        yield from self._added
+    
+    def max_id(self) -> int:
+        """Largest stored chunk ID (-1 when empty)."""
+        base_max = next(
+            (int(chunk_id) for chunk_id in self._ids[::-1] if int(chunk_id) not in self._removed), -1
+        )
+        return max(base_max, max(self._added, default=-1))
+    
+    def __contains__(self, chunk_id: int) -> bool:
+        return chunk_id in self._added or self._find(chunk_id) is not None
+    
+    def __len__(self) -> int:
+        return len(self._ids) - len(self._removed) + len(self._added)
+    
+    def save(self, path: str):
+        """
+        Write a compacted store (base minus removals, plus the overlay).
+        
+        The files get a new version suffix and the pointer file is swapped
+        last, so a store another worker has memory-mapped (or is loading)
+        is never changed under it. Files of older versions are then removed;
+        workers that mapped them keep their open mappings.
+        
+        Args:
+            path: Directory path to save files
+        """
+        ids = np.array(sorted(self.ids()), dtype=np.int64)
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        version = uuid.uuid4().hex[:12]
+        
+        with open(os.path.join(path, _versioned(BLOB_FILE, version)), "wb") as f:
+            for i, chunk_id in enumerate(ids):
+                data = self._raw(int(chunk_id))
+                f.write(data)
+                offsets[i + 1] = offsets[i] + len(data)
+        np.save(os.path.join(path, _versioned(IDS_FILE, version)), ids)
+        np.save(os.path.join(path, _versioned(OFFSETS_FILE, version)), offsets)
+        
+        pointer_path = os.path.join(path, POINTER_FILE)
+        with open(pointer_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": version}, f)
+        os.replace(pointer_path + ".tmp", pointer_path)
+        
+        current = {_versioned(name, version) for name in (BLOB_FILE, IDS_FILE, OFFSETS_FILE)}
+        prefixes = tuple(os.path.splitext(name)[0] + "." for name in (BLOB_FILE, IDS_FILE, OFFSETS_FILE))
+        for file_name in os.listdir(path):
+            stale = file_name in (BLOB_FILE, IDS_FILE, OFFSETS_FILE) or (
+                file_name.startswith(prefixes) and file_name not in current
+            )
+            if stale:
+                try:
+                    os.remove(os.path.join(path, file_name))
+                except OSError:
+                    pass  # Still mapped (Windows); removed by a later save
+    
+    def load(self, path: str):
+        """
+        Memory-map a store written by save().
+        
+        Args:
+            path: Directory path to load files from
+        """
+        for attempt in range(2):
+            version = _current_version(path)
+            try:
+                self._load_version(path, version)
+                return
+            except FileNotFoundError:
+                # A concurrent save may have replaced (and deleted) this version: look once more
+                if attempt or version == _current_version(path):
+                    raise
+    
+    def _load_version(self, path: str, version: str):
+        file_paths = [os.path.join(path, _versioned(name, version))
+                      for name in (BLOB_FILE, IDS_FILE, OFFSETS_FILE)]
+        if not all(os.path.exists(file_path) for file_path in file_paths):
+            raise FileNotFoundError(f"Chunk store not found at {path}")
+        blob_path, ids_path, offsets_path = file_paths
+        
+        # allow_pickle: an .npy holding Python objects is rejected
+        ids = np.load(ids_path, mmap_mode="r", allow_pickle=False)
+        offsets = np.load(offsets_path, mmap_mode="r", allow_pickle=False)
+        if ids.dtype != np.int64 or offsets.dtype != np.int64 or len(offsets) != len(ids) + 1:
+            raise ValueError(f"Corrupt chunk store at {path}")
+        
+        blob = b""
+        if offsets[-1] > 0:
+            with open(blob_path, "rb") as f:
+                blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(blob) != offsets[-1]:
+                blob.close()
+                raise ValueError(f"Corrupt chunk store at {path}")
+        
+        self.reset()
+        self._ids = ids
+        self._offsets = offsets
+        self._blob = blob
+    
+    def _find(self, chunk_id: int) -> Optional[int]:
+        """Position of a live base entry in the ID array."""
+        if chunk_id in self._removed:
+            return None
+        pos = int(np.searchsorted(self._ids, chunk_id))
+        if pos < len(self._ids) and self._ids[pos] == chunk_id:
+            return pos
+        return None
+    
+    def _raw(self, chunk_id: int) -> bytes:
+        """A chunk's UTF-8 bytes (copied from the base without decoding)."""
+        text = self._added.get(chunk_id)
+        if text is not None:
+            return text.encode("utf-8")
+        pos = self._find(chunk_id)
+        return bytes(self._blob[self._offsets[pos]:self._offsets[pos + 1]])
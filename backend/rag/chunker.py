@@ -0,0 +1,213 @@
+"""
+Token-aware, structure-aware chunker.
+
+The old chunker cut 500-word windows, but the embedding model only sees
+its first max_seq_length tokens (256 for MiniLM), so most of each chunk was
+never embedded. This one:
+- Streams files line by line (a large file is never read whole)
+- Splits on document structure first: headings and paragraphs
+- Packs consecutive blocks into chunks sized by the embedding model's own
+  tokenizer, so every chunk fits the model's max sequence length
+- Starts a new chunk at a heading once the current one has some content
+- Splits oversized paragraphs on sentences (then words), carrying a small
+  token overlap between the resulting pieces
+- Yields chunks lazily, so they can be embedded in batches as they arrive
+"""
+
+import io
+import re
+from typing import Callable, Iterator, List, NamedTuple, TextIO
+
+# Bump when the chunking rules change (recorded in the index manifest)
+CHUNKER_VERSION = 1
+
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(texts: List[str]) -> List[int]:
+    """Rough token counts (~4 tokens per 3 words) when no tokenizer is available."""
+    return [(len(text.split()) * 4 + 2) // 3 for text in texts]
+
+
+class Chunk(NamedTuple):
+    """A chunk of a document and its character offsets in that document."""
+    text: str
+    start: int
+    end: int
+
+
+class _Piece(NamedTuple):
+    text: str
+    start: int
+    end: int
+    tokens: int
+    heading: bool
+    block: int  # start offset of the block the piece came from
+
+
+def read_blocks(f: TextIO) -> Iterator[_Piece]:
+    """
+    Stream structural blocks (headings and paragraphs) from a text file.
+    
+    Yields pieces with a token count of 0; the chunker fills it in.
+    """
+    lines: List[str] = []
+    start = end = offset = 0
+    
+    for line in f:
+        line_start = offset
+        offset += len(line)
+        text = line.rstrip()
+        
+        if _HEADING.match(line) or not text:
+            if lines:
+                yield _Piece("\n".join(lines), start, end, 0, False, start)
+                lines = []
+            if text:
+                yield _Piece(text.strip(), line_start, line_start + len(text), 0, True, line_start)
+            continue
+        
+        if not lines:
+            start = line_start
+        lines.append(text)
+        end = line_start + len(text)
+    
+    if lines:
+        yield _Piece("\n".join(lines), start, end, 0, False, start)
+
+
+class TokenChunker:
+    """
+    Packs document blocks into chunks of at most `max_tokens` tokens.
+    """
+    
+    def __init__(self, count_tokens: Callable[[List[str]], List[int]], max_tokens: int = 254,
+                 overlap_tokens: int = 32):
+        """
+        Args:
+            count_tokens: Token counts for a list of texts, without special
+                tokens (see EmbeddingService.count_tokens)
+            max_tokens: Token budget per chunk
+            overlap_tokens: Tokens carried over when a paragraph is split
+        """
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        # A heading only starts a new chunk once the current one has this much
+        self.min_tokens = max_tokens // 4
+    
+    def chunk_file(self, file_path) -> Iterator[Chunk]:
+        """Stream chunks from a UTF-8 text file."""
+        with open(file_path, "r", encoding="utf-8") as f:
+            yield from self.chunk_stream(f)
+    
+    def chunk_text(self, text: str) -> Iterator[Chunk]:
+        """Chunks of an in-memory string."""
+        return self.chunk_stream(io.StringIO(text))
+    
+    def chunk_stream(self, f: TextIO) -> Iterator[Chunk]:
+        """
+        Chunk a stream of text.
+        
+        Args:
+            f: Text stream (file object or StringIO)
+        
+        Yields:
+            Chunks in document order
+        """
+        current: List[_Piece] = []
+        current_tokens = 0
+        
+        for block in read_blocks(f):
+            for piece in self._fit(block):
+                if current and piece.heading and current_tokens >= self.min_tokens:
+                    # Section boundary: no overlap needed
+                    yield self._join(current)
+                    current, current_tokens = [], 0
+                
+                if current and current_tokens + piece.tokens > self.max_tokens:
+                    carry = self._carry_over(current, piece)
+                    if sum(p.tokens for p in carry) + piece.tokens > self.max_tokens:
+                        if carry and carry[0].heading:
+                            # No room to move the heading forward (e.g. a full word
+                            # window follows): keep it with the previous chunk
+                            current.extend(carry)
+                        carry = []
+                    if current:
+                        yield self._join(current)
+                    current = carry
+                    current_tokens = sum(p.tokens for p in current)
+                
+                current.append(piece)
+                current_tokens += piece.tokens
+        
+        if current and not all(p.heading for p in current):
+            yield self._join(current)
+    
+    def _fit(self, block: _Piece) -> List[_Piece]:
+        """Count a block's tokens and split it if it exceeds the budget."""
+        tokens = self.count_tokens([block.text])[0]
+        if tokens <= self.max_tokens:
+            return [block._replace(tokens=tokens)]
+        
+        # Sentences first, then words for any sentence still too long
+        sentences = []
+        position = 0
+        for part in _SENTENCE_END.split(block.text):
+            position = block.text.index(part, position)
+            sentences.append((part, block.start + position))
+            position += len(part)
+        
+        pieces = []
+        for (text, start), count in zip(sentences, self.count_tokens([s for s, _ in sentences])):
+            if count <= self.max_tokens:
+                pieces.append(_Piece(text, start, start + len(text), count, block.heading, block.block))
+            else:
+                pieces.extend(self._split_words(text, start, block))
+        return pieces
+    
+    def _split_words(self, text: str, start: int, block: _Piece) -> List[_Piece]:
+        """Split a long sentence into word windows that fit the budget."""
+        words = list(re.finditer(r"\S+", text))
+        counts = self.count_tokens([w.group() for w in words])
+        pieces = []
+        window_start = 0
+        while window_start < len(words):
+            tokens = 0
+            end = window_start
+            while end < len(words) and (end == window_start or tokens + counts[end] <= self.max_tokens):
+                tokens += counts[end]
+                end += 1
+            first, last = words[window_start], words[end - 1]
+            pieces.append(_Piece(text[first.start():last.end()], start + first.start(),
+                                 start + last.end(), tokens, block.heading, block.block))
+            window_start = end
+        return pieces
+    
+    def _carry_over(self, pieces: List[_Piece], incoming: _Piece) -> List[_Piece]:
+        """
+        Trailing pieces to repeat at the start of the next chunk.
+        
+        A dangling heading moves forward (it is removed from `pieces`);
+        otherwise, when a paragraph is being split, its trailing sentences
+        up to `overlap_tokens` are repeated for context.
+        """
+        if pieces[-1].heading:
+            return [pieces.pop()]
+        carry = []
+        tokens = 0
+        for piece in reversed(pieces[1:]):
+            if piece.block != incoming.block or tokens + piece.tokens > self.overlap_tokens:
+                break
+            carry.insert(0, piece)
+            tokens += piece.tokens
+        return carry
+    
+    @staticmethod
+    def _join(pieces: List[_Piece]) -> Chunk:
+        """Merge pieces into one chunk (blocks stay separated by a blank line)."""
+        text = pieces[0].text
+        for previous, piece in zip(pieces, pieces[1:]):
+            text += (" " if piece.block == previous.block else "\n\n") + piece.text
+        return Chunk(text, pieces[0].start, pieces[-1].end)
@@ -1,14 +1,28 @@
-from sentence_transformers import SentenceTransformer
-from typing import List
+from collections import OrderedDict
+from typing import Dict, List, Optional
 import numpy as np
+import os
+import threading
+from .onnx_backend import BACKENDS, OnnxEncoder
+from .chunker import estimate_tokens
 
 class EmbeddingService:
     """
     Handles text embeddings using SentenceTransformers.
     This is the foundation of our RAG system.
+    
+    Query embeddings are cached in a bounded LRU (normalized text -> float32
+    vector). Most queries repeat - QASimulator embeds one template per
+    persona - so hits skip the model forward pass entirely.
+    
+    Backends:
+    - torch: SentenceTransformer on PyTorch (default)
+    - onnx / onnx_int8: ONNX Runtime, fp32 or int8-quantized
+      (see rag/onnx_backend.py)
     """
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", cache_size: int = 1024,
+                 backend: str = "torch", onnx_dir: str = "./rag/onnx_models", onnx_threads: int = 0):
         """
         Initialize the embedding model.
         
@@ -16,11 +30,42 @@ class EmbeddingService:
         - Fast and efficient (384 dimensions)
         - Good for semantic search
         - Works well on CPU
+        
+        Args:
+            model_name: SentenceTransformer model name
+            cache_size: Max cached query embeddings (0 disables the cache)
+            backend: One of 'torch', 'onnx', 'onnx_int8'
+            onnx_dir: Where exported ONNX models live (exported on first use)
+            onnx_threads: ONNX Runtime intra-op threads (0 = runtime default)
         """
-        print(f"Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
+        if backend not in BACKENDS:
+            raise ValueError(f"Unsupported embedding backend: {backend}. Must be one of: {BACKENDS}")
+        
+        print(f"Loading embedding model: {model_name} (backend: {backend})")
+        self.model_name = model_name
+        self.backend = backend
+        if backend == "torch":
+            # Imported lazily: ONNX deployments never load torch
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(model_name)
+        else:
+            self.model = OnnxEncoder(
+                model_name,
+                onnx_dir,
+                quantized=backend == "onnx_int8",
+                intra_op_threads=onnx_threads
+            )
         self.dimension = self.model.get_sentence_embedding_dimension()
+        # Longer inputs are truncated by the model (the chunker sizes to this)
+        self.max_seq_length = getattr(self.model, "max_seq_length", None) or 256
+        self._token_counter = self._load_token_counter()
         print(f"Model loaded. Embedding dimension: {self.dimension}")
+        
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
     
     def embed_text(self, text: str) -> np.ndarray:
         """
@@ -28,23 +73,173 @@ class EmbeddingService:
         
         Args:
             text: Input text string
-            
+        
         Returns:
             numpy array of embeddings
         """
-        return self.model.encode(text, convert_to_numpy=True)
+        return self.embed_batch([text], show_progress_bar=False)[0]
     
-    def embed_batch(self, texts: List[str]) -> np.ndarray:
+    def embed_batch(self, texts: List[str], use_cache: bool = True,
+                    show_progress_bar: bool = True) -> np.ndarray:
         """
         Convert multiple texts to embeddings (more efficient).
         
+        Only cache misses are sent to the model, in one batch.
+        
         Args:
             texts: List of text strings
-            
+            use_cache: Set False for bulk indexing so document chunks don't
+                evict query embeddings from the cache
+            show_progress_bar: Show the encode progress bar
+        
         Returns:
             numpy array of embeddings (batch_size x embedding_dim)
         """
-        return self.model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
+        if not use_cache or self.cache_size <= 0:
+            return self._encode(texts, show_progress_bar)
+        
+        keys = [self._normalize(text) for text in texts]
+        result = np.empty((len(texts), self.dimension), dtype=np.float32)
+        
+        # Positions of each distinct missing key
+        missing: Dict[str, List[int]] = {}
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                vector = self._cache.get(key)
+                if vector is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    result[i] = vector
+            self.cache_hits += len(texts) - sum(len(p) for p in missing.values())
+            self.cache_misses += sum(len(p) for p in missing.values())
+        
+        if missing:
+            miss_keys = list(missing)
+            vectors = self._encode(miss_keys, show_progress_bar and len(miss_keys) > 1)
+            with self._cache_lock:
+                for key, vector in zip(miss_keys, vectors):
+                    result[missing[key]] = vector
+                    self._cache[key] = vector
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        
+        return result
+    
+    def get_cached(self, text: str) -> Optional[np.ndarray]:
+        """
+        Return the cached embedding for a text without running the model.
+        
+        Returns:
+            A copy of the cached vector, or None on miss (not counted as a miss,
+            since the caller will go on to embed it)
+        """
+        if self.cache_size <= 0:
+            return None
+        key = self._normalize(text)
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is None:
+                return None
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return vector.copy()
+    
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Token count of each text under the model's tokenizer.
+        
+        Special tokens ([CLS]/[SEP]) are not included and nothing is
+        truncated, so the result can be compared with max_seq_length - 2.
+        Falls back to an estimate (~4 tokens per 3 words) when the model
+        has no fast tokenizer.
+        """
+        if self._token_counter is None:
+            return estimate_tokens(texts)
+        encodings = self._token_counter.encode_batch(texts, add_special_tokens=False)
+        return [len(encoding.ids) for encoding in encodings]
+    
+    def tokenizer_json(self) -> Optional[str]:
+        """The token counter serialized for worker processes (None = estimate)."""
+        return self._token_counter.to_str() if self._token_counter is not None else None
+    
+    def _load_token_counter(self):
+        """Untruncated, unpadded copy of the model's fast tokenizer (or None)."""
+        tokenizer = getattr(self.model, "tokenizer", None)
+        # SentenceTransformer wraps a transformers tokenizer; ONNX uses tokenizers directly
+        tokenizer = getattr(tokenizer, "backend_tokenizer", tokenizer)
+        if tokenizer is None or not hasattr(tokenizer, "to_str"):
+            return None
+        from tokenizers import Tokenizer
+        counter = Tokenizer.from_str(tokenizer.to_str())
+        counter.no_truncation()
+        counter.no_padding()
+        return counter
+    
+    def _encode(self, texts: List[str], show_progress_bar: bool) -> np.ndarray:
+        """Run the model forward pass."""
+        embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=show_progress_bar)
+        return np.asarray(embeddings, dtype=np.float32)
+    
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """Cache key: whitespace-collapsed text (the tokenizer ignores the difference)."""
+        return " ".join(text.split())
+    
+    def get_cache_stats(self) -> Dict[str, float]:
+        """Query-embedding cache counters for monitoring."""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._cache),
+            "capacity": self.cache_size,
+        }
+    
+    def save_cache(self, path: str):
+        """
+        Persist the cache so a restart starts warm.
+        
+        Args:
+            path: .npz file path
+        """
+        with self._cache_lock:
+            keys = list(self._cache)
+            vectors = np.stack(list(self._cache.values())) if keys else np.zeros((0, self.dimension), dtype=np.float32)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, model_name=np.array(self.model_id), keys=np.array(keys, dtype=str), vectors=vectors)
+        os.replace(tmp_path, path)
+        print(f"Saved {len(keys)} cached embeddings to {path}")
+    
+    def load_cache(self, path: str):
+        """
+        Load a cache saved by save_cache (ignored if built with another model).
+        
+        Args:
+            path: .npz file path
+        """
+        if not os.path.exists(path) or self.cache_size <= 0:
+            return
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["model_name"]) != self.model_id or data["vectors"].shape[1:] != (self.dimension,):
+                print(f"Ignoring embedding cache at {path}: built with a different model")
+                return
+            keys = data["keys"].tolist()
+            vectors = data["vectors"].astype(np.float32)
+        with self._cache_lock:
+            for key, vector in zip(keys[-self.cache_size:], vectors[-self.cache_size:]):
+                self._cache[key] = vector
+        print(f"Loaded {len(self._cache)} cached embeddings from {path}")
+    
+    @property
+    def model_id(self) -> str:
+        """Identifies the vectors this service produces (model + backend)."""
+        if self.backend == "torch":
+            return self.model_name
+        return f"{self.model_name}@{self.backend}"
     
     def get_dimension(self) -> int:
         """Return the embedding dimension."""
@@ -53,12 +248,20 @@ class EmbeddingService:
 # Global instance (singleton pattern)
 _embedding_service = None
 
-def get_embedding_service(model_name: str = "all-MiniLM-L6-v2") -> EmbeddingService:
+def get_embedding_service(model_name: Optional[str] = None) -> EmbeddingService:
     """
     Get or create the global embedding service instance.
     This ensures we only load the model once.
     """
     global _embedding_service
     if _embedding_service is None:
-        _embedding_service = EmbeddingService(model_name)
+        from config.settings import get_settings
+        settings = get_settings()
+        _embedding_service = EmbeddingService(
+            model_name or settings.embeddings_model,
+            cache_size=settings.embedding_cache_size,
+            backend=settings.embedding_backend,
+            onnx_dir=settings.embedding_onnx_dir,
+            onnx_threads=settings.embedding_onnx_threads
+        )
     return _embedding_service
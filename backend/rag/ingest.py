@@ -0,0 +1,154 @@
+"""
+Knowledge-Base Ingestion - Parallel document reading and chunking.
+
+Reading, parsing, chunking and tagging are CPU-bound and independent per
+file, so they run in a process pool. The pool feeds the sync in
+RAGRetriever (see sync_knowledge_base), which embeds fixed-size batches
+on a separate thread behind a bounded queue:
+
+    files -> [process pool: read / parse / chunk / tag] -> bounded window
+          -> main thread: reuse unchanged chunks, batch new ones
+          -> bounded queue -> embedding thread: embed, index.add, checkpoint
+
+At most `2 * workers` files are in flight and at most `queue_batches`
+embedding batches wait, so memory stays bounded however large the corpus.
+
+Supported formats: .txt, .md / .markdown (headings drive chunk boundaries)
+and .pdf (text extracted page by page with PyPDF2).
+"""
+
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from .chunker import TokenChunker, estimate_tokens
+from .manifest import hash_text
+from .metadata import tag_chunk
+
+# (text, start, end, sha256, metadata) for every chunk of a file, in order
+ChunkRecord = Tuple[str, int, int, str, dict]
+
+# Chunker used by chunk_document (one per worker process)
+_chunker: Optional[TokenChunker] = None
+
+
+def read_document(file_path: Path) -> Iterator[str]:
+    """
+    Stream a document as lines of text.
+    
+    PDF offsets refer to the extracted text (pages separated by a blank line).
+    """
+    if file_path.suffix.lower() == ".pdf":
+        from PyPDF2 import PdfReader
+        for page in PdfReader(str(file_path)).pages:
+            yield from (page.extract_text() or "").splitlines(keepends=True)
+            yield "\n"
+            yield "\n"
+        return
+    
+    with open(file_path, "r", encoding="utf-8") as f:
+        yield from f
+
+
+def init_worker(tokenizer_json: Optional[str], max_tokens: int, overlap_tokens: int):
+    """
+    Build the chunker of a worker process.
+    
+    Args:
+        tokenizer_json: Serialized fast tokenizer (EmbeddingService.tokenizer_json),
+            or None to estimate token counts
+        max_tokens: Token budget per chunk
+        overlap_tokens: Tokens carried over when a paragraph is split
+    """
+    global _chunker
+    count_tokens = estimate_tokens
+    if tokenizer_json:
+        from tokenizers import Tokenizer
+        tokenizer = Tokenizer.from_str(tokenizer_json)
+        
+        def count_tokens(texts: List[str]) -> List[int]:
+            return [len(e.ids) for e in tokenizer.encode_batch(texts, add_special_tokens=False)]
+    
+    _chunker = TokenChunker(count_tokens, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+
+def chunk_document(file_path: Path) -> List[ChunkRecord]:
+    """Read, chunk, hash and tag one document (runs in a worker process)."""
+    records = []
+    for position, chunk in enumerate(_chunker.chunk_stream(read_document(file_path))):
+        metadata = {"source": file_path.name, "start": chunk.start, "end": chunk.end, "position": position}
+        metadata.update(tag_chunk(chunk.text))
+        records.append((chunk.text, chunk.start, chunk.end, hash_text(chunk.text), metadata))
+    return records
+
+
+def iter_chunked_documents(file_paths: List[Path], workers: int, tokenizer_json: Optional[str],
+                           max_tokens: int, overlap_tokens: int) -> Iterator[Tuple[Path, List[ChunkRecord]]]:
+    """
+    Chunk documents in a process pool, yielding results in input order.
+    
+    Only `2 * workers` documents are submitted ahead of the consumer, so a
+    slow consumer (embedding) holds the pool back instead of letting chunked
+    text pile up in memory.
+    
+    Args:
+        file_paths: Documents to chunk
+        workers: Worker processes (<= 1 chunks in this process)
+        tokenizer_json: See init_worker
+        max_tokens: Token budget per chunk
+        overlap_tokens: Tokens carried over when a paragraph is split
+    
+    Yields:
+        (file path, chunk records) per document
+    """
+    init_args = (tokenizer_json, max_tokens, overlap_tokens)
+    if workers <= 1 or len(file_paths) <= 1:
+        init_worker(*init_args)
+        for file_path in file_paths:
+            yield file_path, chunk_document(file_path)
+        return
+    
+    # spawn, not fork: the caller already runs threads (index build, embedding
+    # batcher, torch), and forking a threaded process can deadlock the workers
+    # on locks held at fork time. init_worker rebuilds all worker state.
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=init_args,
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        remaining = iter(file_paths)
+        in_flight = deque()
+        for file_path in remaining:
+            in_flight.append((file_path, pool.submit(chunk_document, file_path)))
+            if len(in_flight) >= 2 * workers:
+                break
+        while in_flight:
+            file_path, future = in_flight.popleft()
+            records = future.result()
+            next_path = next(remaining, None)
+            if next_path is not None:
+                in_flight.append((next_path, pool.submit(chunk_document, next_path)))
+            yield file_path, records
+
+
+class ThroughputMeter:
+    """Counts indexed chunks and prints chunks/sec every `interval` seconds."""
+    
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self.start = self.last_report = time.perf_counter()
+        self.chunks = 0
+    
+    def add(self, count: int):
+        self.chunks += count
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            print(f"Indexed {self.chunks} chunks ({self.rate():.1f} chunks/sec)")
+    
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+    
+    def rate(self) -> float:
+        elapsed = self.elapsed()
+        return self.chunks / elapsed if elapsed > 0 else 0.0
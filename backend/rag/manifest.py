@@ -0,0 +1,101 @@
+"""
+Index Manifest - Records what a persisted FAISS index was built from.
+
+The manifest is written next to faiss.index. It holds:
+- params: embedding model, chunking and metadata-tagging parameters
+- files: per source file, its content hash and the (id, hash) of every
+  chunk it produced
+
+At startup we compare it with the current knowledge base so a matching
+index can be loaded straight from disk, and the incremental indexer uses
+the per-chunk hashes to embed only new or changed chunks.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 3
+
+# Knowledge-base document formats (see rag/ingest.py)
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".markdown", ".pdf")
+
+
+def hash_file(file_path: Path) -> str:
+    """SHA-256 of a file's bytes (streamed, so large files stay cheap)."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_text(text: str) -> str:
+    """SHA-256 of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def index_params(model_name: str, chunk_size: int, overlap: int,
+                 index_config: Dict[str, Any], tagger_version: int = 0,
+                 chunker_version: int = 0) -> Dict[str, Any]:
+    """Parameters that invalidate every chunk when they change."""
+    return {
+        "version": MANIFEST_VERSION,
+        "model_name": model_name,
+        "chunk_size": chunk_size,
+        "overlap": overlap,
+        "index": index_config,
+        "tagger_version": tagger_version,
+        "chunker_version": chunker_version,
+    }
+
+
+def scan_knowledge_base(knowledge_base_path: str) -> Dict[str, str]:
+    """
+    Hash every knowledge-base document.
+    
+    Args:
+        knowledge_base_path: Directory containing VC knowledge files
+    
+    Returns:
+        Dict of file name -> SHA-256
+    """
+    kb_path = Path(knowledge_base_path)
+    if not kb_path.exists():
+        return {}
+    return {
+        file_path.name: hash_file(file_path)
+        for file_path in sorted(kb_path.iterdir())
+        if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS
+    }
+
+
+def read_manifest(index_path: str) -> Dict[str, Any]:
+    """Load the manifest saved with an index ({} if none exists)."""
+    manifest_path = os.path.join(index_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(index_path: str, manifest: Dict[str, Any]):
+    """Save the manifest next to the index files (atomic replace)."""
+    os.makedirs(index_path, exist_ok=True)
+    manifest_path = os.path.join(index_path, MANIFEST_FILE)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def manifest_matches(saved: Dict[str, Any], params: Dict[str, Any],
+                     file_hashes: Dict[str, str]) -> bool:
+    """True if a saved index is still valid for the current knowledge base."""
+    if not saved or saved.get("params") != params:
+        return False
+    saved_hashes = {name: entry["sha256"] for name, entry in saved.get("files", {}).items()}
+    return saved_hashes == file_hashes
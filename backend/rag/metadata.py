@@ -0,0 +1,217 @@
+"""
+Chunk Metadata - Columnar per-chunk metadata stored with the index.
+
+Every chunk gets:
+- source: knowledge-base file it came from
+- start / end: character offsets in that file
+- position: ordinal of the chunk within the file
+- personas / stages: investor personas and funding stages it is relevant to
+- topics: pitch aspects it covers (market, team, ...)
+
+Persona, stage and topic tags come from keyword rules (tag_chunk) and are
+stored as bitmasks, one numpy column per field, so a filter is a couple of
+vectorized comparisons that yield the allowed chunk IDs. VectorStore turns
+those IDs into a FAISS ID selector, so filtered searches never score (and
+then discard) chunks outside the filter.
+
+On disk the table is chunk_meta.npz next to faiss.index (loaded with
+allow_pickle=False).
+"""
+
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+META_FILE = "chunk_meta.npz"
+
+# Bump when the tagging rules change (recorded in the index manifest, so
+# indexes tagged by older rules are rebuilt)
+TAGGER_VERSION = 1
+
+PERSONAS = ("saas", "angel", "growth_vc", "institutional")
+STAGES = ("seed", "series_a", "series_b", "growth")
+TOPICS = ("problem", "market", "team", "traction", "business_model", "competition", "financials")
+
+PERSONA_KEYWORDS = {
+    "saas": r"\bsaas\b|\barr\b|\bmrr\b|churn|net revenue retention|subscription|recurring revenue",
+    "angel": r"\bangels?\b|pre-seed|friends and family",
+    "growth_vc": r"growth[- ]stage|scaling|expansion|category leader|market leader",
+    "institutional": r"institutional|limited partners|\blps\b|fund returns|governance|\bipo\b",
+}
+STAGE_KEYWORDS = {
+    "seed": r"\bseed\b|pre-seed|early[- ]stage|\bmvp\b",
+    "series_a": r"series a\b|product[- ]market fit",
+    "series_b": r"series b\b|scaling (the )?(team|sales|go-to-market)",
+    "growth": r"growth[- ]stage|series [c-z]\b|late[- ]stage|\bipo\b|profitab",
+}
+TOPIC_KEYWORDS = {
+    "problem": r"\bproblem|pain point",
+    "market": r"market size|\btam\b|\bsam\b|market opportunity|addressable",
+    "team": r"\bteam\b|\bfounders?\b",
+    "traction": r"traction|revenue growth|retention|paying customers",
+    "business_model": r"business model|revenue model|pricing|unit economics|\bcac\b|\bltv\b",
+    "competition": r"competit|\bmoats?\b|defensib",
+    "financials": r"financials|burn rate|runway|valuation|projections",
+}
+
+# Filterable fields and the tag vocabulary behind each bitmask column
+TAG_FIELDS = {"persona": ("personas", PERSONAS), "stage": ("stages", STAGES), "topic": ("topics", TOPICS)}
+# Chunks with no persona/stage tag are general advice and match any value
+GENERAL_FIELDS = ("persona", "stage")
+
+_COLUMNS = {
+    "ids": np.int64,
+    "source": np.int32,
+    "start": np.int64,
+    "end": np.int64,
+    "position": np.int32,
+    "personas": np.uint16,
+    "stages": np.uint16,
+    "topics": np.uint16,
+}
+
+
+def _matches(rules: Dict[str, str], text: str) -> List[str]:
+    return [tag for tag, pattern in rules.items() if re.search(pattern, text, re.IGNORECASE)]
+
+
+def tag_chunk(text: str) -> Dict[str, List[str]]:
+    """
+    Tag a chunk with the personas, stages and topics it mentions.
+    
+    Args:
+        text: Chunk text
+    
+    Returns:
+        Dict with 'personas', 'stages' and 'topics' lists
+    """
+    return {
+        "personas": _matches(PERSONA_KEYWORDS, text),
+        "stages": _matches(STAGE_KEYWORDS, text),
+        "topics": _matches(TOPIC_KEYWORDS, text),
+    }
+
+
+def _bitmask(values: Iterable[str], vocabulary: tuple) -> int:
+    return sum(1 << vocabulary.index(value) for value in values if value in vocabulary)
+
+
+class ChunkMetadata:
+    """
+    Columnar metadata table keyed by chunk ID (rows sorted by ID).
+    """
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        """Drop all rows."""
+        self.sources: List[str] = []
+        self.columns = {name: np.zeros(0, dtype=dtype) for name, dtype in _COLUMNS.items()}
+    
+    def update(self, ids: List[int], metadata: List[Dict]):
+        """
+        Insert or replace rows.
+        
+        Args:
+            ids: Chunk IDs
+            metadata: One dict per chunk with 'source', 'start', 'end',
+                'position', and optional 'personas'/'stages'/'topics' lists
+        """
+        if not ids:
+            return
+        rows = {name: [] for name in _COLUMNS}
+        for chunk_id, meta in zip(ids, metadata):
+            source = meta.get("source", "")
+            if source not in self.sources:
+                self.sources.append(source)
+            rows["ids"].append(chunk_id)
+            rows["source"].append(self.sources.index(source))
+            rows["start"].append(meta.get("start", 0))
+            rows["end"].append(meta.get("end", 0))
+            rows["position"].append(meta.get("position", 0))
+            for column, vocabulary in TAG_FIELDS.values():
+                rows[column].append(_bitmask(meta.get(column, []), vocabulary))
+        
+        self.remove(ids)
+        for name, dtype in _COLUMNS.items():
+            self.columns[name] = np.concatenate([self.columns[name], np.asarray(rows[name], dtype=dtype)])
+        order = np.argsort(self.columns["ids"], kind="stable")
+        self.columns = {name: column[order] for name, column in self.columns.items()}
+    
+    def remove(self, ids: Iterable[int]):
+        """Delete rows by chunk ID."""
+        keep = ~np.isin(self.columns["ids"], np.asarray(list(ids), dtype=np.int64))
+        if not keep.all():
+            self.columns = {name: column[keep] for name, column in self.columns.items()}
+    
+    def get(self, chunk_id: int) -> Optional[Dict]:
+        """Metadata of one chunk as a dict (None if unknown)."""
+        ids = self.columns["ids"]
+        pos = int(np.searchsorted(ids, chunk_id))
+        if pos >= len(ids) or ids[pos] != chunk_id:
+            return None
+        meta = {
+            "source": self.sources[self.columns["source"][pos]],
+            "start": int(self.columns["start"][pos]),
+            "end": int(self.columns["end"][pos]),
+            "position": int(self.columns["position"][pos]),
+        }
+        for column, vocabulary in TAG_FIELDS.values():
+            mask = int(self.columns[column][pos])
+            meta[column] = [value for bit, value in enumerate(vocabulary) if mask & (1 << bit)]
+        return meta
+    
+    def select(self, filters: Dict[str, str]) -> np.ndarray:
+        """
+        Chunk IDs matching every filter.
+        
+        Args:
+            filters: Any of 'source' (file name), 'persona', 'stage', 'topic'.
+                Untagged chunks match any persona/stage (general advice).
+        
+        Returns:
+            Sorted int64 array of matching chunk IDs
+        """
+        keep = np.ones(len(self.columns["ids"]), dtype=bool)
+        for field, value in filters.items():
+            if value is None:
+                continue
+            if field == "source":
+                code = self.sources.index(value) if value in self.sources else -1
+                keep &= self.columns["source"] == code
+            elif field in TAG_FIELDS:
+                column, vocabulary = TAG_FIELDS[field]
+                if value not in vocabulary:
+                    raise ValueError(f"Unknown {field}: {value}. Must be one of: {vocabulary}")
+                masks = self.columns[column]
+                matches = (masks & (1 << vocabulary.index(value))) != 0
+                if field in GENERAL_FIELDS:
+                    matches |= masks == 0
+                keep &= matches
+            else:
+                raise ValueError(f"Unknown filter field: {field}")
+        return self.columns["ids"][keep]
+    
+    def save(self, path: str):
+        """Write the table to chunk_meta.npz (atomic replace)."""
+        meta_path = os.path.join(path, META_FILE)
+        tmp_path = meta_path + ".tmp.npz"
+        np.savez(tmp_path, sources=np.array(self.sources, dtype=str), **self.columns)
+        os.replace(tmp_path, meta_path)
+    
+    def load(self, path: str):
+        """Load a table written by save()."""
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"Chunk metadata not found at {path}")
+        with np.load(meta_path, allow_pickle=False) as data:
+            sources = data["sources"].tolist()
+            columns = {name: data[name].astype(dtype) for name, dtype in _COLUMNS.items()}
+        self.sources = sources
+        self.columns = columns
+    
+    def __len__(self) -> int:
+        return len(self.columns["ids"])
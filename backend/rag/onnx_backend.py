@@ -0,0 +1,197 @@
+"""
+ONNX Runtime Embedding Backend
+
+Runs the SentenceTransformer model through ONNX Runtime instead of PyTorch:
+- No torch import at serve time (faster startup, smaller RSS)
+- Optional int8 dynamic quantization for faster CPU inference
+- Configurable intra-op threads per worker
+
+The model is exported once (this step needs torch + onnx) into
+`<onnx_dir>/<model_name>/`:
+- model.onnx / model_int8.onnx
+- tokenizer.json (loaded with the lightweight `tokenizers` package)
+- config.json (pooling/normalization/max length, to mirror the
+  SentenceTransformer pipeline exactly)
+"""
+
+import inspect
+import json
+import os
+from typing import List, Union
+
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "onnx_int8")
+
+
+def model_dir(onnx_dir: str, model_name: str) -> str:
+    """Directory holding the exported files for a model."""
+    return os.path.join(onnx_dir, model_name.replace("/", "__"))
+
+
+def export_onnx(model_name: str, onnx_dir: str, quantize: bool = True) -> str:
+    """
+    Export a SentenceTransformer model to ONNX (and optionally int8).
+    
+    Args:
+        model_name: SentenceTransformer model name
+        onnx_dir: Root directory for exported models
+        quantize: Also write an int8 dynamically-quantized copy
+    
+    Returns:
+        Directory containing the exported files
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    
+    out_dir = model_dir(onnx_dir, model_name)
+    os.makedirs(out_dir, exist_ok=True)
+    print(f"Exporting {model_name} to ONNX in {out_dir}...")
+    
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0]
+    auto_model = transformer.auto_model.eval()
+    tokenizer = transformer.tokenizer
+    
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    
+    class _Wrapper(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+        
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+    
+    onnx_path = os.path.join(out_dir, "model.onnx")
+    # Newer torch defaults to the dynamo exporter (extra deps); use TorchScript
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False
+    with torch.no_grad():
+        torch.onnx.export(
+            _Wrapper(auto_model),
+            tuple(sample[name] for name in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            **export_kwargs
+        )
+    
+    tokenizer.save_pretrained(out_dir)
+    
+    pooling = st_model[1]
+    config = {
+        "model_name": model_name,
+        "dimension": st_model.get_sentence_embedding_dimension(),
+        "max_seq_length": st_model.max_seq_length,
+        "pooling": "cls" if getattr(pooling, "pooling_mode_cls_token", False) else "mean",
+        "normalize": any(type(module).__name__ == "Normalize" for module in st_model),
+        "input_names": input_names,
+    }
+    with open(os.path.join(out_dir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(onnx_path, os.path.join(out_dir, "model_int8.onnx"), weight_type=QuantType.QInt8)
+    
+    print(f"ONNX export complete: {out_dir}")
+    return out_dir
+
+
+class OnnxEncoder:
+    """
+    Drop-in replacement for the parts of SentenceTransformer that
+    EmbeddingService uses (encode / get_sentence_embedding_dimension).
+    """
+    
+    def __init__(self, model_name: str, onnx_dir: str, quantized: bool = False,
+                 intra_op_threads: int = 0, batch_size: int = 32):
+        """
+        Args:
+            model_name: SentenceTransformer model name (exported on first use)
+            onnx_dir: Root directory for exported models
+            quantized: Use the int8 model
+            intra_op_threads: ONNX Runtime intra-op threads (0 = runtime default)
+            batch_size: Texts per session.run call
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        
+        out_dir = model_dir(onnx_dir, model_name)
+        model_file = "model_int8.onnx" if quantized else "model.onnx"
+        if not os.path.exists(os.path.join(out_dir, model_file)):
+            export_onnx(model_name, onnx_dir, quantize=quantized)
+        
+        with open(os.path.join(out_dir, "config.json"), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        
+        self.tokenizer = Tokenizer.from_file(os.path.join(out_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.enable_padding()
+        
+        options = ort.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(out_dir, model_file), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = self.config["input_names"]
+        self.max_seq_length = self.config["max_seq_length"]
+        self.batch_size = batch_size
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dimension"]
+    
+    def encode(self, texts: Union[str, List[str]], convert_to_numpy: bool = True,
+               show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Embed texts with the same pooling/normalization as SentenceTransformer.
+        
+        Args:
+            texts: A string or list of strings
+            convert_to_numpy: Accepted for API compatibility (always numpy)
+            show_progress_bar: Accepted for API compatibility (ignored)
+        
+        Returns:
+            (dimension,) for a single string, else (len(texts), dimension)
+        """
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        
+        # Sort by length so each batch pads to a similar size
+        order = np.argsort([len(text) for text in texts])
+        embeddings = np.empty((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            batch_idx = order[start:start + self.batch_size]
+            embeddings[batch_idx] = self._encode_batch([texts[i] for i in batch_idx])
+        
+        return embeddings[0] if single else embeddings
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        features = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: features[name] for name in self.input_names})[0]
+        
+        if self.config["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = features["attention_mask"][:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        
+        if self.config["normalize"]:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
@@ -1,7 +1,21 @@
-from typing import List
+from typing import Dict, List, Optional
 from .embeddings import get_embedding_service
+from .batcher import get_embedding_batcher
 from .vector_store import get_vector_store
+from .metadata import TAGGER_VERSION
+from .chunker import CHUNKER_VERSION, TokenChunker
+from .ingest import ThroughputMeter, iter_chunked_documents
+from .manifest import (
+    index_params,
+    scan_knowledge_base,
+    read_manifest,
+    write_manifest,
+    manifest_matches
+)
+from config.settings import get_settings
 import os
+import queue
+import threading
 from pathlib import Path
 
 class RAGRetriever:
@@ -23,54 +37,329 @@ class RAGRetriever:
         self.embedding_service = get_embedding_service()
         self.vector_store = get_vector_store(self.embedding_service.get_dimension())
         self.initialized = False
+        self.manifest = {}
+        settings = get_settings()
+        self.min_score = settings.rag_min_score
+        # Chunks must fit the model's max sequence length ([CLS]/[SEP] excluded)
+        model_budget = self.embedding_service.max_seq_length - 2
+        self.chunker = TokenChunker(
+            self.embedding_service.count_tokens,
+            max_tokens=min(settings.chunk_max_tokens or model_budget, model_budget),
+            overlap_tokens=settings.chunk_overlap_tokens
+        )
+        # Ingestion pipeline (see sync_knowledge_base)
+        self.ingest_workers = settings.ingest_workers or min(4, os.cpu_count() or 1)
+        self.ingest_batch_size = settings.ingest_batch_size
+        self.ingest_queue_batches = settings.ingest_queue_batches
+        self.checkpoint_every = settings.ingest_checkpoint_every
+        # One knowledge-base sync at a time (startup, CLI or admin endpoint)
+        self._sync_lock = threading.Lock()
+    
+    def load_or_build(self, knowledge_base_path: str, index_path: str):
+        """
+        Load the persisted index and bring it up to date with the knowledge base.
+        
+        This is what startup calls:
+        - Manifest matches: memory-map the saved index, no embedding at all
+        - Some files changed: load the saved index and re-embed only the
+          new/changed chunks (see sync_knowledge_base), then save
+        - No usable index: build from scratch and save
+        
+        Args:
+            knowledge_base_path: Directory containing VC knowledge files
+            index_path: Directory holding faiss.index, the chunk store and manifest.json
+        """
+        params = self._index_params()
+        file_hashes = scan_knowledge_base(knowledge_base_path)
+        saved = read_manifest(index_path)
+        up_to_date = manifest_matches(saved, params, file_hashes)
+        
+        if saved.get("params") == params:
+            try:
+                self.vector_store.load(index_path, mmap=up_to_date)
+                self.manifest = saved
+                self.initialized = True
+            except Exception as e:
+                print(f"WARNING: Failed to load persisted index ({e}). Rebuilding.")
+                self.vector_store.reset()
+                self.manifest = {}
+        else:
+            print(f"Persisted index at {index_path} is missing or was built with different parameters. Rebuilding.")
+        
+        if up_to_date and self.initialized:
+            print(f"Loaded persisted index from {index_path} (manifest up to date)")
+            return
+        
+        self.reindex(knowledge_base_path, index_path)
+    
+    def reindex(self, knowledge_base_path: str, index_path: str) -> Dict[str, float]:
+        """
+        Incrementally sync the index with the knowledge base and persist it.
+        
+        Safe to call while serving: only one sync runs at a time, and
+        searches keep working against the current index while chunks embed.
+        Long builds checkpoint to `index_path`; if one is interrupted, the
+        next call resumes from the last checkpoint.
+        
+        Args:
+            knowledge_base_path: Directory containing VC knowledge files
+            index_path: Directory to save the updated index to
+            
+        Returns:
+            Sync report (see sync_knowledge_base)
+        """
+        with self._sync_lock:
+            report = self.sync_knowledge_base(knowledge_base_path, checkpoint_path=index_path)
+            if report["added_chunks"] or report["removed_chunks"] or not read_manifest(index_path):
+                self.save_index(index_path)
+            return report
+    
+    def _index_params(self) -> dict:
+        """Parameters recorded in the manifest (a change invalidates every chunk)."""
+        return index_params(
+            model_name=self.embedding_service.model_id,
+            chunk_size=self.chunker.max_tokens,
+            overlap=self.chunker.overlap_tokens,
+            index_config=self.vector_store.describe(),
+            tagger_version=TAGGER_VERSION,
+            chunker_version=CHUNKER_VERSION
+        )
     
     def initialize_knowledge_base(self, knowledge_base_path: str):
         """
         Load and index VC knowledge documents.
         
-        This should be called once at startup.
+        Kept for callers that build in memory only. Equivalent to
+        sync_knowledge_base, so calling it again picks up changed files.
         
         Args:
             knowledge_base_path: Directory containing VC knowledge files
         """
-        if self.initialized:
-            print("Knowledge base already initialized")
-            return
+        with self._sync_lock:
+            self.sync_knowledge_base(knowledge_base_path)
+    
+    def sync_knowledge_base(self, knowledge_base_path: str,
+                            checkpoint_path: Optional[str] = None) -> Dict[str, float]:
+        """
+        Incrementally index VC knowledge documents.
+        
+        Uses the manifest's per-file and per-chunk content hashes to:
+        - Skip files whose hash is unchanged
+        - Re-chunk changed files, keeping the IDs of chunks whose text is
+          unchanged and embedding only the new ones
+        - Remove the chunks of changed and deleted files by ID
+        - Record each chunk's metadata (source, offsets, persona/stage/topic
+          tags) for filtered retrieval
         
-        print(f"Initializing knowledge base from: {knowledge_base_path}")
+        Documents (.txt, .md, .pdf) are read and chunked in a process pool
+        (see rag/ingest.py). New chunks go through a bounded queue in
+        fixed-size batches to an embedding thread that adds them to the
+        index, so memory holds a few batches, not the whole corpus. Every
+        `checkpoint_every` chunks the index and a manifest of the files
+        completed so far are saved to `checkpoint_path`; chunks an
+        interrupted build added past its last checkpoint are dropped on the
+        next sync.
         
-        # Load all text files from knowledge base
+        Args:
+            knowledge_base_path: Directory containing VC knowledge files
+            checkpoint_path: Index directory to checkpoint to (None = never)
+            
+        Returns:
+            Report with file and chunk counts and throughput
+        """
+        print(f"Syncing knowledge base from: {knowledge_base_path}")
+        
+        report = {
+            "new_files": 0,
+            "changed_files": 0,
+            "deleted_files": 0,
+            "unchanged_files": 0,
+            "added_chunks": 0,
+            "removed_chunks": 0,
+            "total_chunks": 0,
+            "elapsed_seconds": 0.0,
+            "chunks_per_sec": 0.0,
+        }
+        
+        # Load all documents from knowledge base
         kb_path = Path(knowledge_base_path)
         if not kb_path.exists():
             print(f"WARNING: Knowledge base not found at {knowledge_base_path}")
             print("Creating empty knowledge base. Please add documents.")
             kb_path.mkdir(parents=True, exist_ok=True)
-            return
+            return report
         
-        documents = []
-        for file_path in kb_path.glob("*.txt"):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                # Chunk the document (simple approach: split by paragraphs)
-                chunks = self._chunk_text(content, chunk_size=500, overlap=50)
-                documents.extend(chunks)
-                print(f"Loaded {len(chunks)} chunks from {file_path.name}")
+        params = self._index_params()
+        if self.manifest.get("params") == params:
+            saved_files = self.manifest.get("files", {})
+        else:
+            # Model or chunking changed (or first build): nothing is reusable
+            saved_files = {}
+            if self.vector_store.size():
+                self.vector_store.reset()
         
-        if len(documents) == 0:
-            print("WARNING: No documents found in knowledge base")
-            return
+        file_hashes = scan_knowledge_base(knowledge_base_path)
+        current_files = {}
+        to_process = []
+        
+        # Chunks of deleted files, plus chunks the manifest doesn't know
+        # about (added by an interrupted build after its last checkpoint)
+        known_ids = set()
+        for name, saved in saved_files.items():
+            if name in file_hashes:
+                known_ids.update(chunk_id for chunk_id, _ in saved["chunks"])
+            else:
+                report["deleted_files"] += 1
+                print(f"Removing chunks of deleted file {name}")
+        stale_ids = [chunk_id for chunk_id in self.vector_store.documents.ids() if chunk_id not in known_ids]
+        self.vector_store.remove_documents(stale_ids)
+        report["removed_chunks"] += len(stale_ids)
+        
+        for name, file_hash in file_hashes.items():
+            saved = saved_files.get(name)
+            if saved and saved["sha256"] == file_hash:
+                current_files[name] = saved
+                report["unchanged_files"] += 1
+            else:
+                report["changed_files" if saved else "new_files"] += 1
+                to_process.append(kb_path / name)
         
-        # Generate embeddings for all documents
-        print(f"Generating embeddings for {len(documents)} chunks...")
-        embeddings = self.embedding_service.embed_batch(documents)
+        meter = ThroughputMeter()
+        added_ids = []
+        batches = queue.Queue(maxsize=self.ingest_queue_batches)
+        errors = []
         
-        # Add to vector store
-        self.vector_store.add_documents(embeddings, documents)
+        def index_worker():
+            """Embedding thread: add batches, complete files, checkpoint."""
+            since_checkpoint = 0
+            while True:
+                item = batches.get()
+                if item is None:
+                    return
+                if errors:
+                    continue  # Drain so the producer never blocks
+                batch, finished = item
+                try:
+                    if batch:
+                        added_ids.extend(self._index_batch(batch))
+                        meter.add(len(batch))
+                        since_checkpoint += len(batch)
+                    for name, entries, kept, removed in finished:
+                        # All of the file's new chunks are in: swap out its old ones
+                        self.vector_store.update_metadata(*kept)
+                        self.vector_store.remove_documents(removed)
+                        report["removed_chunks"] += len(removed)
+                        current_files[name] = {"sha256": file_hashes[name], "chunks": entries}
+                    if checkpoint_path and self.checkpoint_every and since_checkpoint >= self.checkpoint_every:
+                        self._checkpoint(checkpoint_path, params, saved_files, current_files, file_hashes)
+                        since_checkpoint = 0
+                except Exception as e:
+                    errors.append(e)
         
+        worker = threading.Thread(target=index_worker, name="kb-index", daemon=True)
+        worker.start()
+        failed = True
+        try:
+            # New chunks waiting for the next batch: (id, text, metadata)
+            pending = []
+            # Files whose new chunks are all in `pending` or earlier batches
+            finished = []
+            for file_path, records in iter_chunked_documents(
+                to_process,
+                workers=self.ingest_workers,
+                tokenizer_json=self.embedding_service.tokenizer_json(),
+                max_tokens=self.chunker.max_tokens,
+                overlap_tokens=self.chunker.overlap_tokens
+            ):
+                if errors:
+                    break
+                name = file_path.name
+                
+                # Chunk IDs from the previous version of this file, by text hash
+                reusable = {}
+                for chunk_id, chunk_hash in saved_files.get(name, {}).get("chunks", []):
+                    reusable.setdefault(chunk_hash, []).append(chunk_id)
+                
+                entries = []
+                kept_ids = []
+                kept_metadata = []
+                for text, _, _, chunk_hash, metadata in records:
+                    if reusable.get(chunk_hash):
+                        # Same text, but its offsets/position may have moved
+                        chunk_id = reusable[chunk_hash].pop()
+                        kept_ids.append(chunk_id)
+                        kept_metadata.append(metadata)
+                    else:
+                        chunk_id = self.vector_store.allocate_ids(1)[0]
+                        pending.append((chunk_id, text, metadata))
+                        if len(pending) >= self.ingest_batch_size:
+                            batches.put((pending, finished))
+                            pending, finished = [], []
+                    entries.append([chunk_id, chunk_hash])
+                
+                # Old chunks that no longer appear in the file
+                removed = [chunk_id for ids in reusable.values() for chunk_id in ids]
+                finished.append((name, entries, (kept_ids, kept_metadata), removed))
+                print(f"Loaded {len(entries)} chunks from {name}")
+            
+            if not errors and (pending or finished):
+                batches.put((pending, finished))
+            failed = False
+        finally:
+            batches.put(None)
+            worker.join()
+            if failed or errors:
+                # Keep the manifest in step with what made it into the index
+                self.manifest = {"params": params, "files": self._merge_files(saved_files, current_files, file_hashes)}
+        
+        if errors:
+            raise errors[0]
+        
+        self.manifest = {"params": params, "files": current_files}
         self.initialized = True
-        print(f"Knowledge base initialized with {len(documents)} chunks")
+        
+        report["added_chunks"] = len(added_ids)
+        report["total_chunks"] = self.vector_store.size()
+        report["elapsed_seconds"] = round(meter.elapsed(), 2)
+        report["chunks_per_sec"] = round(meter.rate(), 1)
+        
+        if report["total_chunks"] == 0:
+            print("WARNING: No documents found in knowledge base")
+        print(f"Knowledge base synced: {report}")
+        return report
     
-    def retrieve(self, query: str, top_k: int = 5) -> List[str]:
+    def _checkpoint(self, path: str, params: dict, saved_files: dict, current_files: dict,
+                    file_hashes: Dict[str, str]):
+        """Save the index mid-sync so an interrupted build can resume."""
+        self.vector_store.save(path)
+        write_manifest(path, {"params": params, "files": self._merge_files(saved_files, current_files, file_hashes)})
+        print(f"Checkpoint: {len(current_files)}/{len(file_hashes)} files indexed")
+    
+    @staticmethod
+    def _merge_files(saved_files: dict, current_files: dict, file_hashes: Dict[str, str]) -> dict:
+        """
+        Manifest files for a sync that is only part done.
+        
+        Completed files are recorded with their new chunks; files not yet
+        completed keep their previous entries (their old chunks are still in
+        the index), so the next sync redoes exactly those files.
+        """
+        files = {
+            name: saved for name, saved in saved_files.items()
+            if name in file_hashes and name not in current_files
+        }
+        files.update(current_files)
+        return files
+    
+    def _index_batch(self, batch) -> List[int]:
+        """Embed a batch of new (id, text, metadata) chunks and add them to the index."""
+        ids, texts, metadata = (list(column) for column in zip(*batch))
+        # use_cache=False: document chunks shouldn't evict query embeddings
+        embeddings = self.embedding_service.embed_batch(texts, use_cache=False, show_progress_bar=False)
+        return self.vector_store.add_documents(embeddings, texts, ids=ids, metadata=metadata)
+    
+    def retrieve(self, query: str, top_k: int = 5, min_score: Optional[float] = None,
+                 filters: Optional[Dict[str, str]] = None) -> List[str]:
         """
         Retrieve top-k most relevant documents for a query.
         
@@ -79,25 +368,109 @@ class RAGRetriever:
         Args:
             query: User's query (e.g., their pitch idea)
             top_k: Number of relevant chunks to retrieve
+            min_score: Minimum cosine similarity (defaults to settings.rag_min_score).
+                Low-relevance chunks only inflate the prompt and LLM latency.
+            filters: Restrict to chunks matching metadata, e.g.
+                {"persona": "saas", "stage": "seed"}. Also accepts 'source'
+                and 'topic' (see ChunkMetadata.select)
             
         Returns:
             List of relevant text chunks from VC knowledge
         """
-        if not self.initialized or self.vector_store.size() == 0:
-            print("WARNING: Knowledge base not initialized. Returning empty context.")
+        if not self._ready():
             return []
         
         # Convert query to embedding
         query_embedding = self.embedding_service.embed_text(query)
         
-        # Search vector store
-        documents, scores = self.vector_store.search(query_embedding, k=top_k)
+        return self._search(query_embedding, top_k, min_score, filters)
+    
+    async def aretrieve(self, query: str, top_k: int = 5, min_score: Optional[float] = None,
+                        filters: Optional[Dict[str, str]] = None) -> List[str]:
+        """
+        Async retrieve for request handlers.
         
-        print(f"Retrieved {len(documents)} documents with scores: {[f'{s:.3f}' for s in scores]}")
+        The query embedding goes through the shared micro-batcher, so
+        concurrent requests share one model call and the event loop is
+        never blocked by the forward pass.
         
-        return documents
+        Args:
+            query: User's query (e.g., their pitch idea)
+            top_k: Number of relevant chunks to retrieve
+            min_score: Minimum cosine similarity (see retrieve)
+            filters: Metadata filters (see retrieve)
+            
+        Returns:
+            List of relevant text chunks from VC knowledge
+        """
+        if not self._ready():
+            return []
+        
+        query_embedding = await get_embedding_batcher().embed(query)
+        
+        return self._search(query_embedding, top_k, min_score, filters)
     
-    def retrieve_with_context(self, query: str, context_prefix: str = "", top_k: int = 5) -> str:
+    def retrieve_many(self, queries: List[str], top_k: int = 5, min_score: Optional[float] = None,
+                      filters: Optional[Dict[str, str]] = None) -> List[List[str]]:
+        """
+        Retrieve top-k documents for several queries at once.
+        
+        Embeds all queries in one batch and runs a single FAISS search over
+        the query matrix. Used for bulk scoring and multi-aspect retrieval
+        (e.g. problem / market / team queries for one pitch).
+        
+        Args:
+            queries: Query strings
+            top_k: Number of relevant chunks per query
+            min_score: Minimum cosine similarity (see retrieve)
+            filters: Metadata filters applied to every query (see retrieve)
+            
+        Returns:
+            One list of text chunks per query, in order
+        """
+        if not queries or not self._ready():
+            return [[] for _ in queries]
+        
+        query_embeddings = self.embedding_service.embed_batch(queries, show_progress_bar=False)
+        
+        return self._search_many(query_embeddings, top_k, min_score, filters)
+    
+    async def aretrieve_many(self, queries: List[str], top_k: int = 5, min_score: Optional[float] = None,
+                             filters: Optional[Dict[str, str]] = None) -> List[List[str]]:
+        """Async version of retrieve_many (embeddings go through the micro-batcher)."""
+        if not queries or not self._ready():
+            return [[] for _ in queries]
+        
+        query_embeddings = await get_embedding_batcher().embed_many(queries)
+        
+        return self._search_many(query_embeddings, top_k, min_score, filters)
+    
+    def _ready(self) -> bool:
+        if not self.initialized or self.vector_store.size() == 0:
+            print("WARNING: Knowledge base not initialized. Returning empty context.")
+            return False
+        return True
+    
+    def _search(self, query_embedding, top_k: int, min_score: Optional[float],
+                filters: Optional[Dict[str, str]] = None) -> List[str]:
+        """Search the vector store with an embedded query."""
+        return self._search_many(query_embedding, top_k, min_score, filters)[0]
+    
+    def _search_many(self, query_embeddings, top_k: int, min_score: Optional[float],
+                     filters: Optional[Dict[str, str]] = None) -> List[List[str]]:
+        """Search the vector store with a matrix of embedded queries."""
+        if min_score is None:
+            min_score = self.min_score
+        results = self.vector_store.search_many(query_embeddings, k=top_k, min_score=min_score, filters=filters)
+        
+        for documents, scores in results:
+            print(f"Retrieved {len(documents)} documents with cosine scores: {[f'{s:.3f}' for s in scores]}")
+        
+        return [documents for documents, _ in results]
+    
+    def retrieve_with_context(self, query: str, context_prefix: str = "", top_k: int = 5,
+                              min_score: Optional[float] = None,
+                              filters: Optional[Dict[str, str]] = None) -> str:
         """
         Retrieve documents and format as context string for LLM prompt.
         
@@ -105,12 +478,29 @@ class RAGRetriever:
             query: User's query
             context_prefix: Optional prefix for the context
             top_k: Number of documents to retrieve
+            min_score: Minimum cosine similarity (see retrieve)
+            filters: Metadata filters (see retrieve)
             
         Returns:
             Formatted context string ready for LLM prompt injection
         """
-        documents = self.retrieve(query, top_k)
-        
+        return self.format_context(self.retrieve(query, top_k, min_score, filters), context_prefix)
+    
+    async def aretrieve_with_context(self, query: str, context_prefix: str = "", top_k: int = 5,
+                                     min_score: Optional[float] = None,
+                                     filters: Optional[Dict[str, str]] = None) -> str:
+        """Async version of retrieve_with_context (see aretrieve)."""
+        return self.format_context(await self.aretrieve(query, top_k, min_score, filters), context_prefix)
+    
+    async def aretrieve_many_with_context(self, queries: List[str], context_prefix: str = "", top_k: int = 5,
+                                          min_score: Optional[float] = None,
+                                          filters: Optional[Dict[str, str]] = None) -> List[str]:
+        """Batched retrieve_with_context: one formatted context per query (see retrieve_many)."""
+        results = await self.aretrieve_many(queries, top_k, min_score, filters)
+        return [self.format_context(documents, context_prefix) for documents in results]
+    
+    def format_context(self, documents: List[str], context_prefix: str = "") -> str:
+        """Format retrieved documents as a context block for the LLM prompt."""
         if len(documents) == 0:
             return "Insufficient data in knowledge base."
         
@@ -127,37 +517,16 @@ class RAGRetriever:
         
         return context
     
-    def _chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
-        """
-        Split text into overlapping chunks.
-        
-        Overlap ensures context isn't lost at chunk boundaries.
-        
-        Args:
-            text: Input text
-            chunk_size: Target characters per chunk
-            overlap: Overlapping characters between chunks
-            
-        Returns:
-            List of text chunks
-        """
-        words = text.split()
-        chunks = []
-        
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = ' '.join(words[i:i + chunk_size])
-            if chunk:
-                chunks.append(chunk)
-        
-        return chunks
-    
     def save_index(self, path: str):
-        """Save the vector store to disk."""
+        """Save the vector store (and its manifest) to disk."""
         self.vector_store.save(path)
+        if self.manifest:
+            write_manifest(path, self.manifest)
     
     def load_index(self, path: str):
         """Load the vector store from disk."""
         self.vector_store.load(path)
+        self.manifest = read_manifest(path)
         self.initialized = True
 
 # Global instance
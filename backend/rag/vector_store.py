@@ -1,121 +1,458 @@
 import faiss
 import numpy as np
-import pickle
 import os
-from typing import List, Tuple
+import threading
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
+from .chunk_store import ChunkStore
+from .metadata import ChunkMetadata
+
+# Supported index backends (Settings.faiss_index_type)
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Return a float32 copy of `vectors` with every row scaled to unit L2 norm."""
+    vectors = np.array(vectors, dtype=np.float32, order="C", copy=True, ndmin=2)
+    faiss.normalize_L2(vectors)
+    return vectors
+
 class VectorStore:
     """
     FAISS-based vector store for efficient similarity search.
     
     Key Concepts:
-    - Uses FAISS IndexFlatL2 (exact L2 distance search)
-    - Stores document chunks with their embeddings
-    - Enables fast retrieval of relevant context
+    - Cosine similarity: vectors are L2-normalized once at index time (and
+      per query batch) and searched by inner product, so scores are in
+      [-1, 1], comparable across queries and usable as a threshold
+    - Each chunk has a stable int64 ID that the incremental indexer can
+      remove by. IVF indexes store IDs natively; flat and HNSW indexes are
+      wrapped in IndexIDMap2
+    - Stores document chunks (by ID) alongside their embeddings, in a
+      memory-mapped ChunkStore (see rag/chunk_store.py)
+    - Per-chunk metadata (source, offsets, persona/stage/topic tags) in a
+      columnar ChunkMetadata table; filtered searches pass the matching IDs
+      to FAISS as an ID selector, so excluded chunks are never scored
+    
+    Index backends:
+    - flat: exact brute-force inner-product search (IndexFlat, METRIC_INNER_PRODUCT). Best below ~100K vectors
+    - ivf_flat: inverted file over k-means cells; scans `nprobe` cells
+    - ivf_pq: IVF with product-quantized codes; far less memory, lossy
+    - hnsw: graph search tuned by `ef_search`; no training, fast queries
+    
+    IVF backends need training data. Until enough vectors arrive to train
+    (>= nlist, and >= 2^nbits for PQ) the store serves an exact flat index
+    and switches over on the first add that crosses the threshold.
     """
     
-    def __init__(self, dimension: int):
+    def __init__(self, dimension: int, index_type: str = "flat", nlist: int = 100,
+                 pq_m: int = 16, pq_nbits: int = 8, hnsw_m: int = 32,
+                 ef_construction: int = 40, nprobe: int = 8, ef_search: int = 64):
         """
         Initialize FAISS index.
         
         Args:
             dimension: Embedding vector dimension (e.g., 384 for MiniLM)
+            index_type: One of INDEX_TYPES
+            nlist: Number of IVF cells
+            pq_m: PQ sub-quantizers (must divide dimension)
+            pq_nbits: Bits per PQ code
+            hnsw_m: HNSW graph degree
+            ef_construction: HNSW build-time beam width
+            nprobe: Default IVF cells scanned per query
+            ef_search: Default HNSW query-time beam width
         """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unsupported index type: {index_type}. Must be one of: {INDEX_TYPES}")
+        if index_type == "ivf_pq" and dimension % pq_m != 0:
+            raise ValueError(f"pq_m ({pq_m}) must divide the embedding dimension ({dimension})")
+        
         self.dimension = dimension
-        # IndexFlatL2: Exact search using L2 distance (Euclidean)
-        # Good for up to 1M vectors on CPU
-        self.index = faiss.IndexFlatL2(dimension)
-        self.documents = []  # Store original text chunks
-        print(f"Initialized FAISS index with dimension {dimension}")
+        self.index_type = index_type
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        # Inner product over unit vectors == cosine similarity
+        self.metric = faiss.METRIC_INNER_PRODUCT
+        # Guards index mutation so searches never see a half-applied update
+        self._lock = threading.RLock()
+        self.reset()
+        print(f"Initialized FAISS index with dimension {dimension} (type: {index_type})")
+    
+    def reset(self):
+        """Drop all vectors and documents."""
+        with self._lock:
+            # Trainable backends start as an exact flat index (see class docstring)
+            self.index = self._new_index("flat" if self._min_train_size() else self.index_type)
+            self.documents = ChunkStore()  # chunk ID -> original text
+            self.metadata = ChunkMetadata()
+            self.next_id = 0
+            self.read_only = False
+    
+    def allocate_ids(self, count: int) -> List[int]:
+        """Reserve `count` fresh chunk IDs."""
+        with self._lock:
+            ids = list(range(self.next_id, self.next_id + count))
+            self.next_id += count
+            return ids
     
-    def add_documents(self, embeddings: np.ndarray, documents: List[str]):
+    def add_documents(self, embeddings: np.ndarray, documents: List[str],
+                      ids: Optional[List[int]] = None,
+                      metadata: Optional[List[Dict]] = None) -> List[int]:
         """
         Add document embeddings to the index.
         
         Args:
             embeddings: numpy array of shape (num_docs, dimension)
             documents: List of document text chunks
+            ids: Chunk IDs (allocated automatically if omitted)
+            metadata: Optional per-chunk metadata dicts (see ChunkMetadata.update)
+        
+        Returns:
+            IDs of the added chunks
         """
         if embeddings.shape[1] != self.dimension:
             raise ValueError(f"Embedding dimension mismatch. Expected {self.dimension}, got {embeddings.shape[1]}")
         
-        # Add to FAISS index
-        self.index.add(embeddings)
-        self.documents.extend(documents)
+        with self._lock:
+            if ids is None:
+                ids = self.allocate_ids(len(documents))
+            self._ensure_writable()
+            
+            embeddings = normalize_rows(embeddings)
+            ids_array = np.asarray(ids, dtype=np.int64)
+            if self._needs_upgrade(len(ids)):
+                # Enough data to train the configured ANN backend
+                vectors, existing_ids = self._export_vectors()
+                self._rebuild_index(
+                    self.index_type,
+                    np.vstack([vectors, embeddings]),
+                    np.concatenate([existing_ids, ids_array])
+                )
+            else:
+                # Add to FAISS index
+                self.index.add_with_ids(embeddings, ids_array)
+            self.documents.update(ids, documents)
+            if metadata is not None:
+                self.metadata.update(ids, metadata)
+            self.next_id = max(self.next_id, max(ids, default=-1) + 1)
         
         print(f"Added {len(documents)} documents. Total documents: {len(self.documents)}")
+        return ids
     
-    def search(self, query_embedding: np.ndarray, k: int = 5) -> Tuple[List[str], List[float]]:
+    def remove_documents(self, ids: List[int]) -> int:
+        """
+        Remove chunks by ID.
+        
+        Args:
+            ids: Chunk IDs to remove
+        
+        Returns:
+            Number of vectors removed from the index
+        """
+        if not ids:
+            return 0
+        
+        with self._lock:
+            self._ensure_writable()
+            ids_array = np.asarray(ids, dtype=np.int64)
+            if self._supports_remove():
+                removed = self.index.remove_ids(ids_array)
+            else:
+                # HNSW graphs can't delete nodes: rebuild from the kept vectors
+                vectors, existing_ids = self._export_vectors()
+                keep = ~np.isin(existing_ids, ids_array)
+                removed = int((~keep).sum())
+                self._rebuild_index(self._active_type(), vectors[keep], existing_ids[keep])
+            self.documents.remove(ids)
+            self.metadata.remove(ids)
+        
+        print(f"Removed {removed} documents. Total documents: {len(self.documents)}")
+        return removed
+    
+    def update_metadata(self, ids: List[int], metadata: List[Dict]):
+        """Replace the metadata of stored chunks (e.g. offsets that moved)."""
+        with self._lock:
+            self.metadata.update(ids, metadata)
+    
+    def search(self, query_embedding: np.ndarray, k: int = 5, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None, min_score: Optional[float] = None,
+               filters: Optional[Dict[str, str]] = None) -> Tuple[List[str], List[float]]:
         """
         Search for top-k most similar documents.
         
         Args:
             query_embedding: Query vector (1 x dimension)
             k: Number of results to return
-            
+            nprobe: IVF cells to scan (defaults to the configured value)
+            ef_search: HNSW beam width (defaults to the configured value)
+            min_score: Drop results with cosine similarity below this
+            filters: Metadata filters (see search_many)
+        
         Returns:
-            Tuple of (documents, distances)
+            Tuple of (documents, cosine similarities), best first
         """
-        if len(self.documents) == 0:
-            return [], []
+        return self.search_many(query_embedding, k, nprobe, ef_search, min_score, filters)[0]
+    
+    def search_many(self, query_embeddings: np.ndarray, k: int = 5, nprobe: Optional[int] = None,
+                    ef_search: Optional[int] = None, min_score: Optional[float] = None,
+                    filters: Optional[Dict[str, str]] = None) -> List[Tuple[List[str], List[float]]]:
+        """
+        Search for the top-k documents of several queries in one FAISS call.
         
-        # Ensure query is 2D: (1, dimension)
-        if query_embedding.ndim == 1:
-            query_embedding = query_embedding.reshape(1, -1)
+        FAISS amortizes the scan across the rows of a query matrix, so this
+        is much cheaper per query than calling search() in a loop.
         
-        # Search FAISS index
-        # Returns: distances (L2), indices of nearest neighbors
-        distances, indices = self.index.search(query_embedding, min(k, len(self.documents)))
+        Args:
+            query_embeddings: Query matrix (num_queries x dimension)
+            k: Number of results per query
+            nprobe: IVF cells to scan (defaults to the configured value)
+            ef_search: HNSW beam width (defaults to the configured value)
+            min_score: Drop results with cosine similarity below this
+            filters: Restrict results by chunk metadata, e.g.
+                {"persona": "saas", "stage": "seed"} (see ChunkMetadata.select)
         
-        # Get corresponding documents
-        results = [self.documents[idx] for idx in indices[0]]
-        scores = distances[0].tolist()
+        Returns:
+            One (documents, cosine similarities) tuple per query, in order
+        """
+        # Ensure queries are 2D: (num_queries, dimension)
+        query_embeddings = normalize_rows(query_embeddings.reshape(-1, self.dimension))
+        no_results = [([], []) for _ in range(len(query_embeddings))]
         
-        return results, scores
+        if len(self.documents) == 0:
+            return no_results
+        
+        with self._lock:
+            k = min(k, len(self.documents))
+            params = None
+            if filters:
+                allowed_ids = self.metadata.select(filters)
+                if len(allowed_ids) == 0:
+                    return no_results
+                k = min(k, len(allowed_ids))
+                params = self._filtered_search_params(allowed_ids, nprobe, ef_search)
+            else:
+                self._set_search_params(nprobe, ef_search)
+            
+            # Search FAISS index
+            # Returns: cosine similarities, IDs of nearest neighbors (-1 = no result)
+            similarities, indices = self.index.search(query_embeddings, k, params=params)
+            
+            # Get corresponding documents
+            results = []
+            for row_ids, row_scores in zip(indices, similarities):
+                documents = []
+                scores = []
+                for chunk_id, similarity in zip(row_ids, row_scores):
+                    if chunk_id == -1 or (min_score is not None and similarity < min_score):
+                        continue
+                    # Only the hits are decoded from the chunk store
+                    text = self.documents.get(int(chunk_id))
+                    if text is None:
+                        continue
+                    documents.append(text)
+                    scores.append(float(similarity))
+                results.append((documents, scores))
+        
+        return results
     
     def save(self, path: str):
         """
         Save index and documents to disk.
         
+        Files are written to temporary names and swapped in, so a
+        memory-mapped index being served is never overwritten in place.
+        
         Args:
             path: Directory path to save files
         """
         os.makedirs(path, exist_ok=True)
         
-        # Save FAISS index
-        index_path = os.path.join(path, "faiss.index")
-        faiss.write_index(self.index, index_path)
-        
-        # Save documents
-        docs_path = os.path.join(path, "documents.pkl")
-        with open(docs_path, 'wb') as f:
-            pickle.dump(self.documents, f)
+        with self._lock:
+            # Save FAISS index
+            index_path = os.path.join(path, "faiss.index")
+            faiss.write_index(self.index, index_path + ".tmp")
+            os.replace(index_path + ".tmp", index_path)
+            
+            # Save documents and their metadata
+            self.documents.save(path)
+            self.metadata.save(path)
         
         print(f"Saved vector store to {path}")
     
-    def load(self, path: str):
+    def load(self, path: str, mmap: bool = False):
         """
         Load index and documents from disk.
         
         Args:
             path: Directory path to load files from
+            mmap: Memory-map the index file read-only instead of copying it
+                into process memory (pages are shared through the OS cache).
+                The first add/remove copies it into memory. Document text is
+                always memory-mapped.
         """
         index_path = os.path.join(path, "faiss.index")
-        docs_path = os.path.join(path, "documents.pkl")
         
-        if not os.path.exists(index_path) or not os.path.exists(docs_path):
+        if not os.path.exists(index_path):
             raise FileNotFoundError(f"Vector store not found at {path}")
         
         # Load FAISS index
-        self.index = faiss.read_index(index_path)
+        index = None
+        if mmap:
+            try:
+                index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                # Not every index type can be memory-mapped
+                print(f"Memory-mapping not supported for this index ({e}). Loading into memory.")
+                mmap = False
+        if index is None:
+            index = faiss.read_index(index_path)
+        if index.d != self.dimension:
+            raise ValueError(f"Index dimension mismatch. Expected {self.dimension}, got {index.d}")
         
-        # Load documents
-        with open(docs_path, 'rb') as f:
-            self.documents = pickle.load(f)
+        # Load documents (indexes saved with the old documents.pkl must be rebuilt)
+        documents = ChunkStore()
+        documents.load(path)
+        metadata = ChunkMetadata()
+        metadata.load(path)
+        
+        with self._lock:
+            self.index = index
+            self.documents = documents
+            self.metadata = metadata
+            self.next_id = documents.max_id() + 1
+            self.read_only = mmap
+            self._source_path = index_path
         
         print(f"Loaded vector store from {path}. Total documents: {len(self.documents)}")
     
+    def describe(self) -> Dict[str, object]:
+        """Build-time configuration (recorded in the index manifest)."""
+        config = {"type": self.index_type, "metric": "cosine"}
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            config["nlist"] = self.nlist
+        if self.index_type == "ivf_pq":
+            config.update(pq_m=self.pq_m, pq_nbits=self.pq_nbits)
+        if self.index_type == "hnsw":
+            config.update(hnsw_m=self.hnsw_m, ef_construction=self.ef_construction)
+        return config
+    
+    def _new_index(self, index_type: str):
+        """Create an empty ID-mapped index of the given backend type."""
+        if index_type == "flat":
+            base = faiss.IndexFlat(self.dimension, self.metric)
+        elif index_type == "ivf_flat":
+            # IVF keeps IDs in its inverted lists, so it needs no ID map
+            return faiss.index_factory(self.dimension, f"IVF{self.nlist},Flat", self.metric)
+        elif index_type == "ivf_pq":
+            return faiss.index_factory(self.dimension, f"IVF{self.nlist},PQ{self.pq_m}x{self.pq_nbits}", self.metric)
+        else:
+            base = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, self.metric)
+            base.hnsw.efConstruction = self.ef_construction
+        return faiss.IndexIDMap2(base)
+    
+    def _min_train_size(self) -> int:
+        """Vectors needed to train the configured backend (0 = no training)."""
+        if self.index_type == "ivf_flat":
+            return self.nlist
+        if self.index_type == "ivf_pq":
+            return max(self.nlist, 2 ** self.pq_nbits)
+        return 0
+    
+    def _active_type(self) -> str:
+        """Backend of the index currently being served."""
+        base = self._base_index()
+        if isinstance(base, faiss.IndexHNSW):
+            return "hnsw"
+        if isinstance(base, faiss.IndexIVFPQ):
+            return "ivf_pq"
+        if isinstance(base, faiss.IndexIVF):
+            return "ivf_flat"
+        return "flat"
+    
+    def _needs_upgrade(self, incoming: int) -> bool:
+        """True if this add brings a flat stand-in up to the training threshold."""
+        min_train = self._min_train_size()
+        return (
+            min_train > 0
+            and self._active_type() == "flat"
+            and self.index.ntotal + incoming >= min_train
+        )
+    
+    def _supports_remove(self) -> bool:
+        return self._active_type() != "hnsw"
+    
+    def _export_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Copy out every stored vector and its ID.
+        
+        Only used for flat and HNSW indexes, whose storage is exact.
+        """
+        ntotal = self.index.ntotal
+        if ntotal == 0:
+            return np.zeros((0, self.dimension), dtype=np.float32), np.zeros(0, dtype=np.int64)
+        vectors = self._base_index().reconstruct_n(0, ntotal)
+        ids = faiss.vector_to_array(self.index.id_map).astype(np.int64)
+        return vectors, ids
+    
+    def _rebuild_index(self, index_type: str, vectors: np.ndarray, ids: np.ndarray):
+        """Build a fresh index of `index_type` (training it if needed) from vectors."""
+        index = self._new_index(index_type)
+        if not index.is_trained:
+            print(f"Training {index_type} index on {len(vectors)} vectors...")
+            index.train(vectors)
+        if len(vectors):
+            index.add_with_ids(vectors, ids)
+        self.index = index
+    
+    def _set_search_params(self, nprobe: Optional[int], ef_search: Optional[int]):
+        """Apply query-time ANN parameters to the active index."""
+        active = self._active_type()
+        if active in ("ivf_flat", "ivf_pq"):
+            faiss.extract_index_ivf(self.index).nprobe = nprobe or self.nprobe
+        elif active == "hnsw":
+            self._base_index().hnsw.efSearch = ef_search or self.ef_search
+    
+    def _filtered_search_params(self, allowed_ids: np.ndarray, nprobe: Optional[int],
+                                ef_search: Optional[int]):
+        """
+        SearchParameters restricting the search to `allowed_ids`.
+        
+        Per-call parameters replace the index-level nprobe/efSearch, so they
+        are set here too.
+        """
+        selector = faiss.IDSelectorBatch(allowed_ids)
+        active = self._active_type()
+        if active in ("ivf_flat", "ivf_pq"):
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=nprobe or self.nprobe)
+        elif active == "hnsw":
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search or self.ef_search)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        # The SWIG wrapper doesn't keep the selector alive on its own
+        params.selector_ref = selector
+        return params
+    
+    def _base_index(self):
+        """The index under the ID map (or the index itself for IVF)."""
+        if isinstance(self.index, faiss.IndexIDMap):
+            return faiss.downcast_index(self.index.index)
+        return faiss.downcast_index(self.index)
+    
+    def _ensure_writable(self):
+        """Copy a memory-mapped index into process memory before mutating it."""
+        if self.read_only:
+            try:
+                self.index = faiss.clone_index(self.index)
+            except RuntimeError:
+                # Memory-mapped IVF lists can't be cloned: re-read the file
+                self.index = faiss.read_index(self._source_path)
+            self.read_only = False
+    
     def size(self) -> int:
         """Return number of documents in the store."""
         return len(self.documents)
@@ -124,8 +461,20 @@ class VectorStore:
 _vector_store = None
 
 def get_vector_store(dimension: int = 384) -> VectorStore:
-    """Get or create global vector store instance."""
+    """Get or create global vector store instance (index type from settings)."""
     global _vector_store
     if _vector_store is None:
-        _vector_store = VectorStore(dimension)
+        from config.settings import get_settings
+        settings = get_settings()
+        _vector_store = VectorStore(
+            dimension,
+            index_type=settings.faiss_index_type,
+            nlist=settings.faiss_nlist,
+            pq_m=settings.faiss_pq_m,
+            pq_nbits=settings.faiss_pq_nbits,
+            hnsw_m=settings.faiss_hnsw_m,
+            ef_construction=settings.faiss_ef_construction,
+            nprobe=settings.faiss_nprobe,
+            ef_search=settings.faiss_ef_search
+        )
     return _vector_store
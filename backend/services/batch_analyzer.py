@@ -0,0 +1,278 @@
+"""
+Batch Pitch Analyzer - Runs cohorts of pitches as background jobs.
+
+Accelerators submit hundreds of pitches at once. Instead of one blocking
+/api/analyze-pitch call per pitch, a batch is accepted as a job and
+processed in the background:
+
+1. Validate every pitch (invalid ones fail individually, not the batch)
+2. Deduplicate identical pitches - each distinct pitch is analyzed once
+   and the result is shared with its duplicates
+3. Retrieve RAG context for all distinct pitches in batched calls
+   (PitchAnalyzer.retrieve_documents)
+4. Analyze through PitchAnalyzer.analyze_pitch with a concurrency limit
+   shared by all jobs. LLM calls go through the provider rate limiter in
+   the batch lane (services/rate_limiter.py), so throughput is bound by the
+   quota rather than by how fast clients send requests, and interactive
+   requests are still served first
+5. Items whose LLM analysis failed (the analyzer's generic fallback
+   analysis) are reported as failed, not completed
+
+Per-item results and progress are kept in memory: poll them with
+GET /api/batch/{job_id} or stream them with GET /api/batch/{job_id}/events.
+Finished jobs are dropped after BATCH_JOB_TTL_SECONDS.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from models.pitch import PitchRequest
+from models.batch import BatchItemResult, BatchJobStatus
+from services.pitch_analyzer import get_pitch_analyzer, pitch_key
+from config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("completed", "cancelled")
+
+
+class BatchJob:
+    """
+    State of one batch: per-item results plus an append-only event log.
+    
+    Streaming consumers replay the log from any position and then wait on
+    the condition for new events, so late subscribers see every item.
+    """
+    
+    def __init__(self, total: int):
+        self.job_id = uuid.uuid4().hex
+        self.status = "queued"
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.items = [BatchItemResult(index=i, status="pending") for i in range(total)]
+        self.unique = 0
+        self.completed = 0
+        self.failed = 0
+        self.events: List[Tuple[str, Dict[str, Any]]] = []
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+    
+    def snapshot(self, include_items: bool = False) -> BatchJobStatus:
+        """Current progress (and optionally every item result)."""
+        return BatchJobStatus(
+            job_id=self.job_id,
+            status=self.status,
+            total=len(self.items),
+            unique=self.unique,
+            completed=self.completed,
+            failed=self.failed,
+            created_at=self.created_at,
+            finished_at=self.finished_at,
+            items=[item.model_copy() for item in self.items] if include_items else None
+        )
+    
+    async def set_item(self, index: int, status: str, analysis=None, error: Optional[str] = None,
+                       duplicate_of: Optional[int] = None):
+        """Record an item's final result and notify streaming consumers."""
+        item = BatchItemResult(index=index, status=status, analysis=analysis, error=error,
+                               duplicate_of=duplicate_of)
+        self.items[index] = item
+        if status == "completed":
+            self.completed += 1
+        elif status == "failed":
+            self.failed += 1
+        await self._publish("item", item.model_dump())
+    
+    async def finish(self, status: str):
+        """Mark the job finished and send the final summary event."""
+        self.status = status
+        self.finished_at = time.time()
+        await self._publish("done", self.snapshot().model_dump(exclude={"items"}))
+    
+    async def _publish(self, event: str, data: Dict[str, Any]):
+        async with self._changed:
+            self.events.append((event, data))
+            self._changed.notify_all()
+    
+    async def stream(self) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Every event so far, then new ones as they happen, until the job finishes."""
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.events) > position)
+                new_events = self.events[position:]
+            position += len(new_events)
+            for event in new_events:
+                yield event
+                if event[0] == "done":
+                    return
+
+
+class BatchAnalyzer:
+    """
+    Accepts batch jobs and runs them in the background.
+    
+    The concurrency limit is shared by every job, so several concurrent
+    cohorts together never hold more than BATCH_MAX_CONCURRENCY LLM calls.
+    """
+    
+    def __init__(self):
+        settings = get_settings()
+        self.analyzer = get_pitch_analyzer()
+        self.max_items = settings.batch_max_items
+        self.job_ttl_seconds = settings.batch_job_ttl_seconds
+        self.semaphore = asyncio.Semaphore(max(1, settings.batch_max_concurrency))
+        self.jobs: Dict[str, BatchJob] = {}
+        logger.info(
+            f"[BATCH] Ready (max items: {self.max_items}, concurrency: {settings.batch_max_concurrency})"
+        )
+    
+    def submit(self, pitches: List[PitchRequest], use_cache: bool = True) -> BatchJob:
+        """
+        Create a job and start processing it in the background.
+        
+        Args:
+            pitches: Pitches to analyze
+            use_cache: Set False to force fresh LLM calls
+        
+        Returns:
+            The new job (queued)
+        
+        Raises:
+            ValueError: If the batch exceeds BATCH_MAX_ITEMS
+        """
+        if len(pitches) > self.max_items:
+            raise ValueError(f"Batch too large: {len(pitches)} pitches (max {self.max_items})")
+        self._evict_expired()
+        
+        job = BatchJob(len(pitches))
+        self.jobs[job.job_id] = job
+        job.task = asyncio.create_task(self._run(job, pitches, use_cache))
+        logger.info(f"[BATCH-{job.job_id}] Submitted {len(pitches)} pitches")
+        return job
+    
+    def get_job(self, job_id: str) -> Optional[BatchJob]:
+        self._evict_expired()
+        return self.jobs.get(job_id)
+    
+    async def cancel(self, job_id: str) -> Optional[BatchJob]:
+        """
+        Stop a running job; items not yet finished are marked cancelled.
+        
+        In-flight analyses are cancelled too, unless another request is
+        waiting on the same (coalesced) analysis.
+        """
+        job = self.get_job(job_id)
+        if job is None or job.finished:
+            return job
+        job.task.cancel()
+        try:
+            await job.task
+        except asyncio.CancelledError:
+            pass
+        return job
+    
+    async def _run(self, job: BatchJob, pitches: List[PitchRequest], use_cache: bool):
+        job.status = "running"
+        try:
+            # Validate individually and group identical pitches
+            groups: Dict[str, List[int]] = {}
+            for index, pitch_request in enumerate(pitches):
+                validation = self.analyzer.validate_pitch(pitch_request)
+                if not validation["valid"]:
+                    await job.set_item(index, "failed", error="; ".join(validation["errors"]))
+                    continue
+                groups.setdefault(pitch_key(pitch_request), []).append(index)
+            
+            job.unique = len(groups)
+            leaders = [indices[0] for indices in groups.values()]
+            logger.info(f"[BATCH-{job.job_id}] {len(leaders)} distinct pitches of {len(pitches)}")
+            
+            documents = await self.analyzer.retrieve_documents([pitches[i] for i in leaders])
+            
+            await asyncio.gather(*(
+                self._analyze_group(job, pitches[indices[0]], indices, rag_documents, use_cache)
+                for indices, rag_documents in zip(groups.values(), documents)
+            ))
+            await job.finish("completed")
+            logger.info(
+                f"[BATCH-{job.job_id}] Done: {job.completed} completed, {job.failed} failed "
+                f"in {job.finished_at - job.created_at:.1f}s"
+            )
+        except asyncio.CancelledError:
+            for item in job.items:
+                if item.status in ("pending", "running"):
+                    item.status = "cancelled"
+            await job.finish("cancelled")
+            logger.info(f"[BATCH-{job.job_id}] Cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"[BATCH-{job.job_id}] Failed: {type(e).__name__}: {e}", exc_info=True)
+            for item in job.items:
+                if item.status in ("pending", "running"):
+                    await job.set_item(item.index, "failed", error="Batch processing error")
+            await job.finish("completed")
+    
+    async def _analyze_group(self, job: BatchJob, pitch_request: PitchRequest, indices: List[int],
+                             rag_documents: Optional[List[str]], use_cache: bool):
+        """Analyze one distinct pitch and share the result with its duplicates."""
+        async with self.semaphore:
+            for index in indices:
+                job.items[index].status = "running"
+            try:
+                result = await self.analyzer.analyze_pitch(pitch_request, use_cache=use_cache,
+                                                           rag_documents=rag_documents, priority="batch")
+            except Exception as e:
+                logger.error(f"[BATCH-{job.job_id}] Item {indices[0]} failed: {type(e).__name__}: {e}")
+                for index in indices:
+                    await job.set_item(index, "failed", error=str(e))
+                return
+        
+        if result.is_fallback:
+            logger.error(f"[BATCH-{job.job_id}] Item {indices[0]} failed: {result.fallback_reason}")
+            for index in indices:
+                await job.set_item(index, "failed", error=result.fallback_reason)
+            return
+        
+        await self._cache_qa_context(pitch_request, result.analysis_id)
+        for index in indices:
+            duplicate_of = indices[0] if index != indices[0] else None
+            await job.set_item(index, "completed", analysis=result, duplicate_of=duplicate_of)
+    
+    @staticmethod
+    async def _cache_qa_context(pitch_request: PitchRequest, analysis_id: str):
+        """Make the analysis usable for Q&A, like /api/analyze-pitch does."""
+        try:
+            from services.qa_simulator import get_qa_simulator
+            pitch_summary = f"{pitch_request.startup_idea}\nIndustry: {pitch_request.industry}"
+            await get_qa_simulator().cache_pitch_context(analysis_id, pitch_summary,
+                                                         pitch_request.investor_persona)
+        except Exception as e:
+            # Non-critical
+            logger.warning(f"[BATCH] Failed to cache Q&A context: {e}")
+    
+    def _evict_expired(self):
+        """Drop finished jobs older than BATCH_JOB_TTL_SECONDS."""
+        cutoff = time.time() - self.job_ttl_seconds
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+
+# Global instance
+_batch_analyzer = None
+
+def get_batch_analyzer() -> BatchAnalyzer:
+    """Get or create global batch analyzer instance."""
+    global _batch_analyzer
+    if _batch_analyzer is None:
+        _batch_analyzer = BatchAnalyzer()
+    return _batch_analyzer
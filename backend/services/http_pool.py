@@ -0,0 +1,176 @@
+"""
+HTTP Connection Pools - Shared, instrumented async transports for LLM clients.
+
+Each provider client gets one long-lived httpx.AsyncClient whose pool is
+sized to the concurrency the process can actually generate (batch
+concurrency, doubled for hedged requests), so a burst of analyses reuses
+warm keep-alive connections instead of paying a TCP + TLS handshake each.
+
+- Keep-alive, pool size, connect timeout and HTTP/2 are configurable
+  (LLM_POOL_* / LLM_CONNECT_TIMEOUT_SECONDS / LLM_HTTP2)
+- warm_up() opens connections during startup, before the first request
+- PooledTransport counts in-flight requests and new connections, and
+  reports how many pooled connections are active / idle (see /health)
+"""
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Response body wrapper that reports when the body is closed."""
+    
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+    
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+    
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+class PooledTransport(httpx.AsyncHTTPTransport):
+    """
+    AsyncHTTPTransport that records pool utilization.
+    
+    A request counts as in flight (including while it waits for a free
+    connection) until its response body is closed, which is also when its
+    connection goes back to the pool.
+    """
+    
+    def __init__(self, max_connections: int, **kwargs):
+        super().__init__(**kwargs)
+        self.max_connections = max_connections
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.connections_opened = 0
+        self._seen_connections = set()
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            self.in_flight -= 1
+            raise
+        self._count_new_connections()
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_TrackedStream(response.stream, self._release),
+            extensions=response.extensions,
+        )
+    
+    def _release(self):
+        self.in_flight -= 1
+    
+    def _count_new_connections(self):
+        current = {id(connection) for connection in self._pool.connections}
+        self.connections_opened += len(current - self._seen_connections)
+        self._seen_connections = current
+    
+    def get_stats(self) -> Dict[str, Any]:
+        connections = self._pool.connections
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "max_connections": self.max_connections,
+            "open_connections": len(connections),
+            "active_connections": len(connections) - idle,
+            "idle_connections": idle,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            # Busy share of the pool; in_flight above max_connections means requests queue for a connection
+            "utilization": round((len(connections) - idle) / self.max_connections, 3) if self.max_connections else 0.0,
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+        }
+
+
+def pool_limits(max_connections: int, max_keepalive: int, keepalive_seconds: float) -> httpx.Limits:
+    """
+    Pool limits for one provider.
+    
+    Args:
+        max_connections: Pool size (concurrent requests beyond this wait for a connection)
+        max_keepalive: Idle connections kept open for reuse
+        keepalive_seconds: How long an idle connection is kept
+    """
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=keepalive_seconds,
+    )
+
+
+def build_async_client(limits: httpx.Limits, connect_timeout: float, read_timeout: float,
+                       http2: bool = False) -> httpx.AsyncClient:
+    """
+    Create a pooled async HTTP client for one provider.
+    
+    Args:
+        limits: Pool limits (see pool_limits)
+        connect_timeout: TCP + TLS connect timeout
+        read_timeout: Read timeout (the per-call deadline still applies on top)
+        http2: Multiplex requests over HTTP/2 (needs the h2 package)
+    
+    Returns:
+        httpx.AsyncClient whose transport is a PooledTransport
+    """
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("[HTTP-POOL] LLM_HTTP2 needs the 'h2' package (pip install h2); using HTTP/1.1")
+            http2 = False
+    
+    transport = PooledTransport(max_connections=limits.max_connections, http2=http2, limits=limits)
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+    )
+
+
+def pool_stats(client: httpx.AsyncClient) -> Dict[str, Any]:
+    """Utilization of a client built by build_async_client ({} for other clients)."""
+    transport = getattr(client, "_transport", None)
+    return transport.get_stats() if isinstance(transport, PooledTransport) else {}
+
+
+async def warm_up(client: httpx.AsyncClient, url: str, connections: int) -> int:
+    """
+    Open `connections` keep-alive connections to `url` ahead of real traffic.
+    
+    Any HTTP response (even 401/404) means the TCP + TLS handshake is done
+    and the connection is back in the pool.
+    
+    Returns:
+        Number of warm-up requests that got a response
+    """
+    async def ping() -> bool:
+        try:
+            response = await client.get(url)
+            await response.aclose()
+            return True
+        except httpx.HTTPError as e:
+            logger.warning(f"[HTTP-POOL] Warm-up request to {url} failed: {type(e).__name__}: {e}")
+            return False
+    
+    results = await asyncio.gather(*(ping() for _ in range(connections)))
+    return sum(results)
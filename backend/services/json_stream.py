@@ -0,0 +1,165 @@
+"""
+Incremental JSON Parser - Pulls completed values out of a streaming reply.
+
+The analysis is one JSON object that the LLM streams token by token.
+Waiting for the whole object before showing anything wastes the entire
+generation time, so this parser scans the text as it arrives and reports
+every value that has just been completed at the top levels of the object:
+
+    {"overall_score": 72,                   -> ("overall_score",), 72
+     "section_scores": {"problem": 80},     -> ("section_scores", "problem"), 80
+                                               ("section_scores",), {...}
+     "recommendations": ["Add metrics"]}    -> ("recommendations", 0), "Add metrics"
+
+Text before the first "{" (e.g. a markdown code fence) is ignored.
+"""
+
+import json
+from typing import Any, List, Optional, Tuple, Union
+
+PathItem = Union[str, int]
+
+
+class _Container:
+    """An object or array that is still open."""
+    
+    __slots__ = ("kind", "start", "key", "index", "expect_key", "value_start", "value_done")
+    
+    def __init__(self, kind: str, start: int):
+        self.kind = kind
+        self.start = start
+        self.key: Optional[str] = None
+        self.index = 0
+        self.expect_key = kind == "{"
+        self.value_start: Optional[int] = None
+        self.value_done = False
+    
+    def member(self) -> PathItem:
+        return self.key if self.kind == "{" else self.index
+
+
+class JSONStreamParser:
+    """
+    Incremental parser for a single streamed JSON object.
+    
+    Usage:
+        parser = JSONStreamParser()
+        for delta in stream:
+            for path, value in parser.feed(delta):
+                ...
+        result = parser.result  # the whole object once it is closed
+    """
+    
+    def __init__(self, max_depth: int = 2):
+        """
+        Args:
+            max_depth: Report completed values up to this many levels deep
+                (1 = top-level members, 2 = also their children)
+        """
+        self.max_depth = max_depth
+        self.buffer = ""
+        self.result: Any = None
+        self._pos = 0
+        self._stack: List[_Container] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._string_is_key = False
+        self._done = False
+    
+    @property
+    def done(self) -> bool:
+        """True once the root object has been closed."""
+        return self._done
+    
+    def feed(self, text: str) -> List[Tuple[Tuple[PathItem, ...], Any]]:
+        """
+        Add streamed text.
+        
+        Args:
+            text: The next chunk of the reply
+        
+        Returns:
+            (path, value) for every value completed by this chunk, in order
+        """
+        self.buffer += text
+        events = []
+        buffer = self.buffer
+        
+        for i in range(self._pos, len(buffer)):
+            if self._done:
+                break
+            c = buffer[i]
+            
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    top = self._stack[-1]
+                    if self._string_is_key:
+                        top.key = json.loads(buffer[self._string_start:i + 1])
+                    else:
+                        self._emit(events, buffer[top.value_start:i + 1])
+                continue
+            
+            if not self._stack:
+                # Waiting for the root object
+                if c == "{":
+                    self._stack.append(_Container("{", i))
+                continue
+            
+            top = self._stack[-1]
+            if c in " \t\r\n":
+                continue
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+                self._string_is_key = top.kind == "{" and top.expect_key
+                if not self._string_is_key:
+                    top.value_start = i
+            elif c == ":":
+                top.expect_key = False
+            elif c == ",":
+                self._finish_scalar(events, i)
+                top.value_start = None
+                top.value_done = False
+                if top.kind == "{":
+                    top.expect_key = True
+                else:
+                    top.index += 1
+            elif c in "{[":
+                top.value_start = i
+                self._stack.append(_Container(c, i))
+            elif c in "}]":
+                self._finish_scalar(events, i)
+                closed = self._stack.pop()
+                if self._stack:
+                    self._emit(events, buffer[closed.start:i + 1])
+                else:
+                    self.result = json.loads(buffer[closed.start:i + 1])
+                    self._done = True
+            elif top.value_start is None:
+                # Start of a number, true, false or null
+                top.value_start = i
+        
+        self._pos = len(buffer)
+        return events
+    
+    def _finish_scalar(self, events: list, end: int):
+        """Report a number/literal ended by `,` or a closing bracket."""
+        top = self._stack[-1]
+        if top.value_start is not None and not top.value_done:
+            text = self.buffer[top.value_start:end].strip()
+            if text:
+                self._emit(events, text)
+    
+    def _emit(self, events: list, text: str):
+        """Record the value just completed in the innermost open container."""
+        top = self._stack[-1]
+        top.value_done = True
+        if len(self._stack) <= self.max_depth:
+            path = tuple(container.member() for container in self._stack)
+            events.append((path, json.loads(text)))
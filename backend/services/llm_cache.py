@@ -0,0 +1,215 @@
+"""
+LLM Response Cache - Content-addressed cache in front of LLMService.generate
+
+Identical pitches are re-submitted constantly (retries, refreshes, demo
+accounts). Keying on everything that affects the model output lets repeats
+skip the provider round trip entirely.
+
+Tiers:
+- Memory: bounded LRU of serialized responses (per process)
+- Disk (optional): SQLite file with TTL and size-based eviction, shared by
+  every worker on the host
+
+Responses are stored as JSON strings and decoded on every hit, so callers
+can mutate the returned dict without corrupting the cache.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(provider: str, model_name: str, generation_params: Dict[str, Any],
+                   system_prompt: Optional[str], prompt: str) -> str:
+    """
+    Build a content-addressed key for an LLM call.
+
+    Args:
+        provider: 'gemini' or 'openai'
+        model_name: Provider model identifier
+        generation_params: Sampling parameters sent with the request
+        system_prompt: System instruction (optional)
+        prompt: User prompt
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    material = json.dumps(
+        {
+            "provider": provider,
+            "model": model_name,
+            "params": generation_params,
+            "system": hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest(),
+            "prompt": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    SQLite-backed response store with TTL and max-entry eviction.
+
+    WAL mode lets several uvicorn workers read and write the same file.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return (stored value, created_at), or None if missing or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl_seconds and time.time() - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return value, created_at
+
+    def set(self, key: str, value: str):
+        """Store a value and evict expired/oldest rows beyond the size limit."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, now),
+            )
+            if self.ttl_seconds:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+                )
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class LLMResponseCache:
+    """
+    Two-tier (memory LRU + optional SQLite) cache of parsed LLM responses.
+    """
+
+    def __init__(self, max_entries: int = 256, disk_path: str = "",
+                 ttl_seconds: int = 86400, max_disk_entries: int = 10000):
+        """
+        Args:
+            max_entries: Capacity of the in-memory LRU tier
+            disk_path: SQLite file path ("" disables the disk tier)
+            ttl_seconds: Expiry for both tiers (0 = never expire)
+            max_disk_entries: Row limit for the disk tier
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = DiskCache(disk_path, ttl_seconds, max_disk_entries) if disk_path else None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, created_at = entry
+            if self.ttl_seconds and time.time() - created_at > self.ttl_seconds:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return value
+
+    def _memory_set(self, key: str, value: str, created_at: Optional[float] = None):
+        with self._lock:
+            self._memory[key] = (value, time.time() if created_at is None else created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a response in memory, then on disk.
+
+        Returns:
+            A fresh copy of the cached response dict, or None on miss
+        """
+        value = self._memory_get(key)
+        if value is None and self.disk is not None:
+            try:
+                row = await asyncio.to_thread(self.disk.get, key)
+            except sqlite3.Error as e:
+                logger.warning(f"[LLM-CACHE] Disk read failed: {e}")
+                row = None
+            if row is not None:
+                self.disk_hits += 1
+                value, created_at = row
+                # Keep the row's age so the entry still expires on the disk TTL
+                self._memory_set(key, value, created_at)
+
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(value)
+
+    async def set(self, key: str, response: Dict[str, Any]):
+        """Store a parsed response in both tiers."""
+        value = json.dumps(response)
+        self._memory_set(key, value)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.set, key, value)
+            except sqlite3.Error as e:
+                logger.warning(f"[LLM-CACHE] Disk write failed: {e}")
+
+    def record_bypass(self):
+        self.bypasses += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": self.disk.size() if self.disk is not None else 0,
+        }
@@ -0,0 +1,239 @@
+"""
+LLM Router - Multi-provider routing with failover and hedged requests.
+
+Holds one LLMService per configured provider (LLM_PROVIDERS) and exposes
+the same generate() / generate_stream() interface, so callers don't care
+which provider answers.
+
+Routing policies (LLM_ROUTING_POLICY) order the providers for each call:
+- failover: LLM_PROVIDER first, the rest in LLM_PROVIDERS order
+- fastest: lowest rolling p50 latency first (untried providers first),
+  providers failing more than half their recent calls last
+- cheapest: lowest list price per token first (PROVIDER_COSTS)
+
+Whatever the policy, a provider whose circuit is open is skipped and a
+failed call moves on to the next provider.
+
+Hedging (LLM_HEDGE_ENABLED): p99 latency is dominated by occasional
+provider stalls, not by typical calls. If the first provider hasn't
+answered after its own p95 latency (at least LLM_HEDGE_MIN_DELAY_MS), a
+second request goes to the next provider. The clock starts once the first
+request is through its rate limiter - a call waiting for quota is not
+slow, and hedging it would double spend when quota is scarce - and there
+is no hedging without a second provider with its own limiter. The first
+success wins and the other request is cancelled; if both fail, failover
+continues after the provider that was hedged to.
+Streams are not hedged (a half-rendered stream can't switch providers).
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from config.settings import get_settings
+from services.llm_service import LLMService, get_llm_service
+
+logger = logging.getLogger(__name__)
+
+ROUTING_POLICIES = ("failover", "fastest", "cheapest")
+
+# Blended list price (USD per 1M tokens) of each provider's model
+PROVIDER_COSTS = {
+    "gemini": 0.19,  # gemini-1.5-flash
+    "openai": 0.38,  # gpt-4o-mini
+}
+
+
+class LLMRouter:
+    """
+    Routes LLM calls across providers by policy, with failover and hedging.
+    """
+    
+    def __init__(self):
+        settings = get_settings()
+        self.policy = settings.llm_routing_policy
+        if self.policy not in ROUTING_POLICIES:
+            raise ValueError(f"Unsupported LLM routing policy: {self.policy}. Must be one of: {ROUTING_POLICIES}")
+        self.hedge_enabled = settings.llm_hedge_enabled
+        self.hedge_min_delay = settings.llm_hedge_min_delay_ms / 1000.0
+        
+        # The primary provider must initialize; extra providers are optional
+        names = [settings.llm_provider]
+        for name in settings.llm_providers.split(","):
+            name = name.strip()
+            if name and name not in names:
+                names.append(name)
+        
+        self.services: List[LLMService] = [get_llm_service(names[0])]
+        for name in names[1:]:
+            try:
+                self.services.append(get_llm_service(name))
+            except Exception as e:
+                logger.warning(f"[LLM-ROUTER] Skipping provider {name}: {e}")
+        
+        self.stats = {"hedged": 0, "hedge_wins": 0, "failovers": 0}
+        logger.info(
+            f"[LLM-ROUTER] Providers: {[s.provider for s in self.services]}, policy: {self.policy}, "
+            f"hedging: {'on' if self.hedge_enabled else 'off'}"
+        )
+    
+    def route(self) -> List[LLMService]:
+        """Providers in the order the policy would try them (open circuits last)."""
+        services = list(self.services)
+        if self.policy == "fastest":
+            # Untried providers (no latency yet) sort first so they get measured
+            services.sort(key=lambda s: (s.health.error_rate() > 0.5, s.health.percentile(0.5) or 0.0))
+        elif self.policy == "cheapest":
+            services.sort(key=lambda s: PROVIDER_COSTS.get(s.provider, float("inf")))
+        # Stable sort: keeps the policy order among healthy providers
+        services.sort(key=lambda s: s.breaker.state == "open")
+        return services
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       use_cache: bool = True, priority: str = "interactive") -> Dict[str, Any]:
+        """
+        Generate a JSON response from the best available provider.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: System instruction (optional)
+            use_cache: Set False to bypass the response cache
+            priority: Rate-limiter lane, 'interactive' or 'batch'
+        
+        Returns:
+            Parsed JSON response
+        
+        Raises:
+            The last provider's error if every provider failed
+        """
+        services = self.route()
+        last_error = None
+        tried = set()
+        for i, service in enumerate(services):
+            if service in tried:
+                continue  # Already failed as the hedge of an earlier provider
+            tried.add(service)
+            if last_error is not None:
+                self.stats["failovers"] += 1
+                logger.warning(f"[LLM-ROUTER] Failing over to {service.provider}")
+            try:
+                backup = services[i + 1] if i + 1 < len(services) else None
+                if self.hedge_enabled and backup is not None and backup.limiter is not service.limiter:
+                    return await self._hedged(service, backup, prompt, system_prompt, use_cache, priority,
+                                              tried)
+                return await service.generate(prompt, system_prompt, use_cache=use_cache, priority=priority)
+            except Exception as e:
+                logger.error(f"[LLM-ROUTER] {service.provider} failed: {type(e).__name__}: {e}")
+                last_error = e
+        raise last_error
+    
+    async def _hedged(self, primary: LLMService, backup: LLMService, prompt: str,
+                      system_prompt: Optional[str], use_cache: bool, priority: str,
+                      tried: set) -> Dict[str, Any]:
+        """
+        Call `primary`; if it is slower than its p95, also call `backup`.
+        
+        The delay counts from the primary's admission by its rate limiter,
+        so time spent queued for quota never triggers a hedge.
+        The first successful response wins and the other call is cancelled.
+        If both fail, the primary's error is raised; `backup` is added to
+        `tried` once called, so failover does not call it again.
+        """
+        admitted = asyncio.Event()
+        
+        def call(service: LLMService, on_admitted=None) -> asyncio.Task:
+            return asyncio.create_task(
+                service.generate(prompt, system_prompt, use_cache=use_cache, priority=priority,
+                                 on_admitted=on_admitted)
+            )
+        
+        first = call(primary, admitted.set)
+        admission = asyncio.create_task(admitted.wait())
+        tasks = {first}
+        try:
+            # Cache hits and errors finish without admission
+            await asyncio.wait({first, admission}, return_when=asyncio.FIRST_COMPLETED)
+            if first.done():
+                return first.result()
+            delay = max(self.hedge_min_delay, primary.health.percentile(0.95) or 0.0)
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return first.result()
+            
+            self.stats["hedged"] += 1
+            logger.info(f"[LLM-ROUTER] {primary.provider} slower than {delay:.2f}s, hedging to {backup.provider}")
+            second = call(backup)
+            tried.add(backup)
+            tasks.add(second)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+            # Both failed
+            return first.result()
+        finally:
+            # Cancel the loser (or everything, if we were cancelled ourselves)
+            admission.cancel()
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    async def generate_stream(self, prompt: str, system_prompt: Optional[str] = None,
+                              use_cache: bool = True, priority: str = "interactive") -> AsyncIterator[str]:
+        """
+        Stream from the best available provider (see LLMService.generate_stream).
+        
+        Fails over to the next provider only if nothing has been yielded yet.
+        """
+        services = self.route()
+        for i, service in enumerate(services):
+            received = False
+            try:
+                async for chunk in service.generate_stream(prompt, system_prompt, use_cache=use_cache,
+                                                           priority=priority):
+                    received = True
+                    yield chunk
+                return
+            except Exception as e:
+                logger.error(f"[LLM-ROUTER] {service.provider} stream failed: {type(e).__name__}: {e}")
+                if received or i + 1 == len(services):
+                    raise
+                self.stats["failovers"] += 1
+                logger.warning(f"[LLM-ROUTER] Failing over stream to {services[i + 1].provider}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Routing counters plus per-provider latency, limiter and circuit stats."""
+        return {
+            "policy": self.policy,
+            "hedging": self.hedge_enabled,
+            **self.stats,
+            "providers": {
+                service.provider: {
+                    "model": service.model_name,
+                    **service.health.get_stats(),
+                    **service.get_rate_limit_stats(),
+                    "pool": service.get_pool_stats(),
+                    "prompt_cache": service.get_prompt_cache_stats(),
+                }
+                for service in self.services
+            },
+        }
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Response-cache counters of each provider."""
+        return {service.provider: service.get_cache_stats() for service in self.services}
+
+
+# Global instance
+_llm_router = None
+
+def get_llm_router() -> LLMRouter:
+    """Get or create global LLM router instance."""
+    global _llm_router
+    if _llm_router is None:
+        _llm_router = LLMRouter()
+    return _llm_router
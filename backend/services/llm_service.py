@@ -6,14 +6,49 @@ Supports:
 - OpenAI (gpt-4, gpt-3.5-turbo)
 
 Forces JSON output and handles parsing.
+
+Parsed responses are cached (services/llm_cache.py) keyed on provider,
+model, generation params and prompt hashes, so repeated pitches skip the
+provider round trip.
+
+All provider calls go through the native async clients, so a slow reply
+never stalls the event loop and every call has an enforced deadline
+(settings.llm_timeout_seconds) that cancels the in-flight request.
+
+generate_stream() exposes the providers' streaming APIs for callers that
+render a reply progressively (see services/json_stream.py).
+
+Calls are admitted through a shared per-provider/model rate limiter
+(requests/min and tokens/min, interactive ahead of batch), transient
+provider errors are retried with jittered backoff honouring Retry-After,
+and a circuit breaker fails fast while the provider is down (see
+services/rate_limiter.py).
+
+Each provider client runs on its own pooled keep-alive HTTP client
+(services/http_pool.py), warmed up at startup.
+
+The system prompt is sent as a byte-stable prefix the provider can cache:
+a Gemini context cache or OpenAI's automatic prompt caching (see
+services/prompt_cache.py). Cached vs uncached prompt tokens are logged per
+call and counted per provider.
 """
 
 import json
 import os
+import time
 import asyncio
 import logging
-from typing import Dict, Any, Optional
+from collections import deque
+import httpx
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional, Tuple
 from config.settings import get_settings
+from services.llm_cache import LLMResponseCache, make_cache_key
+from services.rate_limiter import CircuitBreaker, classify_error, get_rate_limiter, retry_delay
+from services.http_pool import build_async_client, pool_limits, pool_stats, warm_up
+from services.prompt_cache import (
+    GeminiContextCache, PromptCacheStats, gemini_usage, openai_usage, prefix_key
+)
+from services.prompt_budget import estimate_tokens
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,6 +56,48 @@ logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+# Rolling window of provider calls used for latency percentiles / error rate
+HEALTH_WINDOW = 200
+
+
+class ProviderHealth:
+    """
+    Rolling latency and error statistics of real provider calls.
+    
+    Cache hits are not recorded, so the percentiles describe the provider,
+    not the cache. Read by the router (services/llm_router.py) for
+    'fastest' routing and hedging delays.
+    """
+    
+    def __init__(self, window: int = HEALTH_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+    
+    def record_success(self, seconds: float):
+        self.latencies.append(seconds)
+        self.outcomes.append(True)
+    
+    def record_failure(self):
+        self.outcomes.append(False)
+    
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency percentile in seconds (q in 0..1), None without data."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {"calls": len(self.outcomes), "error_rate": round(self.error_rate(), 3)}
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            value = self.percentile(q)
+            stats[f"{name}_ms"] = round(value * 1000, 1) if value is not None else None
+        return stats
+
+
 class LLMService:
     """
     Abstraction layer for LLM APIs.
@@ -36,6 +113,20 @@ class LLMService:
             provider: 'gemini' or 'openai' (defaults to settings)
         """
         self.provider = provider or settings.llm_provider
+        self.timeout_seconds = settings.llm_timeout_seconds
+        # Pool sized to batch concurrency plus interactive traffic; hedging can double it
+        max_connections = settings.llm_pool_max_connections or max(10, 2 * settings.batch_max_concurrency)
+        self.pool_limits = pool_limits(
+            max_connections,
+            settings.llm_pool_max_keepalive or max_connections,
+            settings.llm_pool_keepalive_seconds,
+        )
+        self.http_client = build_async_client(
+            self.pool_limits,
+            connect_timeout=settings.llm_connect_timeout_seconds,
+            read_timeout=settings.llm_timeout_seconds,
+            http2=settings.llm_http2,
+        )
         
         if self.provider == "gemini":
             self._init_gemini()
@@ -44,6 +135,25 @@ class LLMService:
         else:
             raise ValueError(f"Unsupported LLM provider: {self.provider}")
         
+        self.limiter = get_rate_limiter(
+            self.provider, self.model_name,
+            settings.llm_requests_per_minute, settings.llm_tokens_per_minute
+        )
+        self.breaker = CircuitBreaker(settings.llm_breaker_failures, settings.llm_breaker_cooldown_seconds)
+        self.max_retries = settings.llm_max_retries
+        self.retry_stats = {"retries": 0, "throttled": 0, "transient": 0, "timeout": 0}
+        self.health = ProviderHealth()
+        self.prompt_cache_stats = PromptCacheStats()
+        
+        self.cache = None
+        if settings.llm_cache_enabled:
+            self.cache = LLMResponseCache(
+                max_entries=settings.llm_cache_max_entries,
+                disk_path=settings.llm_cache_path,
+                ttl_seconds=settings.llm_cache_ttl_seconds,
+                max_disk_entries=settings.llm_cache_max_disk_entries,
+            )
+        
         print(f"Initialized LLM service with provider: {self.provider}")
     
     def _init_gemini(self):
@@ -55,17 +165,34 @@ class LLMService:
             if not api_key:
                 raise ValueError("GEMINI_API_KEY not found in settings")
             
-            self.client = genai.Client(api_key=api_key)
+            if "httpx_async_client" in genai.types.HttpOptions.model_fields:
+                http_options = genai.types.HttpOptions(httpx_async_client=self.http_client)
+            else:
+                # Older SDKs can't take a client - pool limits only, no pool metrics
+                http_options = genai.types.HttpOptions(
+                    async_client_args={"limits": self.pool_limits}
+                )
+            self.client = genai.Client(api_key=api_key, http_options=http_options)
+            self.base_url = "https://generativelanguage.googleapis.com/"
             # Use gemini-1.5-flash without "models/" prefix for v1beta
             self.model_name = "gemini-1.5-flash"
             
             # Configure for JSON output
-            self.generation_config = genai.types.GenerateContentConfig(
-                temperature=0.7,
-                top_p=0.95,
-                top_k=40,
-                max_output_tokens=2048,
-            )
+            self.generation_params = {
+                "temperature": 0.7,
+                "top_p": 0.95,
+                "top_k": 40,
+                "max_output_tokens": 2048,
+            }
+            
+            self.context_cache = None
+            if settings.llm_prompt_cache_enabled:
+                self.context_cache = GeminiContextCache(
+                    self.client, self.model_name,
+                    ttl_seconds=settings.llm_prompt_cache_ttl_seconds,
+                    min_tokens=settings.llm_prompt_cache_min_tokens,
+                    timeout_seconds=settings.llm_timeout_seconds,
+                )
             
         except Exception as e:
             raise RuntimeError(f"Failed to initialize Gemini: {e}")
@@ -73,98 +200,369 @@ class LLMService:
     def _init_openai(self):
         """Initialize OpenAI."""
         try:
-            from openai import OpenAI
+            from openai import AsyncOpenAI
             
             api_key = settings.openai_api_key
             if not api_key:
                 raise ValueError("OPENAI_API_KEY not found in settings")
             
-            self.client = OpenAI(api_key=api_key)
+            # Async client on the pooled transport: requests never block the
+            # event loop. SDK retries are disabled - LLMService retries itself.
+            self.client = AsyncOpenAI(
+                api_key=api_key,
+                timeout=httpx.Timeout(settings.llm_timeout_seconds, connect=settings.llm_connect_timeout_seconds),
+                max_retries=0,
+                http_client=self.http_client,
+            )
+            self.base_url = str(self.client.base_url)
             self.model_name = "gpt-4o-mini"  # or gpt-4
+            self.generation_params = {
+                "temperature": 0.7,
+                "max_tokens": 2048,
+                "response_format": {"type": "json_object"},  # Force JSON output
+            }
             
         except Exception as e:
             raise RuntimeError(f"Failed to initialize OpenAI: {e}")
     
-    async def generate(self, prompt: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
+    async def warm_up(self) -> int:
+        """Open LLM_POOL_WARM_CONNECTIONS connections to the provider (call at startup)."""
+        if settings.llm_pool_warm_connections <= 0:
+            return 0
+        return await warm_up(self.http_client, self.base_url, settings.llm_pool_warm_connections)
+    
+    async def aclose(self):
+        """Close the pooled connections (call at shutdown)."""
+        await self.http_client.aclose()
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Connection-pool utilization of this provider's HTTP client."""
+        return pool_stats(self.http_client)
+    
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       use_cache: bool = True, priority: str = "interactive",
+                       on_admitted: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
         """
         Generate response from LLM.
         
         Args:
             prompt: User prompt
             system_prompt: System instruction (optional)
+            use_cache: Set False to bypass the response cache for this call
+                (the fresh response still refreshes the cache)
+            priority: Rate-limiter lane, 'interactive' or 'batch'
+            on_admitted: Called each time the call passes the rate limiter
+                (the router starts its hedge clock there)
             
         Returns:
             Parsed JSON response
+            
+        Raises:
+            CircuitOpenError: While the provider's circuit is open
+            RuntimeError / ValueError: Once retries are exhausted
         """
-        if self.provider == "gemini":
-            return await self._generate_gemini(prompt, system_prompt)
-        elif self.provider == "openai":
-            return await self._generate_openai(prompt, system_prompt)
+        cache_key, cached = await self._cache_lookup(prompt, system_prompt, use_cache)
+        if cached is not None:
+            return cached
+        
+        estimated_tokens = self._estimate_tokens(prompt, system_prompt)
+        attempt = 0
+        while True:
+            await self._admit(estimated_tokens, priority)
+            if on_admitted is not None:
+                on_admitted()
+            started = time.perf_counter()
+            try:
+                if self.provider == "gemini":
+                    result, used_tokens = await self._generate_gemini(prompt, system_prompt)
+                else:
+                    result, used_tokens = await self._generate_openai(prompt, system_prompt)
+                self.health.record_success(time.perf_counter() - started)
+                break
+            except asyncio.CancelledError:
+                # e.g. the losing side of a hedged request - not a provider failure
+                self.breaker.release()
+                self.limiter.reconcile(estimated_tokens, self._prompt_tokens(prompt, system_prompt))
+                raise
+            except Exception as e:
+                # No completion came back: keep only the prompt's share of the charge
+                self.limiter.reconcile(estimated_tokens, self._prompt_tokens(prompt, system_prompt))
+                delay = self._on_failure(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+        
+        self.breaker.record_success()
+        self.limiter.reconcile(estimated_tokens, used_tokens)
+        
+        if cache_key is not None:
+            await self.cache.set(cache_key, result)
+        return result
+    
+    async def generate_stream(self, prompt: str, system_prompt: Optional[str] = None,
+                              use_cache: bool = True, priority: str = "interactive") -> AsyncIterator[str]:
+        """
+        Stream the raw reply text as the model generates it.
+        
+        A cached response is replayed as a single chunk. When the stream
+        ends, the full text is parsed and cached exactly like generate().
+        The whole stream shares one deadline (settings.llm_timeout_seconds).
+        A failed stream is only retried if nothing has been yielded yet.
+        Each attempt's tokens/min charge is settled from the prompt plus
+        the text it streamed.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: System instruction (optional)
+            use_cache: Set False to bypass the response cache for this call
+            priority: Rate-limiter lane, 'interactive' or 'batch'
+            
+        Yields:
+            Text chunks of the JSON reply
+            
+        Raises:
+            ValueError: If the complete reply is not valid JSON
+            RuntimeError: On provider errors or timeout
+        """
+        cache_key, cached = await self._cache_lookup(prompt, system_prompt, use_cache)
+        if cached is not None:
+            yield json.dumps(cached)
+            return
+        
+        estimated_tokens = self._estimate_tokens(prompt, system_prompt)
+        chunks = []
+        attempt = 0
+        while True:
+            await self._admit(estimated_tokens, priority)
+            started = time.perf_counter()
+            if self.provider == "gemini":
+                stream = self._stream_gemini(prompt, system_prompt)
+            else:
+                stream = self._stream_openai(prompt, system_prompt)
+            try:
+                async for chunk in self._stream_with_deadline(stream):
+                    chunks.append(chunk)
+                    yield chunk
+                self.health.record_success(time.perf_counter() - started)
+                break
+            except (asyncio.CancelledError, GeneratorExit):
+                self.breaker.release()
+                self.limiter.reconcile(estimated_tokens, self._streamed_tokens(prompt, system_prompt, chunks))
+                raise
+            except Exception as e:
+                self.limiter.reconcile(estimated_tokens, self._streamed_tokens(prompt, system_prompt, chunks))
+                delay = self._on_failure(e, attempt, can_retry=not chunks)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+        self.breaker.record_success()
+        self.limiter.reconcile(estimated_tokens, self._streamed_tokens(prompt, system_prompt, chunks))
+        
+        text = "".join(chunks)
+        logger.info(f"[LLM] ✓ Streamed {len(text)} chars from {self.provider}")
+        try:
+            result = self._parse_json(text)
+        except json.JSONDecodeError as e:
+            logger.error(f"[LLM] ✗ JSON parsing error: {e}")
+            logger.error(f"[LLM] Raw response: {text[:500]}")
+            raise ValueError(f"LLM did not return valid JSON: {e}")
+        
+        if cache_key is not None:
+            await self.cache.set(cache_key, result)
+    
+    async def _cache_lookup(self, prompt: str, system_prompt: Optional[str],
+                            use_cache: bool) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Return (cache key, cached response or None); key is None if caching is off."""
+        if self.cache is None:
+            return None, None
+        cache_key = make_cache_key(
+            self.provider, self.model_name, self.generation_params, system_prompt, prompt
+        )
+        if not use_cache:
+            self.cache.record_bypass()
+            return cache_key, None
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"[LLM] ✓ Cache hit ({cache_key[:12]})")
+        return cache_key, cached
+    
+    def _estimate_tokens(self, prompt: str, system_prompt: Optional[str]) -> int:
+        """Prompt tokens (~4 chars each) plus the completion budget, for the tokens/min bucket."""
+        max_output = self.generation_params.get("max_output_tokens") or self.generation_params.get("max_tokens", 0)
+        return self._prompt_tokens(prompt, system_prompt) + max_output
+    
+    @staticmethod
+    def _prompt_tokens(prompt: str, system_prompt: Optional[str]) -> int:
+        """Approximate prompt tokens (~4 chars each)."""
+        return (len(prompt) + len(system_prompt or "")) // 4
+    
+    def _streamed_tokens(self, prompt: str, system_prompt: Optional[str], chunks: List[str]) -> int:
+        """Approximate tokens used by a stream: the prompt plus the text received so far."""
+        return self._prompt_tokens(prompt, system_prompt) + sum(len(chunk) for chunk in chunks) // 4
     
-    async def _generate_gemini(self, prompt: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
+    async def _admit(self, estimated_tokens: int, priority: str):
+        """Fail fast if the circuit is open, then wait for rate-limit capacity."""
+        self.breaker.check()
+        try:
+            await self.limiter.acquire(estimated_tokens, priority)
+        except BaseException:
+            # Cancelled (e.g. a losing hedge) or failed while queued: a
+            # half-open probe never reached the provider, let the next call probe
+            self.breaker.release()
+            raise
+    
+    def _on_failure(self, error: Exception, attempt: int, can_retry: bool = True) -> Optional[float]:
+        """
+        Update breaker/limiter state after a failed call.
+        
+        Returns:
+            Seconds to wait before retrying, or None to give up
+        """
+        info = classify_error(error)
+        if info.kind != "fatal":
+            self.health.record_failure()
+        if info.kind == "throttled":
+            self.retry_stats["throttled"] += 1
+            delay = retry_delay(attempt, settings.llm_retry_base_seconds,
+                                settings.llm_retry_max_seconds, info.retry_after)
+            # Hold back every waiter, not just this call
+            self.limiter.pause(delay)
+            self.breaker.release()
+        elif info.kind in ("transient", "timeout"):
+            self.retry_stats[info.kind] += 1
+            self.breaker.record_failure()
+            delay = retry_delay(attempt, settings.llm_retry_base_seconds,
+                                settings.llm_retry_max_seconds, info.retry_after)
+        else:
+            self.breaker.release()
+            return None
+        
+        # Timeouts already spent the call's whole budget - don't double it
+        if info.kind == "timeout" or not can_retry or attempt >= self.max_retries:
+            return None
+        if self.breaker.state != "closed":
+            return None
+        self.retry_stats["retries"] += 1
+        logger.warning(
+            f"[LLM] {self.provider} {info.kind} error (status {info.status}), "
+            f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+        )
+        return delay
+    
+    def get_rate_limit_stats(self) -> Dict[str, Any]:
+        """Limiter queue/wait counters, retry counters and breaker state."""
+        return {
+            "limiter": self.limiter.get_stats(),
+            "retries": dict(self.retry_stats),
+            "circuit": self.breaker.get_stats(),
+        }
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Return response-cache counters (empty if caching is disabled)."""
+        return self.cache.get_stats() if self.cache is not None else {}
+    
+    def get_prompt_cache_stats(self) -> Dict[str, Any]:
+        """Cached vs uncached prompt tokens reported by the provider (plus Gemini context caches)."""
+        stats = self.prompt_cache_stats.get_stats()
+        if getattr(self, "context_cache", None) is not None:
+            stats["context_caches"] = self.context_cache.get_stats()
+        return stats
+    
+    def _record_prompt_usage(self, prompt_tokens: int, cached_tokens: int):
+        """Count one call's prompt tokens (skipped if the provider reported none)."""
+        if not prompt_tokens:
+            return
+        self.prompt_cache_stats.record(prompt_tokens, cached_tokens)
+        logger.info(f"[LLM] Prompt tokens: {prompt_tokens} ({cached_tokens} cached)")
+    
+    def _gemini_config(self, system_prompt: Optional[str], cache_name: Optional[str]):
+        """Per-call GenerateContentConfig: the prefix by cache name, or inline as system instruction."""
+        from google.genai import types
+        
+        if cache_name:
+            return types.GenerateContentConfig(**self.generation_params, cached_content=cache_name)
+        return types.GenerateContentConfig(**self.generation_params, system_instruction=system_prompt)
+    
+    async def _call_gemini(self, method, prompt: str, system_prompt: Optional[str]):
+        """
+        Call a client.aio.models method with the system prompt as a cached prefix when possible.
+        
+        If Gemini rejects the cache (expired or deleted early), it is
+        forgotten and the call is repeated once with the prefix inline.
+        """
+        cache_name = None
+        if system_prompt and self.context_cache is not None:
+            cache_name = await self.context_cache.get(system_prompt, estimate_tokens(system_prompt))
+        try:
+            return await method(
+                model=self.model_name,
+                contents=prompt,
+                config=self._gemini_config(system_prompt, cache_name)
+            )
+        except Exception as e:
+            if cache_name is None or classify_error(e).kind != "fatal":
+                raise
+            logger.warning(f"[PROMPT-CACHE] Gemini rejected cache {cache_name}, sending prefix inline: {e}")
+            self.context_cache.invalidate(cache_name)
+            return await method(
+                model=self.model_name,
+                contents=prompt,
+                config=self._gemini_config(system_prompt, None)
+            )
+    
+    def _openai_extra_body(self, system_prompt: Optional[str]) -> Dict[str, Any]:
+        """Route requests sharing a system prompt to the same OpenAI prompt cache."""
+        if not system_prompt or not settings.llm_prompt_cache_enabled:
+            return {}
+        return {"prompt_cache_key": prefix_key(system_prompt)}
+    
+    async def _generate_gemini(self, prompt: str, system_prompt: Optional[str] = None) -> Tuple[Dict[str, Any], int]:
         """
         Generate with Gemini with HARD TIMEOUT.
         
-        CRITICAL FIX: Add 15-second timeout to prevent hanging requests
+        Uses the native async client (client.aio) so the call yields to the
+        event loop while waiting on the network. asyncio.wait_for can then
+        actually cancel the request when the deadline passes.
+        
+        Returns:
+            (parsed JSON, total tokens used or 0 if unknown)
         """
+        text = ""
         try:
-            # Combine system prompt and user prompt
-            full_prompt = ""
-            if system_prompt:
-                full_prompt = f"{system_prompt}\n\n{prompt}"
-            else:
-                full_prompt = prompt
-            
             logger.info(f"[LLM] Calling Gemini API (model: {self.model_name})...")
             
-            # CRITICAL FIX: Add timeout to prevent hanging
-            # If Gemini doesn't respond in 15 seconds, abort
-            try:
-                async def _call_gemini():
-                    return self.client.models.generate_content(
-                        model=self.model_name,
-                        contents=full_prompt,
-                        config=self.generation_config
-                    )
-                
-                # 15-second hard timeout
-                response = await asyncio.wait_for(_call_gemini(), timeout=15.0)
-                logger.info("[LLM] ✓ Gemini API responded successfully")
-                
-            except asyncio.TimeoutError:
-                logger.error("[LLM] ✗ Gemini API timeout (15 seconds)")
-                raise RuntimeError("LLM request timed out after 15 seconds")
+            # System prompt goes in as the (cacheable) system instruction
+            response = await self._with_deadline(
+                self._call_gemini(self.client.aio.models.generate_content, prompt, system_prompt)
+            )
+            logger.info("[LLM] ✓ Gemini API responded successfully")
             
             # Extract text
             text = response.text
             logger.info(f"[LLM] Received {len(text)} chars from Gemini")
             
-            # Parse JSON
-            # Remove markdown code blocks if present
-            text = text.strip()
-            if text.startswith("```json"):
-                text = text[7:]
-            if text.startswith("```"):
-                text = text[3:]
-            if text.endswith("```"):
-                text = text[:-3]
-            text = text.strip()
-            
-            # Parse JSON
-            result = json.loads(text)
+            result = self._parse_json(text)
             logger.info("[LLM] ✓ JSON parsed successfully")
-            return result
+            usage = getattr(response, "usage_metadata", None)
+            self._record_prompt_usage(*gemini_usage(usage))
+            return result, getattr(usage, "total_token_count", None) or 0
             
         except json.JSONDecodeError as e:
             logger.error(f"[LLM] ✗ JSON parsing error: {e}")
             logger.error(f"[LLM] Raw response: {text[:500]}")
             raise ValueError(f"LLM did not return valid JSON: {e}")
+        except asyncio.CancelledError:
+            logger.warning("[LLM] Gemini request cancelled")
+            raise
         except Exception as e:
             logger.error(f"[LLM] ✗ Gemini generation error: {type(e).__name__}: {e}")
-            raise RuntimeError(f"Failed to generate with Gemini: {e}")
+            raise RuntimeError(f"Failed to generate with Gemini: {e}") from e
     
-    async def _generate_openai(self, prompt: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
-        """Generate with OpenAI."""
+    async def _generate_openai(self, prompt: str, system_prompt: Optional[str] = None) -> Tuple[Dict[str, Any], int]:
+        """Generate with OpenAI (async client, same deadline and return value as Gemini)."""
+        text = ""
         try:
             messages = []
             
@@ -173,34 +571,139 @@ class LLMService:
             
             messages.append({"role": "user", "content": prompt})
             
+            logger.info(f"[LLM] Calling OpenAI API (model: {self.model_name})...")
+            
             # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=2048,
-                response_format={"type": "json_object"}  # Force JSON output
+            response = await self._with_deadline(
+                self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    extra_body=self._openai_extra_body(system_prompt) or None,
+                    **self.generation_params
+                )
             )
             
             # Extract and parse JSON
             text = response.choices[0].message.content
-            result = json.loads(text)
-            return result
+            result = self._parse_json(text)
+            usage = getattr(response, "usage", None)
+            self._record_prompt_usage(*openai_usage(usage))
+            return result, getattr(usage, "total_tokens", None) or 0
             
         except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {e}")
-            print(f"Raw response: {text}")
+            logger.error(f"[LLM] ✗ JSON parsing error: {e}")
+            logger.error(f"[LLM] Raw response: {text[:500]}")
             raise ValueError(f"LLM did not return valid JSON: {e}")
+        except asyncio.CancelledError:
+            logger.warning("[LLM] OpenAI request cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"[LLM] ✗ OpenAI generation error: {type(e).__name__}: {e}")
+            raise RuntimeError(f"Failed to generate with OpenAI: {e}") from e
+    
+    async def _stream_gemini(self, prompt: str, system_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream a Gemini reply (generate_content_stream on the async client)."""
+        logger.info(f"[LLM] Streaming from Gemini API (model: {self.model_name})...")
+        try:
+            stream = await self._call_gemini(self.client.aio.models.generate_content_stream, prompt, system_prompt)
+            usage = None
+            async for chunk in stream:
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                if chunk.text:
+                    yield chunk.text
+            self._record_prompt_usage(*gemini_usage(usage))
+        except asyncio.CancelledError:
+            logger.warning("[LLM] Gemini stream cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"[LLM] ✗ Gemini streaming error: {type(e).__name__}: {e}")
+            raise RuntimeError(f"Failed to stream with Gemini: {e}") from e
+    
+    async def _stream_openai(self, prompt: str, system_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream an OpenAI reply (chat completions with stream=True)."""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        logger.info(f"[LLM] Streaming from OpenAI API (model: {self.model_name})...")
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                stream=True,
+                # Final chunk carries the usage (incl. cached prompt tokens)
+                extra_body={**self._openai_extra_body(system_prompt), "stream_options": {"include_usage": True}},
+                **self.generation_params
+            )
+            usage = None
+            async for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            self._record_prompt_usage(*openai_usage(usage))
+        except asyncio.CancelledError:
+            logger.warning("[LLM] OpenAI stream cancelled")
+            raise
         except Exception as e:
-            print(f"OpenAI generation error: {e}")
-            raise RuntimeError(f"Failed to generate with OpenAI: {e}")
-
-# Global instance
-_llm_service = None
-
-def get_llm_service() -> LLMService:
-    """Get or create global LLM service instance."""
-    global _llm_service
-    if _llm_service is None:
-        _llm_service = LLMService()
-    return _llm_service
+            logger.error(f"[LLM] ✗ OpenAI streaming error: {type(e).__name__}: {e}")
+            raise RuntimeError(f"Failed to stream with OpenAI: {e}") from e
+    
+    async def _stream_with_deadline(self, stream: AsyncIterator[str]) -> AsyncIterator[str]:
+        """
+        Relay a provider stream under the per-call deadline.
+        
+        The deadline covers the whole stream, not each chunk, so a slow
+        trickle can't outlive a non-streaming call. On timeout the stream
+        is closed (ending its HTTP request) and a RuntimeError is raised.
+        """
+        timeout = self.timeout_seconds
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=max(deadline - loop.time(), 0))
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        except asyncio.TimeoutError as e:
+            logger.error(f"[LLM] ✗ {self.provider} stream timeout ({timeout:g} seconds)")
+            raise RuntimeError(f"LLM request timed out after {timeout:g} seconds") from e
+        finally:
+            await stream.aclose()
+    
+    async def _with_deadline(self, coro):
+        """
+        Await a provider call with the configured per-call deadline.
+        
+        On timeout the underlying task is cancelled (closing its HTTP
+        request) and a RuntimeError is raised for the callers' fallbacks.
+        """
+        timeout = self.timeout_seconds
+        try:
+            return await asyncio.wait_for(coro, timeout=timeout)
+        except asyncio.TimeoutError as e:
+            logger.error(f"[LLM] ✗ {self.provider} API timeout ({timeout:g} seconds)")
+            raise RuntimeError(f"LLM request timed out after {timeout:g} seconds") from e
+    
+    @staticmethod
+    def _parse_json(text: str) -> Dict[str, Any]:
+        """Parse model output as JSON, stripping markdown code fences if present."""
+        text = text.strip()
+        if text.startswith("```json"):
+            text = text[7:]
+        if text.startswith("```"):
+            text = text[3:]
+        if text.endswith("```"):
+            text = text[:-3]
+        return json.loads(text.strip())
+
+# Global instances (one per provider)
+_llm_services: Dict[str, LLMService] = {}
+
+def get_llm_service(provider: Optional[str] = None) -> LLMService:
+    """Get or create the global LLM service for a provider (default: settings.llm_provider)."""
+    provider = provider or settings.llm_provider
+    if provider not in _llm_services:
+        _llm_services[provider] = LLMService(provider)
+    return _llm_services[provider]
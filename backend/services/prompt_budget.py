@@ -0,0 +1,207 @@
+"""
+Prompt Budget - Keep analysis prompts within an input-token budget.
+
+LLM latency grows with input tokens, and an analysis prompt used to paste
+every retrieved chunk and the whole pitch deck text, however long. The
+budget stage runs between retrieval and prompt building:
+
+1. Count tokens per section (system prompt, template, persona, RAG,
+   idea, deck text)
+2. Deduplicate RAG chunks: neighbouring chunks of a document share an
+   overlap window, so a chunk mostly contained in a higher-ranked one is
+   dropped and a shared head/tail run of words is cut
+3. If the prompt is still over budget, the deck text and the RAG chunks
+   split what is left (neither gets less than half if the other needs it):
+   lower-ranked chunks are compressed or dropped first, and long text is
+   compressed extractively (the sentences most related to the pitch, and
+   those with figures, are kept in their original order)
+
+The idea itself is never cut. Token counts are estimates (~4 characters
+per token), the same as the LLM rate limiter uses.
+"""
+
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[a-z0-9$%]+")
+
+# Shingle size for near-duplicate detection, and the shortest head/tail
+# run of words treated as chunk overlap rather than a coincidence
+SHINGLE_WORDS = 5
+MIN_OVERLAP_WORDS = 8
+
+# A chunk compressed below this is dropped instead
+MIN_CHUNK_TOKENS = 40
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def _shingles(words: List[str]) -> Set[tuple]:
+    if len(words) < SHINGLE_WORDS:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def _trim_overlap(words: List[str], kept: List[str]) -> List[str]:
+    """Cut a run of words that `kept` ends with (or starts with) from the head (or tail) of `words`."""
+    longest = min(len(words), len(kept))
+    for n in range(longest, MIN_OVERLAP_WORDS - 1, -1):
+        if kept[-n:] == words[:n]:
+            return words[n:]
+        if kept[:n] == words[-n:]:
+            return words[:-n]
+    return words
+
+
+def dedupe_chunks(documents: List[str], threshold: float = 0.8) -> List[str]:
+    """
+    Remove near-duplicate and overlapping text from ranked chunks.
+    
+    Args:
+        documents: Chunks, best match first
+        threshold: Drop a chunk when this share of its word shingles was
+            already in higher-ranked chunks
+    
+    Returns:
+        Remaining chunks, in rank order
+    """
+    kept: List[str] = []
+    kept_words: List[List[str]] = []
+    seen: Set[tuple] = set()
+    for document in documents:
+        words = document.split()
+        shingles = _shingles([w.lower() for w in words])
+        if not shingles or len(shingles & seen) / len(shingles) >= threshold:
+            continue
+        trimmed = words
+        for other in kept_words:
+            trimmed = _trim_overlap(trimmed, other)
+        if len(trimmed) != len(words) and len(trimmed) < MIN_OVERLAP_WORDS:
+            # Only a sliver left after cutting the overlap
+            continue
+        kept.append(document if len(trimmed) == len(words) else " ".join(trimmed))
+        kept_words.append(words)
+        seen |= shingles
+    return kept
+
+
+def compress_text(text: str, max_tokens: int, query: str = "") -> str:
+    """
+    Extractively shorten `text` to about `max_tokens`.
+    
+    Sentences are ranked by word overlap with `query`, then by whether they
+    carry figures (numbers, $, %), then by position; the best ones that fit
+    are kept in their original order.
+    
+    Args:
+        text: Text to shorten
+        max_tokens: Target size
+        query: Text the kept sentences should relate to (e.g. the pitch idea)
+    
+    Returns:
+        `text` itself if it already fits, otherwise the selected sentences
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    
+    sentences = [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+    query_words = {w for w in _WORD.findall(query.lower()) if len(w) > 3}
+    
+    def score(index: int) -> tuple:
+        words = set(_WORD.findall(sentences[index].lower()))
+        has_figures = any(c.isdigit() for c in sentences[index]) or "$" in sentences[index]
+        return (len(words & query_words), has_figures, -index)
+    
+    selected = []
+    used = 0
+    for index in sorted(range(len(sentences)), key=score, reverse=True):
+        tokens = estimate_tokens(sentences[index]) + 1
+        if used + tokens <= max_tokens:
+            selected.append(index)
+            used += tokens
+    
+    if not selected:
+        # No sentence fits on its own: keep the head of the best one
+        best = sentences[max(range(len(sentences)), key=score)]
+        return best[:max_tokens * 4].rsplit(" ", 1)[0]
+    return " ".join(sentences[i] for i in sorted(selected))
+
+
+class BudgetedSections(NamedTuple):
+    documents: Optional[List[str]]  # RAG chunks to send (None if retrieval failed)
+    deck_text: str
+    stats: Dict[str, Any]  # Per-section token breakdown, for logging
+
+
+def fit_to_budget(budget: int, fixed_tokens: Dict[str, int], idea: str, deck_text: str,
+                  documents: Optional[List[str]], dedupe_threshold: float = 0.8) -> BudgetedSections:
+    """
+    Deduplicate the RAG chunks and shrink chunks / deck text to fit `budget`.
+    
+    Args:
+        budget: Estimated input tokens allowed for the whole prompt (0 = unlimited)
+        fixed_tokens: Sections that are never cut, by name (e.g. system, template, persona)
+        idea: Startup idea (never cut; also what compression keeps sentences relevant to)
+        deck_text: Pitch deck text ("" if none)
+        documents: Ranked RAG chunks, or None if retrieval failed
+        dedupe_threshold: See dedupe_chunks
+    
+    Returns:
+        BudgetedSections with the chunks and deck text to use and the breakdown
+    """
+    retrieved = len(documents) if documents is not None else 0
+    if documents is not None:
+        documents = dedupe_chunks(documents, dedupe_threshold)
+    deduped = len(documents) if documents is not None else 0
+    
+    fixed = sum(fixed_tokens.values()) + estimate_tokens(idea)
+    deck_tokens = estimate_tokens(deck_text)
+    chunk_tokens = [estimate_tokens(document) for document in documents or []]
+    compressed = []
+    
+    available = budget - fixed
+    if budget and deck_tokens + sum(chunk_tokens) > available:
+        available = max(0, available)
+        rag_tokens = sum(chunk_tokens)
+        # Each side may take what the other leaves, but at least half
+        deck_allowance = min(deck_tokens, max(available - rag_tokens, available // 2))
+        if deck_allowance < deck_tokens:
+            deck_text = compress_text(deck_text, deck_allowance, idea)
+            compressed.append("deck")
+        
+        remaining = available - estimate_tokens(deck_text)
+        fitted = []
+        for rank, document in enumerate(documents or []):
+            tokens = chunk_tokens[rank]
+            if tokens > remaining:
+                if remaining < MIN_CHUNK_TOKENS:
+                    break
+                document = compress_text(document, remaining, idea)
+                if not document:
+                    break
+                tokens = estimate_tokens(document)
+                compressed.append(f"chunk{rank + 1}")
+            fitted.append(document)
+            remaining -= tokens
+        if documents is not None:
+            documents = fitted
+    
+    rag = sum(estimate_tokens(document) for document in documents or [])
+    deck = estimate_tokens(deck_text)
+    stats = {
+        **fixed_tokens,
+        "idea": estimate_tokens(idea),
+        "deck": deck,
+        "rag": rag,
+        "chunks": f"{retrieved}->{deduped}->{len(documents) if documents is not None else 0}",
+        "compressed": compressed,
+        "total": fixed + deck + rag,
+        "budget": budget,
+    }
+    return BudgetedSections(documents, deck_text, stats)
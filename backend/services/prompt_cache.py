@@ -0,0 +1,190 @@
+"""
+Prompt Cache - Provider-side caching of static prompt prefixes.
+
+Every prompt starts with a byte-stable system prompt (role, task, JSON
+schema; see prompts/) followed by the per-request persona, knowledge and
+pitch. Providers can then bill and process the repeated prefix as cached
+input tokens:
+
+- Gemini: GeminiContextCache stores each system prompt as an explicit
+  context cache (client.caches) and calls reference it by name. Prefixes
+  below the model's minimum cache size are sent inline and left to
+  Gemini's implicit caching.
+- OpenAI: caching of repeated prefixes is automatic; calls only pass a
+  prompt_cache_key (the prefix hash) so requests sharing a prefix are
+  routed to the same cache.
+
+PromptCacheStats counts prompt tokens and how many of them the provider
+reported as cached, for every real provider call (see /health).
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds before expiry at which a Gemini cache is replaced, and how long
+# a prefix whose cache could not be created is sent inline before retrying
+REFRESH_MARGIN_SECONDS = 60
+RETRY_AFTER_FAILURE_SECONDS = 600
+
+
+def prefix_key(system_prompt: str) -> str:
+    """Stable identifier of a prompt prefix."""
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:32]
+
+
+def _field(obj: Any, name: str) -> Any:
+    """Attribute or dict key (SDK usage objects vary between versions)."""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def gemini_usage(usage_metadata: Any) -> Tuple[int, int]:
+    """(prompt tokens, cached prompt tokens) from a Gemini usage_metadata."""
+    return (_field(usage_metadata, "prompt_token_count") or 0,
+            _field(usage_metadata, "cached_content_token_count") or 0)
+
+
+def openai_usage(usage: Any) -> Tuple[int, int]:
+    """(prompt tokens, cached prompt tokens) from an OpenAI usage object."""
+    details = _field(usage, "prompt_tokens_details")
+    return _field(usage, "prompt_tokens") or 0, _field(details, "cached_tokens") or 0
+
+
+class PromptCacheStats:
+    """Prompt tokens served from the provider's prompt cache vs processed in full."""
+    
+    def __init__(self):
+        self.requests = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+    
+    def record(self, prompt_tokens: int, cached_tokens: int):
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        if cached_tokens:
+            self.cache_hits += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "uncached_tokens": self.prompt_tokens - self.cached_tokens,
+            "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+        }
+
+
+class GeminiContextCache:
+    """
+    Explicit Gemini context caches, one per system prompt.
+    
+    A cache is created on first use (concurrent callers share the creation),
+    replaced shortly before its TTL runs out, and forgotten when a call
+    reports it missing (invalidate). Creation failures fall back to sending
+    the prefix inline.
+    """
+    
+    def __init__(self, client, model_name: str, ttl_seconds: int = 3600, min_tokens: int = 1024,
+                 timeout_seconds: float = 15.0):
+        """
+        Args:
+            client: google.genai Client
+            model_name: Model the caches are created for (caches are per model)
+            ttl_seconds: Lifetime of each cache (storage is billed per hour)
+            min_tokens: Smallest prefix worth an explicit cache (the model's minimum)
+            timeout_seconds: Deadline for creating a cache
+        """
+        self.client = client
+        self.model_name = model_name
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.timeout_seconds = timeout_seconds
+        self._entries: Dict[str, Tuple[str, float]] = {}  # prefix key -> (cache name, expires_at)
+        self._failed_until: Dict[str, float] = {}
+        self._creating: Dict[str, asyncio.Task] = {}
+        
+        self.created = 0
+        self.failed = 0
+    
+    async def get(self, system_prompt: str, estimated_tokens: int) -> Optional[str]:
+        """
+        Name of a live cache holding `system_prompt`, creating it if needed.
+        
+        Args:
+            system_prompt: The static prefix
+            estimated_tokens: Its approximate size
+        
+        Returns:
+            Cache name for GenerateContentConfig.cached_content, or None to
+            send the prefix inline
+        """
+        if estimated_tokens < self.min_tokens:
+            return None
+        key = prefix_key(system_prompt)
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] - REFRESH_MARGIN_SECONDS > now:
+            return entry[0]
+        if self._failed_until.get(key, 0) > now:
+            return None
+        
+        task = self._creating.get(key)
+        if task is None:
+            task = asyncio.create_task(self._create(key, system_prompt))
+            self._creating[key] = task
+            task.add_done_callback(lambda _: self._creating.pop(key, None))
+        return await asyncio.shield(task)
+    
+    async def _create(self, key: str, system_prompt: str) -> Optional[str]:
+        from google.genai import types
+        
+        try:
+            cache = await asyncio.wait_for(
+                self.client.aio.caches.create(
+                    model=self.model_name,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=system_prompt,
+                        ttl=f"{self.ttl_seconds}s",
+                        display_name=f"vcraft-prefix-{key[:12]}",
+                    ),
+                ),
+                timeout=self.timeout_seconds,
+            )
+        except Exception as e:
+            self.failed += 1
+            self._failed_until[key] = time.time() + RETRY_AFTER_FAILURE_SECONDS
+            logger.warning(
+                f"[PROMPT-CACHE] Gemini cache creation failed, sending prefix inline: {type(e).__name__}: {e}"
+            )
+            return None
+        
+        self.created += 1
+        self._entries[key] = (cache.name, time.time() + self.ttl_seconds)
+        self._failed_until.pop(key, None)
+        logger.info(f"[PROMPT-CACHE] Created Gemini cache {cache.name} for prefix {key[:12]}")
+        return cache.name
+    
+    def invalidate(self, name: str):
+        """Forget a cache the provider no longer has (expired or deleted)."""
+        for key, entry in list(self._entries.items()):
+            if entry[0] == name:
+                del self._entries[key]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "created": self.created,
+            "failed": self.failed,
+            "active": sum(1 for _, expires_at in self._entries.values() if expires_at > now),
+        }
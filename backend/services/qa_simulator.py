@@ -2,18 +2,46 @@
 Q&A Simulator Service
 
 Generates VC questions and evaluates founder answers.
+
+Generated questions are stored with the Q&A session, together with the
+evaluation criteria retrieved for each of them, so evaluating an answer
+is a single LLM call on the real question text and persona.
+
+evaluate_answers() scores a whole interview round at once: the answers are
+packed into as few LLM calls as QA_BATCH_MAX_PROMPT_TOKENS allows (usually
+one), each carrying the pitch context and the deduplicated criteria once,
+and the calls run in parallel.
 """
 
+import asyncio
 import uuid
-from typing import List
-from models.qa import QuestionRequest, QuestionResponse, AnswerRequest, AnswerEvaluation, Question
-from services.llm_service import get_llm_service
+from typing import Dict, List, Optional, Tuple
+from models.qa import (
+    QuestionRequest, QuestionResponse, AnswerRequest, AnswerEvaluation, Question, QASession, StoredQuestion,
+    BatchAnswerRequest, BatchAnswerEvaluation, QuestionEvaluation
+)
+from services.llm_router import get_llm_router
+from services.session_store import get_session_store
+from services.prompt_budget import estimate_tokens
 from rag.retriever import get_rag_retriever
+from rag.metadata import PERSONAS
 from prompts.qa_prompts import (
     get_question_generation_prompt,
     get_answer_evaluation_prompt,
-    get_qa_system_prompt
+    get_batch_answer_evaluation_prompt,
+    get_question_generation_system_prompt,
+    get_answer_evaluation_system_prompt,
+    get_batch_answer_evaluation_system_prompt
 )
+from config.settings import get_settings
+
+EVALUATION_CONTEXT_PREFIX = "VC answer evaluation criteria:"
+
+
+def _evaluation_query(question_text: str) -> str:
+    """RAG query for the criteria used to evaluate answers to a question."""
+    return f"evaluating founder answers {question_text}"
+
 
 class QASimulator:
     """
@@ -21,10 +49,11 @@ class QASimulator:
     """
     
     def __init__(self):
-        self.llm_service = get_llm_service()
+        self.llm_service = get_llm_router()
         self.rag_retriever = get_rag_retriever()
-        # In-memory storage for pitch context (in production, use database)
-        self.pitch_cache = {}
+        # Pitch context and questions per analysis, shared across workers
+        self.sessions = get_session_store()
+        self.batch_max_prompt_tokens = get_settings().qa_batch_max_prompt_tokens
     
     async def generate_questions(self, request: QuestionRequest, pitch_summary: str) -> QuestionResponse:
         """
@@ -41,10 +70,11 @@ class QASimulator:
         print(f"Generating {request.num_questions} questions for {request.investor_persona}")
         
         # Step 1: Retrieve VC questioning tactics
-        rag_context = self.rag_retriever.retrieve_with_context(
+        rag_context = await self.rag_retriever.aretrieve_with_context(
             query=f"VC questions for {request.investor_persona} due diligence",
             context_prefix="Relevant VC questioning approaches:",
-            top_k=3
+            top_k=3,
+            filters={"persona": request.investor_persona} if request.investor_persona in PERSONAS else None
         )
         
         # Step 2: Build prompt
@@ -55,7 +85,7 @@ class QASimulator:
             num_questions=request.num_questions
         )
         
-        system_prompt = get_qa_system_prompt()
+        system_prompt = get_question_generation_system_prompt()
         
         # Step 3: Generate questions
         result = await self.llm_service.generate(prompt, system_prompt)
@@ -73,17 +103,33 @@ class QASimulator:
         
         print(f"Generated {len(questions)} questions")
         
+        # Step 5: Keep the questions with the session, with their evaluation
+        # criteria retrieved now (one batched call) instead of per answer
+        session = await self.sessions.get(request.analysis_id)
+        if session is not None:
+            session.investor_persona = request.investor_persona
+            session.questions = [
+                StoredQuestion(**q.model_dump(), investor_persona=request.investor_persona)
+                for q in questions
+            ]
+            try:
+                await self._evaluation_sources(session.questions)
+            except Exception as e:
+                # Non-critical - evaluation retrieves on demand
+                print(f"Evaluation context retrieval failed: {e}")
+            await self.sessions.put(session)
+        
         return QuestionResponse(questions=questions)
     
-    async def evaluate_answer(self, request: AnswerRequest, pitch_context: str, 
-                             question_text: str) -> AnswerEvaluation:
+    async def evaluate_answer(self, request: AnswerRequest, pitch_context: str,
+                             question: StoredQuestion) -> AnswerEvaluation:
         """
         Evaluate founder's answer to VC question.
         
         Args:
             request: Answer evaluation request
             pitch_context: Original pitch context
-            question_text: The question that was asked
+            question: The stored question that was asked (see get_question)
             
         Returns:
             Evaluation with score and feedback
@@ -91,23 +137,20 @@ class QASimulator:
         
         print(f"Evaluating answer to question: {request.question_id}")
         
-        # Step 1: Retrieve VC evaluation criteria
-        rag_context = self.rag_retriever.retrieve_with_context(
-            query=f"evaluating founder answers {question_text}",
-            context_prefix="VC answer evaluation criteria:",
-            top_k=3
-        )
+        # Step 1: VC evaluation criteria (precomputed with the question)
+        sources = (await self._evaluation_sources([question]))[0]
+        rag_context = self.rag_retriever.format_context(sources, EVALUATION_CONTEXT_PREFIX)
         
         # Step 2: Build evaluation prompt
         prompt = get_answer_evaluation_prompt(
-            question=question_text,
+            question=question.question,
             answer=request.answer,
             pitch_context=pitch_context,
-            investor_persona="saas",  # TODO: Get from request
+            investor_persona=question.investor_persona,
             rag_context=rag_context
         )
         
-        system_prompt = get_qa_system_prompt()
+        system_prompt = get_answer_evaluation_system_prompt()
         
         # Step 3: Evaluate
         result = await self.llm_service.generate(prompt, system_prompt)
@@ -123,13 +166,198 @@ class QASimulator:
         
         return evaluation
     
-    def cache_pitch_context(self, analysis_id: str, pitch_summary: str):
-        """Store pitch context for Q&A session."""
-        self.pitch_cache[analysis_id] = pitch_summary
+    async def evaluate_answers(self, request: BatchAnswerRequest, pitch_context: str,
+                               questions: List[StoredQuestion]) -> BatchAnswerEvaluation:
+        """
+        Evaluate a whole round of answers in as few LLM calls as possible.
+        
+        Args:
+            request: Batch evaluation request
+            pitch_context: Original pitch context
+            questions: The stored question for each answer, in request order
+        
+        Returns:
+            Per-question evaluations plus average and per-category scores
+        """
+        
+        print(f"Evaluating {len(request.answers)} answers for analysis: {request.analysis_id}")
+        
+        # Step 1: VC evaluation criteria for every question (one retrieval batch at most)
+        sources = await self._evaluation_sources(questions)
+        
+        # Step 2: Pack answers into calls that fit the prompt budget, run them in parallel
+        groups = self._pack_answers(request, questions, sources)
+        results = await asyncio.gather(*(
+            self._evaluate_group(request, pitch_context, questions, sources, group) for group in groups
+        ), return_exceptions=True)
+        evaluations: Dict[int, AnswerEvaluation] = {}
+        for group, result in zip(groups, results):
+            if isinstance(result, BaseException):
+                # Its answers are re-evaluated one by one below
+                print(f"Batch evaluation of {len(group)} answers failed: {type(result).__name__}: {result}")
+                continue
+            evaluations.update(result)
+        
+        # Step 3: Answers the model skipped or mangled (or whose call failed) get a call of their own
+        missing = [i for i in range(len(request.answers)) if i not in evaluations]
+        if missing:
+            print(f"Re-evaluating {len(missing)} answers individually")
+            singles = await asyncio.gather(*(
+                self.evaluate_answer(
+                    AnswerRequest(question_id=request.answers[i].question_id, answer=request.answers[i].answer,
+                                  analysis_id=request.analysis_id),
+                    pitch_context,
+                    questions[i]
+                )
+                for i in missing
+            ))
+            evaluations.update(zip(missing, singles))
+        
+        # Step 4: Structure response
+        items = [
+            QuestionEvaluation(
+                question_id=questions[i].id,
+                category=questions[i].category,
+                **evaluations[i].model_dump()
+            )
+            for i in range(len(request.answers))
+        ]
+        by_category: Dict[str, List[int]] = {}
+        for item in items:
+            by_category.setdefault(item.category, []).append(item.score)
+        
+        batch = BatchAnswerEvaluation(
+            evaluations=items,
+            average_score=round(sum(item.score for item in items) / len(items), 2),
+            category_scores={
+                category: round(sum(scores) / len(scores), 2) for category, scores in by_category.items()
+            }
+        )
+        
+        print(f"Round score: {batch.average_score}/10 over {len(groups)} LLM call(s)")
+        
+        return batch
+    
+    def _pack_answers(self, request: BatchAnswerRequest, questions: List[StoredQuestion],
+                      sources: List[List[str]]) -> List[List[int]]:
+        """
+        Group answer indices so each call's questions, answers and criteria
+        stay within QA_BATCH_MAX_PROMPT_TOKENS (an answer larger than the
+        budget gets a call of its own).
+        """
+        def cost(i: int, known: set) -> int:
+            tokens = estimate_tokens(questions[i].question) + estimate_tokens(request.answers[i].answer)
+            return tokens + sum(estimate_tokens(doc) for doc in sources[i] if doc not in known)
+        
+        groups: List[List[int]] = []
+        seen: set = set()
+        used = 0
+        for i in range(len(questions)):
+            tokens = cost(i, seen)
+            if not groups or used + tokens > self.batch_max_prompt_tokens:
+                groups.append([])
+                seen = set()
+                used = 0
+                tokens = cost(i, seen)
+            groups[-1].append(i)
+            seen.update(sources[i])
+            used += tokens
+        return groups
+    
+    async def _evaluate_group(self, request: BatchAnswerRequest, pitch_context: str,
+                              questions: List[StoredQuestion], sources: List[List[str]],
+                              group: List[int]) -> Dict[int, AnswerEvaluation]:
+        """One LLM call for a group of answers; returns the evaluations it parsed, by answer index."""
+        # Chunks retrieved for several questions are sent once
+        documents = list(dict.fromkeys(doc for i in group for doc in sources[i]))
+        prompt = get_batch_answer_evaluation_prompt(
+            answers=[
+                {
+                    "question_id": questions[i].id,
+                    "question": questions[i].question,
+                    "answer": request.answers[i].answer
+                }
+                for i in group
+            ],
+            pitch_context=pitch_context,
+            # One generated set, so every question has the same persona
+            investor_persona=questions[group[0]].investor_persona,
+            rag_context=self.rag_retriever.format_context(documents, EVALUATION_CONTEXT_PREFIX)
+        )
+        
+        result = await self.llm_service.generate(prompt, get_batch_answer_evaluation_system_prompt())
+        
+        by_id: Dict[str, AnswerEvaluation] = {}
+        for entry in result.get("evaluations", []) if isinstance(result, dict) else []:
+            try:
+                by_id[str(entry["question_id"])] = AnswerEvaluation(
+                    score=entry["score"],
+                    feedback=entry["feedback"],
+                    improvement_tips=entry["improvement_tips"]
+                )
+            except (KeyError, TypeError, ValueError):
+                continue
+        return {i: by_id[questions[i].id] for i in group if questions[i].id in by_id}
     
-    def get_pitch_context(self, analysis_id: str) -> str:
-        """Retrieve cached pitch context."""
-        return self.pitch_cache.get(analysis_id, "")
+    async def _evaluation_sources(self, questions: List[StoredQuestion]) -> List[List[str]]:
+        """
+        VC knowledge for evaluating answers to each question.
+        
+        Uses what was retrieved when the questions were generated; anything
+        missing is retrieved in one batched call and kept on the question.
+        """
+        missing = [q for q in questions if q.evaluation_sources is None]
+        if missing:
+            retrieved = await self.rag_retriever.aretrieve_many(
+                [_evaluation_query(q.question) for q in missing],
+                top_k=3
+            )
+            for question, documents in zip(missing, retrieved):
+                question.evaluation_sources = documents
+        return [q.evaluation_sources for q in questions]
+    
+    async def cache_pitch_context(self, analysis_id: str, pitch_summary: str,
+                                  investor_persona: Optional[str] = None):
+        """Start the Q&A session for an analysis."""
+        await self.sessions.put(QASession(
+            analysis_id=analysis_id,
+            pitch_summary=pitch_summary,
+            investor_persona=investor_persona
+        ))
+    
+    async def get_pitch_context(self, analysis_id: str) -> str:
+        """Retrieve the pitch context of a Q&A session ("" if unknown or expired)."""
+        session = await self.sessions.get(analysis_id)
+        return session.pitch_summary if session is not None else ""
+    
+    async def get_question(self, analysis_id: str,
+                           question_id: str) -> Tuple[Optional[QASession], Optional[StoredQuestion]]:
+        """
+        Look up a generated question by ID.
+        
+        Returns:
+            (session, question); session is None if the analysis is unknown,
+            question is None if no such question was generated for it
+        """
+        session, questions = await self.get_questions(analysis_id, [question_id])
+        return session, questions[0]
+    
+    async def get_questions(self, analysis_id: str,
+                            question_ids: List[str]) -> Tuple[Optional[QASession], List[Optional[StoredQuestion]]]:
+        """
+        Look up several generated questions by ID.
+        
+        Returns:
+            (session, questions in question_ids order, None where unknown);
+            session is None if the analysis is unknown
+        """
+        # Always from the shared store: another worker may have regenerated the
+        # questions, reusing IDs (q1..q5) for different question text
+        session = await self.sessions.get(analysis_id, refresh=True)
+        if session is None:
+            return None, [None] * len(question_ids)
+        by_id = {q.id: q for q in session.questions}
+        return session, [by_id.get(question_id) for question_id in question_ids]
 
 # Global instance
 _qa_simulator = None
@@ -0,0 +1,320 @@
+"""
+LLM Rate Limiting - Token buckets, retries and circuit breaking.
+
+Provider quotas are per minute, in requests and in tokens. Without any
+pacing, a burst (e.g. a batch job) hits a 429, the request falls back to a
+canned analysis, and every concurrent request piles into the same wall.
+This module keeps LLMService just under the quota instead:
+
+- RateLimiter: one pair of token buckets (requests/min, tokens/min) per
+  provider/model, shared process-wide. Waiters queue by priority lane, so
+  interactive requests are admitted ahead of batch work. A 429 pauses the
+  whole limiter for the provider's Retry-After instead of letting every
+  waiter retry on its own.
+- retry_delay: jittered exponential backoff that honours Retry-After.
+- CircuitBreaker: after repeated provider failures (5xx, timeouts,
+  connection errors) calls fail fast for a cooldown, then a single probe
+  decides whether to close the circuit again.
+- classify_error: maps provider SDK exceptions to the actions above.
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, NamedTuple, Optional, Tuple
+
+# Priority lanes (lower is served first)
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+# Buckets hold this many seconds of quota, so bursts are smoothed out
+BURST_SECONDS = 10.0
+
+# Exception class names (anywhere in the MRO) that mean the connection failed
+_CONNECTION_ERRORS = {
+    "APIConnectionError", "ConnectError", "ConnectTimeout", "ReadError", "ReadTimeout",
+    "RemoteProtocolError", "ClientConnectionError", "ServerDisconnectedError", "ConnectionError",
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider while its circuit is open."""
+
+
+class TokenBucket:
+    """Continuous-refill token bucket sized in units per minute."""
+    
+    def __init__(self, per_minute: float, burst_seconds: float = BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (amounts above capacity are capped)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+    
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+    
+    def adjust(self, delta: float):
+        """Give back (positive) or charge (negative) tokens after the fact."""
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+
+class RateLimiter:
+    """
+    Requests/min and tokens/min limiter with priority lanes.
+    
+    Waiters form one priority queue (lane, then arrival order). Only the
+    head of the queue waits for the buckets to refill, so a batch request
+    that arrived first still yields to an interactive one that arrives
+    while it is waiting.
+    """
+    
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        """
+        Args:
+            requests_per_minute: Request quota (0 = unlimited)
+            tokens_per_minute: Token quota, prompt + completion (0 = unlimited)
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.paused_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = asyncio.Condition()
+        self.stats = {"admitted": 0, "queued": 0, "wait_seconds": 0.0, "pauses": 0}
+    
+    def _delay(self, tokens: int) -> float:
+        now = time.monotonic()
+        delay = self.paused_until - now
+        if self.requests is not None:
+            delay = max(delay, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.wait_time(tokens, now))
+        return delay
+    
+    def _take(self, tokens: int):
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+        self.stats["admitted"] += 1
+    
+    async def acquire(self, tokens: int = 0, priority: str = "interactive"):
+        """
+        Wait until a request of `tokens` estimated tokens fits the quota.
+        
+        Args:
+            tokens: Estimated prompt + completion tokens
+            priority: Lane name from PRIORITIES
+        """
+        if not self._waiters and self._delay(tokens) <= 0:
+            self._take(tokens)
+            return
+        
+        start = time.monotonic()
+        self.stats["queued"] += 1
+        async with self._cond:
+            entry = (PRIORITIES.get(priority, 0), next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    timeout = None
+                    if self._waiters[0] == entry:
+                        timeout = self._delay(tokens)
+                        if timeout <= 0:
+                            break
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                # Cancelled while queued: leave the queue and wake the next head
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiters)
+            self._take(tokens)
+            self._cond.notify_all()
+        self.stats["wait_seconds"] += time.monotonic() - start
+    
+    def pause(self, seconds: float):
+        """Admit nothing for `seconds` (provider said we are throttled)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.stats["pauses"] += 1
+    
+    def reconcile(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once the real usage is known."""
+        if self.tokens is not None and actual_tokens:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+    
+    def get_stats(self) -> Dict:
+        waiting = {lane: 0 for lane in PRIORITIES}
+        names = {value: lane for lane, value in PRIORITIES.items()}
+        for priority, _ in self._waiters:
+            waiting[names.get(priority, "interactive")] += 1
+        return {
+            **self.stats,
+            "wait_seconds": round(self.stats["wait_seconds"], 3),
+            "waiting": waiting,
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 3),
+        }
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures; open ->
+    half-open after `cooldown_seconds`, when one probe call is let through.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, cooldown_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.rejected = 0
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+    
+    def check(self):
+        """Raise CircuitOpenError unless a call may go through now."""
+        if self.failure_threshold <= 0 or self.opened_at is None:
+            return
+        if self.probing or time.monotonic() - self.opened_at < self.cooldown_seconds:
+            self.rejected += 1
+            raise CircuitOpenError("LLM provider unavailable (circuit open), try again shortly")
+        self.probing = True
+    
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+    
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or (self.failure_threshold > 0 and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+        self.probing = False
+    
+    def release(self):
+        """End a probe without a verdict (e.g. throttled)."""
+        self.probing = False
+    
+    def get_stats(self) -> Dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "rejected": self.rejected}
+
+
+class ErrorInfo(NamedTuple):
+    kind: str  # throttled | transient | timeout | fatal
+    status: Optional[int]
+    retry_after: Optional[float]
+
+
+def _parse_retry_after(value) -> Optional[float]:
+    """Retry-After as seconds (delta-seconds or HTTP date), or None."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value.rstrip("s")))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if headers is not None:
+        try:
+            if headers.get("retry-after-ms") is not None:
+                return float(headers.get("retry-after-ms")) / 1000.0
+        except (TypeError, ValueError):
+            pass
+        seconds = _parse_retry_after(headers.get("retry-after"))
+        if seconds is not None:
+            return seconds
+    # Gemini reports it as google.rpc.RetryInfo in the error details
+    details = getattr(exc, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []) or []:
+            if isinstance(detail, dict) and "retryDelay" in detail:
+                return _parse_retry_after(detail["retryDelay"])
+    return None
+
+
+def classify_error(exc: BaseException) -> ErrorInfo:
+    """
+    Classify an exception from a provider call (following __cause__ chains).
+    
+    Returns:
+        ErrorInfo with kind:
+        - throttled: 429 - retry after a pause
+        - transient: 5xx / 408 / connection errors - retry, counts as a failure
+        - timeout: our per-call deadline - not retried (the budget is spent),
+          counts as a failure
+        - fatal: anything else (bad request, auth, invalid JSON) - not retried
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        status = getattr(exc, "status_code", None)
+        if not isinstance(status, int):
+            status = getattr(exc, "code", None)
+        if isinstance(status, int):
+            if status == 429:
+                return ErrorInfo("throttled", status, _retry_after(exc))
+            if status == 408 or status >= 500:
+                return ErrorInfo("transient", status, _retry_after(exc))
+            return ErrorInfo("fatal", status, None)
+        if isinstance(exc, asyncio.TimeoutError):
+            return ErrorInfo("timeout", None, None)
+        if _CONNECTION_ERRORS.intersection(cls.__name__ for cls in type(exc).__mro__):
+            return ErrorInfo("transient", None, None)
+        exc = exc.__cause__ or exc.__context__
+    return ErrorInfo("fatal", None, None)
+
+
+def retry_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """
+    Backoff before retry number `attempt + 1`.
+    
+    Full jitter (uniform over [0, base * 2^attempt], capped) spreads retries
+    out so throttled clients don't return in lockstep. A Retry-After from
+    the provider is a floor, plus a little jitter.
+    """
+    if retry_after is not None:
+        return retry_after + random.uniform(0, base)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# Limiters shared by every LLMService using the same provider/model
+_rate_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+
+def get_rate_limiter(provider: str, model_name: str, requests_per_minute: float = 0,
+                     tokens_per_minute: float = 0) -> RateLimiter:
+    """Get or create the limiter for a provider/model."""
+    key = (provider, model_name)
+    if key not in _rate_limiters:
+        _rate_limiters[key] = RateLimiter(requests_per_minute, tokens_per_minute)
+    return _rate_limiters[key]
@@ -0,0 +1,262 @@
+"""
+Q&A Session Store - Bounded, shareable storage for Q&A pitch context.
+
+An analysis starts a Q&A session (pitch summary, persona, later the
+generated questions) that /api/generate-questions and /api/evaluate-answer
+look up by analysis_id - usually on a different request, and with several
+uvicorn workers, often on a different process.
+
+Tiers:
+- Memory: per-process LRU with TTL (bounded, sub-millisecond hits). With
+  a shared backend an entry is only served for memory_ttl_seconds, then
+  re-read, so another worker's update is seen within seconds
+- Shared backend (QA_SESSION_BACKEND), anything with the Redis
+  get / set(ex=) / delete calls:
+  - sqlite: SQLiteKV, a local stand-in in WAL mode, shared by every
+    worker on the host
+  - redis: a redis-py client (pip install redis), shared across hosts
+  - memory: no shared tier (single worker only)
+
+Sessions are stored as JSON and decoded on every read, so callers can
+modify the returned session without touching the cache.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from models.qa import QASession
+from config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+SESSION_BACKENDS = ("memory", "sqlite", "redis")
+
+KEY_PREFIX = "qa:session:"
+
+
+class SQLiteKV:
+    """
+    Redis-compatible key/value subset (get, set with ex=, delete) on SQLite.
+    
+    WAL mode lets several uvicorn workers read and write the same file.
+    """
+    
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_kv_expires ON kv(expires_at)")
+        self._conn.commit()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the value, or None if missing or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM kv WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row[0]
+    
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> bool:
+        """Store a value, expiring after `ex` seconds (None = never), and purge expired keys."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ex if ex else None),
+            )
+            self._conn.execute("DELETE FROM kv WHERE expires_at < ?", (now,))
+            self._conn.commit()
+        return True
+    
+    def delete(self, key: str) -> int:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM kv WHERE key = ?", (key,)).rowcount
+            self._conn.commit()
+        return deleted
+    
+    def dbsize(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM kv WHERE expires_at IS NULL OR expires_at >= ?", (time.time(),)
+            ).fetchone()[0]
+
+
+def create_backend(backend: str, path: str = "", redis_url: str = ""):
+    """
+    Build the shared session backend.
+    
+    Args:
+        backend: One of SESSION_BACKENDS
+        path: SQLite file (sqlite backend)
+        redis_url: Redis URL (redis backend)
+    
+    Returns:
+        A client with Redis get / set(ex=) / delete semantics, or None for 'memory'
+    """
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"Unsupported Q&A session backend: {backend}. Must be one of: {SESSION_BACKENDS}")
+    if backend == "sqlite":
+        return SQLiteKV(path)
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise ValueError("QA_SESSION_BACKEND=redis requires the 'redis' package (pip install redis)")
+        return redis.Redis.from_url(redis_url, socket_timeout=1.0)
+    return None
+
+
+class SessionStore:
+    """
+    Q&A sessions by analysis_id: memory LRU + TTL in front of a shared backend.
+    """
+    
+    def __init__(self, backend=None, max_entries: int = 1024, ttl_seconds: int = 86400,
+                 memory_ttl_seconds: float = 5.0):
+        """
+        Args:
+            backend: Shared tier from create_backend (None = memory only)
+            max_entries: Capacity of the in-memory LRU tier
+            ttl_seconds: Session lifetime in both tiers (0 = never expire)
+            memory_ttl_seconds: How long the memory tier serves an entry
+                before re-reading the shared backend (ignored without one)
+        """
+        self.backend = backend
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.memory_ttl_seconds = memory_ttl_seconds
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+    
+    def _memory_get(self, analysis_id: str, stale_ok: bool = False) -> Optional[str]:
+        """Memory-tier value; past its freshness window only if `stale_ok`."""
+        with self._lock:
+            entry = self._memory.get(analysis_id)
+            if entry is None:
+                return None
+            value, expires_at, fresh_until = entry
+            now = time.time()
+            if expires_at is not None and expires_at < now:
+                del self._memory[analysis_id]
+                return None
+            if not stale_ok and fresh_until is not None and fresh_until < now:
+                return None
+            self._memory.move_to_end(analysis_id)
+            return value
+    
+    def _memory_set(self, analysis_id: str, value: str, expires_at: Optional[float]):
+        fresh_until = time.time() + self.memory_ttl_seconds if self.backend is not None else None
+        with self._lock:
+            self._memory[analysis_id] = (value, expires_at, fresh_until)
+            self._memory.move_to_end(analysis_id)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+    
+    def _expires_at(self) -> Optional[float]:
+        return time.time() + self.ttl_seconds if self.ttl_seconds else None
+    
+    async def get(self, analysis_id: str, refresh: bool = False) -> Optional[QASession]:
+        """
+        Look up a session in memory, then in the shared backend.
+        
+        Args:
+            analysis_id: Analysis the session belongs to
+            refresh: Skip the memory tier even if its copy is fresh
+        
+        Returns:
+            A fresh copy of the session, or None if unknown or expired
+        """
+        value = None if refresh else self._memory_get(analysis_id)
+        if value is None and self.backend is not None:
+            try:
+                value = await asyncio.to_thread(self.backend.get, KEY_PREFIX + analysis_id)
+            except Exception as e:
+                logger.warning(f"[QA-SESSIONS] Backend read failed: {type(e).__name__}: {e}")
+                value = None
+            if value is not None:
+                if isinstance(value, bytes):
+                    value = value.decode("utf-8")
+                self.backend_hits += 1
+                # The backend enforces the real expiry; locally keep at most one TTL
+                self._memory_set(analysis_id, value, self._expires_at())
+        
+        if value is None:
+            if refresh or self.backend is not None:
+                # The backend may be unreachable (or absent); fall back to what this worker has
+                value = self._memory_get(analysis_id, stale_ok=True)
+            if value is None:
+                self.misses += 1
+                return None
+        
+        self.hits += 1
+        return QASession.model_validate_json(value)
+    
+    async def put(self, session: QASession):
+        """Store (or replace) a session in both tiers."""
+        value = session.model_dump_json()
+        self._memory_set(session.analysis_id, value, self._expires_at())
+        if self.backend is not None:
+            try:
+                await asyncio.to_thread(
+                    self.backend.set, KEY_PREFIX + session.analysis_id, value, ex=self.ttl_seconds or None
+                )
+            except Exception as e:
+                logger.warning(f"[QA-SESSIONS] Backend write failed: {type(e).__name__}: {e}")
+    
+    async def delete(self, analysis_id: str):
+        with self._lock:
+            self._memory.pop(analysis_id, None)
+        if self.backend is not None:
+            try:
+                await asyncio.to_thread(self.backend.delete, KEY_PREFIX + analysis_id)
+            except Exception as e:
+                logger.warning(f"[QA-SESSIONS] Backend delete failed: {type(e).__name__}: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else "memory",
+            "hits": self.hits,
+            "backend_hits": self.backend_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+# Global instance
+_session_store = None
+
+def get_session_store() -> SessionStore:
+    """Get or create global Q&A session store."""
+    global _session_store
+    if _session_store is None:
+        settings = get_settings()
+        backend = create_backend(settings.qa_session_backend, settings.qa_session_path,
+                                 settings.qa_session_redis_url)
+        _session_store = SessionStore(backend, settings.qa_session_cache_size, settings.qa_session_ttl_seconds,
+                                      settings.qa_session_memory_ttl_seconds)
+        logger.info(
+            f"[QA-SESSIONS] Backend: {settings.qa_session_backend}, "
+            f"memory tier: {settings.qa_session_cache_size} sessions"
+        )
+    return _session_store